@@ -0,0 +1,132 @@
+# Approximate nearest-neighbor search over TF-IDF vectors
+# Used for content queries (e.g. live "related articles" while writing), so a
+# query only scores a few clusters of the corpus instead of every article
+
+import math
+
+import numpy as np
+
+from artelipi_neighbors import top_k_indices
+
+# Rows assigned to clusters per block while building/updating
+ASSIGN_BLOCK_ROWS = 1 << 16
+
+
+class IVFIndex:
+    kind = 'ivf'
+
+    def __init__(self, components, centroids, assignments, n_probe=16):
+        """SVD-reduced vectors with an IVF-style coarse quantizer
+
+        Articles are grouped by their nearest k-means centroid in the
+        SVD-reduced space. A query is reduced the same way, its `n_probe`
+        closest clusters are collected, and only those candidates are scored
+        exactly against the TF-IDF rows, so the scores match the exact path.
+        """
+        self.components = components    # (n_components, n_features) float32
+        self.centroids = centroids      # (n_lists, n_components) float32, unit length
+        self.assignments = assignments  # (N,) int32 cluster of each article, -1 if retired
+        self.n_probe = n_probe
+
+        # Inverted lists: rows of cluster c are list_rows[list_offsets[c]:list_offsets[c + 1]]
+        order = np.argsort(assignments, kind='stable')
+        self.list_rows = order[assignments[order] >= 0].astype(np.int32)
+        counts = np.bincount(assignments[assignments >= 0], minlength=len(centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    @classmethod
+    def build(cls, matrix, n_components=64, n_lists=None, n_probe=16, seed=0):
+        """Fit the SVD and k-means quantizer on an L2-normalized TF-IDF matrix
+
+        `n_lists` defaults to sqrt(N) clusters.
+        """
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.preprocessing import normalize
+
+        n, n_features = matrix.shape
+        n_components = max(1, min(n_components, n_features - 1, n - 1))
+        n_lists = max(1, min(n_lists or int(math.sqrt(n)), n))
+
+        svd = TruncatedSVD(n_components=n_components, random_state=seed)
+        reduced = normalize(svd.fit_transform(matrix)).astype(np.float32)
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=seed, n_init=3,
+                                 batch_size=min(max(1024, n_lists * 4), n))
+        kmeans.fit(reduced)
+
+        components = svd.components_.astype(np.float32)
+        centroids = normalize(kmeans.cluster_centers_).astype(np.float32)
+        index = cls(components, centroids, np.empty(0, dtype=np.int32), n_probe)
+        return index._with_assignments(index._assign(matrix))
+
+    def _with_assignments(self, assignments):
+        return IVFIndex(self.components, self.centroids, assignments, self.n_probe)
+
+    def _reduce(self, vectors):
+        from sklearn.preprocessing import normalize
+        return normalize(np.asarray(vectors @ self.components.T, dtype=np.float32))
+
+    def _assign(self, matrix):
+        """Nearest centroid of each row, in blocks"""
+        assignments = np.empty(matrix.shape[0], dtype=np.int32)
+        for start in range(0, matrix.shape[0], ASSIGN_BLOCK_ROWS):
+            reduced = self._reduce(matrix[start:start + ASSIGN_BLOCK_ROWS])
+            assignments[start:start + len(reduced)] = np.argmax(reduced @ self.centroids.T, axis=1)
+        return assignments
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def nbytes(self):
+        return (self.components.nbytes + self.centroids.nbytes + self.assignments.nbytes
+                + self.list_rows.nbytes + self.list_offsets.nbytes)
+
+    def params(self):
+        return {
+            "kind": self.kind,
+            "n_components": int(self.components.shape[0]),
+            "n_lists": int(self.n_lists),
+            "n_probe": self.n_probe,
+        }
+
+    def candidates(self, reduced_query, k, n_probe=None):
+        """Rows in the closest clusters: at least `n_probe` lists and k rows"""
+        n_probe = n_probe or self.n_probe
+        order = np.argsort(-(self.centroids @ reduced_query), kind='stable')
+        offsets = self.list_offsets
+        sizes = offsets[order + 1] - offsets[order]
+        probe = max(n_probe, int(np.searchsorted(np.cumsum(sizes), k)) + 1)
+        lists = order[:probe]
+        return np.concatenate([self.list_rows[offsets[c]:offsets[c + 1]] for c in lists])
+
+    def search(self, vectors, matrix, k, n_probe=None):
+        """(row positions, cosine scores) of the top k articles per query vector"""
+        results = []
+        for i, reduced in enumerate(self._reduce(vectors)):
+            rows = self.candidates(reduced, k, n_probe)
+            scores = (matrix[rows] @ vectors[i].T).toarray().ravel()
+            top = top_k_indices(scores, k)
+            results.append((rows[top], scores[top]))
+        return results
+
+    def patched(self, matrix, n_old, retired):
+        """Index after an incremental corpus change (same layout as TopKNeighbors.patched)
+
+        Rows of `matrix` from `n_old` on were appended and are assigned to
+        the nearest existing centroid; `retired` rows leave their lists. The
+        quantizer is refit on the next full build.
+        """
+        assignments = np.empty(matrix.shape[0], dtype=np.int32)
+        assignments[:n_old] = self.assignments
+        assignments[retired] = -1
+        if matrix.shape[0] > n_old:
+            assignments[n_old:] = self._assign(matrix[n_old:])
+        return self._with_assignments(assignments)
+
+
+# Index kinds selectable with ArtelipiRecommender(ann_kind=...)
+ANN_INDEXES = {
+    IVFIndex.kind: IVFIndex,
+}
@@ -1,16 +1,65 @@
 # FastAPI Service for Artelipi-Only Recommendations
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
+import asyncio
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import signal
+import threading
+import time
 import uvicorn
 from artelipi_recommender import ArtelipiRecommender
+from artelipi_cache import CorpusCache, ResponseCache
+from artelipi_scheduler import GenerationWatcher, ModelScheduler
+from artelipi_metrics import CONTENT_TYPE, REGISTRY, REQUEST_SECONDS, Counter, Gauge, SamplingProfiler
+from artelipi_trending import WINDOWS
+from artelipi_profiles import INTERACTION_KINDS
+from artelipi_rerank import RerankOptions
+from artelipi_responses import (
+    ArticleListResponse, BatchRecommendationsResponse, FastJSONResponse, RecommendationsResponse,
+    SearchResponse, UserRecommendationsResponse, encode_json, parse_fields
+)
+
+# The recommender reports loads, syncs and builds through `logging`;
+# ARTELIPI_LOG_LEVEL=WARNING keeps only the problems
+logging.basicConfig(level=os.environ.get("ARTELIPI_LOG_LEVEL", "INFO").upper(), format="%(levelname)s %(name)s: %(message)s")
+
+# Set once the startup load has finished (see run_startup_load)
+READY = threading.Event()
+startup_state = {"seconds": None, "error": None}
+
+# Answered while the model is still loading; everything else gets a 503
+UNGATED_PATHS = {"/", "/health", "/ready", "/stats", "/metrics"}
+
+
+def is_ready():
+    """Whether the model-dependent endpoints can answer"""
+    if not READY.is_set():
+        return False
+    # A worker started before the parent saved a generation has nothing to serve
+    return ROLE != "worker" or recommender.generation is not None
+
+
+async def require_ready(request: Request):
+    path = request.scope["path"]
+    if is_ready() or path in UNGATED_PATHS or path.startswith("/debug/"):
+        return
+    raise HTTPException(status_code=503, detail="Model is loading", headers={"Retry-After": "5"})
+
 
 # Initialize FastAPI
 app = FastAPI(
     title="Artelipi Recommendation API",
     description="Content-based article recommendation system (Artelipi articles only)",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse,
+    dependencies=[Depends(require_ready)]
 )
 
 # Add CORS middleware
@@ -28,38 +77,418 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize recommender
-recommender = ArtelipiRecommender()
+# Largest number of articles + content snippets accepted by /recommendations/batch
+MAX_BATCH_SIZE = 100
 
-# Load model on startup
-@app.on_event("startup")
-async def load_model():
-    """Load Artelipi articles and build model"""
+# Largest page of /search results
+MAX_SEARCH_LIMIT = 100
+
+# Most recommendations (or trending/recent articles) returned per query
+MAX_RESULTS_LIMIT = 100
+
+
+class BatchRecommendationRequest(BaseModel):
+    article_ids: List[str] = []
+    contents: List[str] = []
+    limit: int = Field(5, ge=1, le=MAX_RESULTS_LIMIT)
+    fields: Optional[str] = None
+    # Re-ranking, as the query parameters of /recommendations/{article_id}
+    diversity: float = 0.0
+    max_per_author: Optional[int] = None
+    tags: List[str] = []
+    category: Optional[str] = None
+    exclude: List[str] = []
+
+
+class InteractionEvent(BaseModel):
+    kind: str  # like, bookmark, reading_list or follow
+    target_id: str  # Article id (user id for follows)
+    active: bool = True  # False when the interaction was undone
+
+
+# Initialize recommender (ARTELIPI_TOP_K=0 keeps the dense similarity matrix,
+# ARTELIPI_VECTORIZER=hashing streams the corpus with flat peak memory,
+# ARTELIPI_TRENDING_HALF_LIFE_HOURS=0 ranks trending by engagement alone,
+# ARTELIPI_ANN=ivf answers content queries from an approximate index,
+# ARTELIPI_PROFILE_TTL_SECONDS bounds how stale a cached user profile gets,
+# ARTELIPI_BUILD_WORKERS processes share full model builds (1 = serial, the default),
+# ARTELIPI_LISTENER_BATCH_SECONDS coalesces bursts of listener events)
+recommender = ArtelipiRecommender(
+    top_k=int(os.environ.get("ARTELIPI_TOP_K", "50")) or None,
+    vectorizer_kind=os.environ.get("ARTELIPI_VECTORIZER", "tfidf"),
+    page_size=int(os.environ.get("ARTELIPI_PAGE_SIZE", "500")),
+    trending_half_life_hours=float(os.environ.get("ARTELIPI_TRENDING_HALF_LIFE_HOURS", "48")) or None,
+    ann_kind=os.environ.get("ARTELIPI_ANN") or None,
+    ann_min_articles=int(os.environ.get("ARTELIPI_ANN_MIN_ARTICLES", "1000")),
+    ann_probe=int(os.environ.get("ARTELIPI_ANN_PROBE", "16")),
+    profile_ttl=float(os.environ.get("ARTELIPI_PROFILE_TTL_SECONDS", "600")),
+    profile_cache_size=int(os.environ.get("ARTELIPI_PROFILE_CACHE_SIZE", "10000")),
+    build_workers=int(os.environ.get("ARTELIPI_BUILD_WORKERS", "1")),
+    listener_batch_seconds=float(os.environ.get("ARTELIPI_LISTENER_BATCH_SECONDS", "0.5"))
+)
+
+
+# "standalone" loads and rebuilds the model itself. Under artelipi_serve.py
+# the "parent" process builds models and saves each as a generation, and
+# "worker" processes serve the current generation read-only from mmap
+ROLE = os.environ.get("ARTELIPI_ROLE", "standalone")
+MODEL_PATH = os.environ.get("ARTELIPI_MODEL_PATH", "ml_models_artelipi")
+
+
+# "incremental" fetches only posts changed since the last sync when the
+# corpus TTL expires, and "listener" additionally keeps the corpus current
+# through a Firestore snapshot listener. "full" never syncs articles on TTL
+# expiry: the scheduled rebuilds (and /refresh) re-read the whole corpus
+# instead. Except with the listener, every TTL expiry also re-reads the
+# engagement counts, which change without moving `updatedAt`
+SYNC_MODE = os.environ.get("ARTELIPI_SYNC_MODE", "incremental")
+
+
+# The model loads on a background thread after the server starts listening,
+# so /health answers at once however large the corpus is. "0" loads it
+# before the first request is accepted instead
+BACKGROUND_STARTUP = os.environ.get("ARTELIPI_BACKGROUND_STARTUP", "1") != "0"
+
+
+# Seconds a request may wait on blocking work before getting a 504. The
+# work itself keeps running in its thread; the next request reuses it.
+REQUEST_TIMEOUT = float(os.environ.get("ARTELIPI_REQUEST_TIMEOUT_SECONDS", "10"))
+REFRESH_TIMEOUT = float(os.environ.get("ARTELIPI_REFRESH_TIMEOUT_SECONDS", "600"))
+
+
+# Background refits: on a schedule, or once enough articles have changed.
+# They keep the 'tfidf' vocabulary, so a daily full reload refits it
+# (ARTELIPI_RELOAD_INTERVAL_SECONDS=0 disables it; the hashing vectorizer
+# has no vocabulary to refit)
+scheduler = ModelScheduler(
+    recommender,
+    interval=float(os.environ.get("ARTELIPI_REBUILD_INTERVAL_SECONDS", "3600")),
+    min_changes=int(os.environ.get("ARTELIPI_REBUILD_MIN_CHANGES", "50")),
+    on_build=lambda: save_if_changed(),
+    reload=SYNC_MODE == "full",
+    reload_interval=float(os.environ.get("ARTELIPI_RELOAD_INTERVAL_SECONDS", "86400"))
+    if recommender.vectorizer_kind == "tfidf" else 0
+)
+
+# Workers switch to each new generation the parent writes
+watcher = GenerationWatcher(
+    recommender,
+    MODEL_PATH,
+    poll_interval=float(os.environ.get("ARTELIPI_GENERATION_POLL_SECONDS", "1"))
+)
+_save_lock = threading.Lock()
+
+
+def save_if_changed():
+    """Write the model as a new generation unless that version is already saved"""
+    with _save_lock:
+        if recommender.model.version != recommender.saved_version:
+            recommender.save_model(MODEL_PATH)
+
+
+def request_refresh():
+    """Ask the parent process for a corpus refresh (from a worker)"""
+    os.makedirs(MODEL_PATH, exist_ok=True)
+    with open(os.path.join(MODEL_PATH, "REFRESH"), "w") as f:
+        f.write(str(os.getpid()))
+
+
+def take_refresh_request():
+    """Whether a worker asked for a refresh since the last call (parent)"""
     try:
-        # Try to load saved model first
-        if not recommender.load_model('ml_models_artelipi'):
-            # If no saved model, load from Firestore and build
-            print("No saved model found. Loading from Firestore...")
+        os.remove(os.path.join(MODEL_PATH, "REFRESH"))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def load_corpus():
+    """Bring the corpus up to date with Firestore (on corpus TTL expiry)"""
+    if ROLE == "worker":
+        # Workers never read Firestore; the watcher follows new generations
+        return recommender.df
+    
+    if recommender.sync_watermark is None:
+        # Nothing loaded yet: fetch + fit publish a single new model
+        return recommender.reload()
+    
+    if SYNC_MODE != "full":
+        recommender.sync_articles()
+    if SYNC_MODE != "listener":
+        recommender.sync_engagement()
+    # Refits happen in the scheduler, never inside a request
+    if scheduler.due():
+        scheduler.trigger()
+    return recommender.df
+
+
+# Corpus snapshot shared by all requests (refreshed in the background)
+corpus_cache = CorpusCache(
+    load_corpus,
+    ttl=float(os.environ.get("ARTELIPI_CORPUS_TTL_SECONDS", "300"))
+)
+
+
+# Encoded /recommendations/{article_id} responses for the current model
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("ARTELIPI_RESPONSE_CACHE_SIZE", "4096"))
+)
+
+# Sampling profiler for a live process, off unless ARTELIPI_PROFILER=1; then
+# toggled per process with /debug/profiler (see require_profiler) or
+# `kill -USR2 <pid>`
+PROFILER_ENABLED = os.environ.get("ARTELIPI_PROFILER") == "1"
+profiler = SamplingProfiler(interval=float(os.environ.get("ARTELIPI_PROFILER_INTERVAL_SECONDS", "0.005")))
+
+
+# Browsers and the Vercel edge may reuse a response this long, then
+# revalidate it with If-None-Match
+RESPONSE_MAX_AGE = int(os.environ.get("ARTELIPI_RESPONSE_MAX_AGE_SECONDS", "300"))
+
+
+# Scrape-time metrics read from the components' own counters
+CACHES = {"corpus": corpus_cache, "response": response_cache, "user_profile": recommender.profiles}
+REGISTRY.register(Counter(
+    "artelipi_cache_hits_total", "Cache hits", ("cache",),
+    func=lambda: {(name,): cache.hits for name, cache in CACHES.items()}
+))
+REGISTRY.register(Counter(
+    "artelipi_cache_misses_total", "Cache misses", ("cache",),
+    func=lambda: {(name,): cache.misses for name, cache in CACHES.items()}
+))
+REGISTRY.register(Gauge(
+    "artelipi_model_bytes", "Bytes held by each model component", ("component",),
+    func=lambda: {(component,): size for component, size in recommender.model.nbytes().items()}
+))
+REGISTRY.register(Gauge("artelipi_model_articles", "Articles in the published model", func=lambda: len(recommender.model)))
+REGISTRY.register(Gauge("artelipi_model_version", "Version of the published model", func=lambda: recommender.model.version))
+REGISTRY.register(Gauge(
+    "artelipi_model_ml_enabled", "Whether the published model has similarity data", func=lambda: int(recommender.ml_enabled)
+))
+REGISTRY.register(Gauge("artelipi_ready", "Whether the model is loaded and queries are served", func=lambda: int(is_ready())))
+REGISTRY.register(Counter("artelipi_model_builds_total", "Background model rebuilds", func=lambda: scheduler.builds))
+REGISTRY.register(Counter(
+    "artelipi_model_build_errors_total", "Failed background model rebuilds", func=lambda: scheduler.build_errors
+))
+REGISTRY.register(Counter(
+    "artelipi_trending_updates_total", "Engagement updates applied to the trending index",
+    func=lambda: recommender.model.trending.updates
+))
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Request latency by route template (e.g. /recommendations/{article_id})"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            endpoint=route.path if route is not None else "unmatched",
+            status=status,
+        )
+
+
+async def run_blocking(func, *args, timeout=REQUEST_TIMEOUT):
+    """Run blocking work (Firestore I/O, model math) off the event loop"""
+    try:
+        return await asyncio.wait_for(run_in_threadpool(func, *args), timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Timed out after {timeout}s")
+
+
+def cached_query(func, *args):
+    """Run a recommender query against the cached corpus snapshot"""
+    corpus_cache.get()
+    return func(*args)
+
+
+def project(func, fields):
+    """Bind a `fields=` projection (card fields by default) to a recommender query"""
+    def query(*args):
+        return func(*args, fields=parse_fields(fields, recommender.model.columns))
+    return query
+
+
+def encode_response(payload):
+    """JSON body and its ETag"""
+    body = encode_json(payload)
+    return body, '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header covers `etag` (weak tags compare equal)"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def split_list(value):
+    """Items of a comma-separated query parameter"""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def verify_id_token(token):
+    """uid of a Firebase ID token, or None if the token is invalid or expired"""
+    from firebase_admin import auth
+    try:
+        return auth.verify_id_token(token, app=recommender.firebase_app())["uid"]
+    except (ValueError, auth.InvalidIdTokenError):
+        return None
+
+
+async def require_user(uid: str, authorization: Optional[str] = Header(None)):
+    """Only the signed-in user may read or update their own profile
+
+    Expects `Authorization: Bearer <Firebase ID token>` whose uid is the
+    `{uid}` in the path.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing Firebase ID token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    # The signing keys are fetched (and cached) over the network
+    token_uid = await run_blocking(verify_id_token, token)
+    if token_uid is None:
+        raise HTTPException(status_code=401, detail="Invalid Firebase ID token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if token_uid != uid:
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
+
+
+def rerank_options(diversity=0.0, max_per_author=None, tags=(), category=None, exclude=()):
+    """RerankOptions from request parameters (400 when out of range)"""
+    if not 0 <= diversity <= 1:
+        raise HTTPException(status_code=400, detail="diversity must be between 0 and 1")
+    if max_per_author is not None and max_per_author < 1:
+        raise HTTPException(status_code=400, detail="max_per_author must be at least 1")
+    if len(exclude) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Too many excluded articles (max {MAX_BATCH_SIZE})")
+    return RerankOptions(diversity, max_per_author, tags, category, exclude)
+
+
+def cached_recommendations(article_id, limit, fields, options):
+    """Encoded recommendations for an article, reused until the model changes"""
+    corpus_cache.get()
+    version = recommender.model.version
+    key = (article_id, limit, fields, options.key())
+    
+    cached = response_cache.get(key, version)
+    if cached is not None:
+        return cached
+    
+    recommendations = recommender.get_recommendations(
+        article_id, limit, parse_fields(fields, recommender.model.columns), options)
+    cached = encode_response({
+        "recommendations": recommendations,
+        "count": len(recommendations),
+        "ml_enabled": recommender.ml_enabled,
+        "source": "artelipi_platform"
+    })
+    response_cache.put(key, version, cached)
+    return cached
+
+
+def startup_load():
+    """Load the saved model, or load from Firestore and build one"""
+    if ROLE == "worker":
+        # The parent saved a generation before starting the workers
+        if not recommender.load_model(MODEL_PATH):
+            print("⚠️ No model generation yet; waiting for the parent to save one")
+        corpus_cache.prime(recommender.df)
+        watcher.start()
+        return
+    
+    # Try to load saved model first
+    if recommender.load_model(MODEL_PATH):
+        # Serve the saved snapshot, but refresh it on first use
+        corpus_cache.prime(recommender.df, loaded_at=0)
+    else:
+        # If no saved model, load from Firestore and build
+        print("No saved model found. Loading from Firestore...")
+        if not recommender.db:
             recommender.initialize_firebase()
-            recommender.load_artelipi_articles()
-            
-            if len(recommender.df) >= recommender.min_articles_for_ml:
-                recommender.build_ml_model()
-                recommender.save_model()
-            else:
-                print(f"⚠️ Only {len(recommender.df)} articles. ML disabled until {recommender.min_articles_for_ml} articles exist.")
+        recommender.reload()
         
+        if not recommender.ml_enabled:
+            print(f"⚠️ Only {len(recommender.model)} articles. ML disabled until {recommender.min_articles_for_ml} articles exist.")
+        if recommender.ml_enabled or ROLE == "parent":
+            # Workers need a generation to serve even without ML
+            save_if_changed()
+        corpus_cache.prime(recommender.df)
+    
+    if SYNC_MODE == "listener":
+        recommender.start_listener()
+    
+    scheduler.start()
+
+
+def run_startup_load():
+    """`startup_load()`, then open the model-dependent endpoints
+
+    A failed load still opens them: queries then load the corpus on demand
+    through the corpus cache, as they did before the startup load existed.
+    """
+    started = time.perf_counter()
+    try:
+        startup_load()
         print("✅ Artelipi Recommender ready!")
     except Exception as e:
+        startup_state["error"] = str(e)
         print(f"❌ Error loading recommender: {e}")
+    finally:
+        startup_state["seconds"] = round(time.perf_counter() - started, 3)
+        READY.set()
+
+
+def refresh_and_save():
+    if SYNC_MODE == "full" and recommender.sync_watermark is not None:
+        # An explicit refresh re-reads the corpus; TTL expiry never does
+        corpus_cache.prime(recommender.reload())
+    else:
+        corpus_cache.refresh()
+    if recommender.ml_enabled:
+        save_if_changed()
+
+
+# Load model on startup
+@app.on_event("startup")
+async def load_model():
+    """Load Artelipi articles and build model"""
+    if PROFILER_ENABLED:
+        try:
+            signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.toggle())
+        except (AttributeError, ValueError):
+            pass  # No SIGUSR2 (Windows) or not on the main thread; the endpoints still work
+    
+    if BACKGROUND_STARTUP:
+        threading.Thread(target=run_startup_load, name="startup-load", daemon=True).start()
+    else:
+        await run_blocking(run_startup_load, timeout=None)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background workers"""
+    profiler.stop()
+    watcher.stop()
+    scheduler.stop()
+    recommender.stop_listener()
 
 
 # API Endpoints
 @app.get("/")
 async def root():
     """Health check"""
-    article_count = len(recommender.df) if recommender.df is not None else 0
-    ml_enabled = recommender.similarity_matrix is not None
+    article_count = len(recommender.model)
+    ml_enabled = recommender.ml_enabled
     
     return {
         "status": "healthy",
@@ -77,82 +506,219 @@ async def health_check():
     return {"status": "ok"}
 
 
-@app.get("/trending")
-async def get_trending(limit: int = 10):
-    """Get trending articles (Artelipi only, based on engagement)"""
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the model is loaded and queries are served"""
+    ready = is_ready()
+    if not ready:
+        status = "loading"
+    else:
+        status = "degraded" if startup_state["error"] else "ready"
+    return FastJSONResponse({
+        "status": status,
+        "role": ROLE,
+        "generation": recommender.generation,
+        "article_count": len(recommender.model),
+        "ml_enabled": recommender.ml_enabled,
+        "startup_seconds": startup_state["seconds"],
+        "error": startup_state["error"],
+    }, status_code=200 if ready else 503, headers=None if ready else {"Retry-After": "5"})
+
+
+@app.get("/trending", response_model=ArticleListResponse)
+async def get_trending(limit: int = Query(10, ge=1, le=MAX_RESULTS_LIMIT), window: str = "all", fields: Optional[str] = None):
+    """Get trending articles (Artelipi only, time-decayed engagement)"""
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unknown window '{window}' (use one of: {', '.join(WINDOWS)})")
+    
     try:
-        # Refresh data from Firestore
-        recommender.load_artelipi_articles()
-        
-        trending = recommender.get_trending_articles(limit)
-        return {
+        # Use the cached corpus snapshot (refreshed in the background); the
+        # response is returned directly so it is not re-validated
+        trending = await run_blocking(cached_query, project(recommender.get_trending_articles, fields), limit, window)
+        return FastJSONResponse({
             "articles": trending,
             "count": len(trending),
+            "window": window,
             "source": "artelipi_platform"
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/recent")
-async def get_recent(limit: int = 10):
+@app.get("/recent", response_model=ArticleListResponse)
+async def get_recent(limit: int = Query(10, ge=1, le=MAX_RESULTS_LIMIT), fields: Optional[str] = None):
     """Get most recent articles (cold start fallback)"""
     try:
-        # Refresh data from Firestore
-        recommender.load_artelipi_articles()
-        
-        recent = recommender.get_recent_articles(limit)
-        return {
+        # Use the cached corpus snapshot (refreshed in the background)
+        recent = await run_blocking(cached_query, project(recommender.get_recent_articles, fields), limit)
+        return FastJSONResponse({
             "articles": recent,
             "count": len(recent),
             "source": "artelipi_platform"
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/recommendations/{article_id}")
-async def get_recommendations(article_id: str, limit: int = 5):
-    """Get recommendations for a specific article (Artelipi only)"""
+@app.get("/recommendations/{article_id}", response_model=RecommendationsResponse)
+async def get_recommendations(article_id: str, request: Request, limit: int = Query(5, ge=1, le=MAX_RESULTS_LIMIT),
+                              fields: Optional[str] = None, diversity: float = 0.0, max_per_author: Optional[int] = None,
+                              tags: Optional[str] = None, category: Optional[str] = None,
+                              exclude: Optional[str] = None):
+    """Get recommendations for a specific article (Artelipi only)
+    
+    `diversity` (0-1) spreads results over less similar articles,
+    `max_per_author` caps results per author, `tags` (comma-separated, all
+    required) and `category` filter them, and `exclude` lists article ids
+    to leave out (e.g. already read).
+    """
+    options = rerank_options(diversity, max_per_author, split_list(tags), category, split_list(exclude))
     try:
-        # Refresh data from Firestore
-        recommender.load_artelipi_articles()
+        # Responses only change when a new model is published
+        body, etag = await run_blocking(cached_recommendations, article_id, limit, fields, options)
         
-        # Rebuild model if needed
-        if len(recommender.df) >= recommender.min_articles_for_ml and recommender.similarity_matrix is None:
-            recommender.build_ml_model()
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={RESPONSE_MAX_AGE}, stale-while-revalidate={RESPONSE_MAX_AGE}"
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=FastJSONResponse.media_type, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/recommendations/user/{uid}", response_model=UserRecommendationsResponse,
+         dependencies=[Depends(require_user)])
+async def get_user_recommendations(uid: str, limit: int = Query(10, ge=1, le=MAX_RESULTS_LIMIT),
+                                   fields: Optional[str] = None):
+    """Personalized recommendations from a user's likes, bookmarks, reading list and follows"""
+    try:
+        # The profile is cached per user; only the first request reads Firestore
+        results = await run_blocking(cached_query, project(recommender.get_user_recommendations, fields), uid, limit)
         
-        recommendations = recommender.get_recommendations(article_id, limit)
+        return FastJSONResponse({
+            "uid": uid,
+            "recommendations": results["recommendations"],
+            "count": len(results["recommendations"]),
+            "strategy": results["strategy"],
+            "profile": results["profile"],
+            "source": "artelipi_platform"
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/users/{uid}/interactions", dependencies=[Depends(require_user)])
+async def record_interaction(uid: str, event: InteractionEvent):
+    """Update a cached user profile after a like/bookmark/reading-list/follow change"""
+    kind = INTERACTION_KINDS.get(event.kind)
+    if kind is None:
+        raise HTTPException(status_code=400, detail=f"Unknown kind '{event.kind}' (use one of: {', '.join(INTERACTION_KINDS)})")
+    
+    updated = await run_blocking(recommender.record_interaction, uid, kind, event.target_id, event.active)
+    return {"status": "updated" if updated else "not_cached"}
+
+
+@app.post("/recommendations/by-content", response_model=RecommendationsResponse)
+async def get_recommendations_by_content(content: str, limit: int = Query(5, ge=1, le=MAX_RESULTS_LIMIT),
+                                         fields: Optional[str] = None, diversity: float = 0.0, max_per_author: Optional[int] = None,
+                                         tags: Optional[str] = None, category: Optional[str] = None,
+                                         exclude: Optional[str] = None):
+    """Get recommendations based on content (Artelipi only)"""
+    options = rerank_options(diversity, max_per_author, split_list(tags), category, split_list(exclude))
+    try:
+        # Use the cached corpus snapshot (refreshed in the background)
+        query = functools.partial(recommender.get_recommendations_by_content, options=options)
+        recommendations = await run_blocking(cached_query, project(query, fields), content, limit)
         
-        return {
+        return FastJSONResponse({
             "recommendations": recommendations,
             "count": len(recommendations),
-            "ml_enabled": recommender.similarity_matrix is not None,
+            "ml_enabled": recommender.ml_enabled,
             "source": "artelipi_platform"
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/recommendations/by-content")
-async def get_recommendations_by_content(content: str, limit: int = 5):
-    """Get recommendations based on content (Artelipi only)"""
+@app.post("/recommendations/batch", response_model=BatchRecommendationsResponse)
+async def get_recommendations_batch(request: BatchRecommendationRequest):
+    """Get recommendations for many articles and/or content snippets in one call"""
+    if len(request.article_ids) + len(request.contents) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} items)")
+    options = rerank_options(request.diversity, request.max_per_author, request.tags, request.category, request.exclude)
+    
     try:
-        # Refresh data from Firestore
-        recommender.load_artelipi_articles()
+        # Use the cached corpus snapshot (refreshed in the background)
+        def batch():
+            fields = parse_fields(request.fields, recommender.model.columns)
+            by_article = recommender.get_recommendations_batch(request.article_ids, request.limit, fields, options)
+            by_content = recommender.get_recommendations_by_content_batch(
+                request.contents, request.limit, fields, options) if request.contents else []
+            return by_article, by_content
         
-        # Rebuild model if needed
-        if len(recommender.df) >= recommender.min_articles_for_ml and recommender.similarity_matrix is None:
-            recommender.build_ml_model()
+        by_article, by_content = await run_blocking(cached_query, batch)
         
-        recommendations = recommender.get_recommendations_by_content(content, limit)
+        return FastJSONResponse({
+            "by_article": dict(zip(request.article_ids, by_article)),
+            "by_content": by_content,
+            "count": len(by_article) + len(by_content),
+            "ml_enabled": recommender.ml_enabled,
+            "source": "artelipi_platform"
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search(q: str = "", tags: Optional[str] = None, category: Optional[str] = None,
+                 author: Optional[str] = None, author_ids: Optional[str] = None,
+                 offset: int = 0, limit: int = 20, fields: Optional[str] = None):
+    """Search articles (BM25) and authors (name/username prefix)
+    
+    `tags` is a comma-separated list that must all match and `author_ids`
+    one of author uids; without `q` the filtered articles are returned
+    newest first.
+    """
+    tag_list = split_list(tags)
+    author_id_list = split_list(author_ids)
+    if not (q.strip() or tag_list or category or author or author_id_list):
+        raise HTTPException(status_code=400, detail="Provide a query (q) or a tags/category/author/author_ids filter")
+    if len(author_id_list) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Too many author ids (max {MAX_BATCH_SIZE})")
+    if offset < 0 or not 0 < limit <= MAX_SEARCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"offset must be >= 0 and limit between 1 and {MAX_SEARCH_LIMIT}")
+    
+    try:
+        # Use the cached corpus snapshot (refreshed in the background)
+        query = functools.partial(recommender.search, author_ids=author_id_list)
+        results = await run_blocking(
+            cached_query, project(query, fields), q, tag_list, category, author, offset, limit)
         
-        return {
-            "recommendations": recommendations,
-            "count": len(recommendations),
-            "ml_enabled": recommender.similarity_matrix is not None,
+        return FastJSONResponse({
+            "query": q,
+            "articles": results["articles"],
+            "authors": results["authors"],
+            "total": results["total"],
+            "offset": offset,
+            "limit": limit,
             "source": "artelipi_platform"
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -161,44 +727,122 @@ async def get_recommendations_by_content(content: str, limit: int = 5):
 async def get_stats():
     """Get recommendation system statistics"""
     try:
-        article_count = len(recommender.df) if recommender.df is not None else 0
-        ml_enabled = recommender.similarity_matrix is not None
+        article_count = len(recommender.model)
+        ml_enabled = recommender.ml_enabled
+        ann = recommender.model.ann
         
         return {
             "total_articles": article_count,
             "ml_enabled": ml_enabled,
             "min_articles_for_ml": recommender.min_articles_for_ml,
+            "similarity_mode": f"top_{recommender.top_k}" if recommender.top_k else "dense",
+            "vectorizer": recommender.vectorizer_kind,
+            "ann_index": dict(ann.params(), nbytes=ann.nbytes) if ann is not None else None,
+            "search_index": {
+                "nbytes": recommender.model.search.nbytes if recommender.model.search is not None else None,
+                "authors": len(recommender.authors) if recommender.authors is not None else None,
+            },
             "data_source": "Artelipi Firestore Only",
-            "recommendation_strategy": "ML-based" if ml_enabled else "Rule-based (engagement + recency)"
+            "recommendation_strategy": "ML-based" if ml_enabled else "Rule-based (engagement + recency)",
+            "corpus_cache": corpus_cache.stats(),
+            "response_cache": response_cache.stats(),
+            "user_profiles": recommender.profiles.stats(),
+            "model": recommender.model_stats(),
+            "trending": recommender.model.trending.stats(),
+            "model_bytes": recommender.model.nbytes(),
+            "scheduler": scheduler.stats(),
+            "serving": {
+                "role": ROLE,
+                "pid": os.getpid(),
+                "ready": is_ready(),
+                "generation": recommender.generation,
+                "watcher": watcher.stats() if ROLE == "worker" else None,
+            }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics")
+async def metrics():
+    """Metrics of this process in the Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+# Bearer token for the /debug/profiler endpoints. Without one they only
+# answer clients on this host (behind a local reverse proxy, set a token)
+ADMIN_TOKEN = os.environ.get("ARTELIPI_ADMIN_TOKEN")
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+async def require_profiler(request: Request, authorization: Optional[str] = Header(None)):
+    """The profiler is off unless ARTELIPI_PROFILER=1, and then admin-only
+
+    Callers send `Authorization: Bearer <ARTELIPI_ADMIN_TOKEN>`, or connect
+    from localhost when no token is configured.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled (set ARTELIPI_PROFILER=1)")
+    if ADMIN_TOKEN:
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Missing or invalid admin token",
+                                headers={"WWW-Authenticate": "Bearer"})
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Profiler only available from localhost (or set ARTELIPI_ADMIN_TOKEN)")
+
+
+@app.get("/debug/profiler", dependencies=[Depends(require_profiler)])
+async def profiler_report(limit: int = 200):
+    """Collapsed stacks sampled so far in this process (flame graph input)"""
+    return Response(content=profiler.report(limit), media_type="text/plain")
+
+
+@app.post("/debug/profiler/start", dependencies=[Depends(require_profiler)])
+async def start_profiler(interval: Optional[float] = None):
+    """Start sampling this process (clears the previous profile)"""
+    started = profiler.start(interval)
+    return {"status": "started" if started else "already_running", "pid": os.getpid(), **profiler.stats()}
+
+
+@app.post("/debug/profiler/stop", dependencies=[Depends(require_profiler)])
+async def stop_profiler():
+    """Stop sampling; the report stays available at /debug/profiler"""
+    stopped = profiler.stop()
+    return {"status": "stopped" if stopped else "not_running", "pid": os.getpid(), **profiler.stats()}
+
+
 @app.post("/refresh")
 async def refresh_data():
     """Manually refresh articles from Firestore"""
+    if ROLE == "worker":
+        # Only the parent reads Firestore; every worker picks up its next generation
+        request_refresh()
+        return {
+            "status": "refresh_requested",
+            "generation": recommender.generation,
+            "article_count": len(recommender.model),
+            "ml_enabled": recommender.ml_enabled
+        }
+    
     try:
-        recommender.load_artelipi_articles()
-        
-        if len(recommender.df) >= recommender.min_articles_for_ml:
-            recommender.build_ml_model()
-            recommender.save_model()
+        await run_blocking(refresh_and_save, timeout=REFRESH_TIMEOUT)
         
         return {
             "status": "refreshed",
-            "article_count": len(recommender.df),
-            "ml_enabled": recommender.similarity_matrix is not None
+            "article_count": len(recommender.model),
+            "ml_enabled": recommender.ml_enabled
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Run the server
+# Run a single-process server (see artelipi_serve.py for multi-process serving)
 if __name__ == "__main__":
     uvicorn.run(
-        "artelipi_api_server:app",
+        app,
         host="0.0.0.0",
-        port=8000,
-        reload=True
+        port=int(os.environ.get("PORT", "8000"))
     )
@@ -0,0 +1,283 @@
+# Versioned, memory-mappable on-disk format for Artelipi models
+#
+# <path>/CURRENT                  name of the live generation (swapped atomically)
+# <path>/<generation>/manifest.json
+#     vocabulary.json, idf.npy    fitted TF-IDF vectorizer (no vocabulary if hashing)
+#     tfidf_{data,indices,indptr}.npy
+#     neighbor_{indices,scores}.npy  (top-K mode) or similarity.npy (dense mode)
+#     ann_{components,centroids,assignments}.npy  approximate content index, if built
+#     search_{data,indices,indptr,doc_lengths}.npy  search postings (terms x articles)
+#     retired.npy                 rows replaced or removed since the last full build
+#     articles/<column>.npy|.json    typed columnar corpus metadata
+#
+# Arrays are loaded with mmap_mode='r', so several workers share their pages.
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+
+from artelipi_neighbors import TopKNeighbors
+from artelipi_ann import ANN_INDEXES
+from artelipi_ingest import HashingTfidfVectorizer, article_frame
+
+FORMAT = "artelipi-model"
+FORMAT_VERSION = 1
+
+# TfidfVectorizer settings persisted in the manifest
+VECTORIZER_PARAMS = (
+    'lowercase', 'token_pattern', 'stop_words', 'ngram_range', 'max_df', 'min_df',
+    'max_features', 'norm', 'use_idf', 'smooth_idf', 'sublinear_tf',
+)
+
+# Article bodies are only needed while vectorizing and are not persisted
+SKIPPED_COLUMNS = ('content', 'full_content')
+
+
+class ArtifactError(Exception):
+    """Raised when a saved model is unreadable, incompatible or corrupt"""
+
+
+def current_generation(path):
+    """Name of the live generation under `path`, or None"""
+    try:
+        with open(os.path.join(path, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_columns(df, directory):
+    """Write each corpus column with its type: numbers/dates as .npy, text as .json"""
+    import pandas as pd
+
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for name in df.columns:
+        if name in SKIPPED_COLUMNS:
+            continue
+        series = df[name]
+        if name == 'createdAt' or pd.api.types.is_datetime64_any_dtype(series):
+            values = pd.to_datetime(series, utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+            columns.append({"name": name, "dtype": "datetime64[ns, UTC]", "file": f'articles/{name}.npy'})
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy()
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+            columns.append({"name": name, "dtype": str(values.dtype), "file": f'articles/{name}.npy'})
+        else:
+            with open(os.path.join(directory, f'{name}.json'), 'w', encoding='utf-8') as f:
+                json.dump(series.tolist(), f, ensure_ascii=False, default=str)
+            columns.append({"name": name, "dtype": "object", "file": f'articles/{name}.json'})
+    return columns
+
+
+def _load_columns(directory, columns, mmap_mode):
+    import pandas as pd
+
+    data = {}
+    for column in columns:
+        filename = os.path.join(directory, column["file"])
+        if column["file"].endswith('.npy'):
+            values = np.load(filename, mmap_mode=mmap_mode)
+            if column["dtype"] == "datetime64[ns, UTC]":
+                data[column["name"]] = pd.Series(values).dt.tz_localize('UTC')
+            else:
+                data[column["name"]] = values
+        else:
+            with open(filename, encoding='utf-8') as f:
+                data[column["name"]] = json.load(f)
+    return article_frame(data)
+
+
+def save_artifact(path, df, vectorizer, tfidf_matrix, similarity_matrix=None, neighbors=None,
+                  sync_watermark=None, model_version=None, keep=2, ann=None, search=None, retired=None):
+    """Write a new generation under `path` and make it current
+
+    The generation is written to a temporary directory first and published
+    by renaming it and atomically replacing CURRENT.
+    """
+    os.makedirs(path, exist_ok=True)
+    generation = f'gen-{time.time_ns()}'
+    tmp_dir = os.path.join(path, f'.tmp-{generation}-{os.getpid()}')
+    os.makedirs(tmp_dir)
+
+    try:
+        arrays = {}
+        hashing = isinstance(vectorizer, HashingTfidfVectorizer)
+        if vectorizer is not None:
+            if not hashing:
+                with open(os.path.join(tmp_dir, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+                    json.dump({term: int(i) for term, i in vectorizer.vocabulary_.items()}, f, ensure_ascii=False)
+            arrays['idf'] = vectorizer.idf_
+        if tfidf_matrix is not None:
+            tfidf_matrix = tfidf_matrix.tocsr()
+            arrays['tfidf_data'] = tfidf_matrix.data
+            arrays['tfidf_indices'] = tfidf_matrix.indices
+            arrays['tfidf_indptr'] = tfidf_matrix.indptr
+        if neighbors is not None:
+            arrays['neighbor_indices'] = neighbors.indices
+            arrays['neighbor_scores'] = neighbors.scores
+        if similarity_matrix is not None:
+            arrays['similarity'] = similarity_matrix
+        if ann is not None:
+            arrays['ann_components'] = ann.components
+            arrays['ann_centroids'] = ann.centroids
+            arrays['ann_assignments'] = ann.assignments
+        if search is not None:
+            postings = search.merged_postings()
+            arrays['search_data'] = postings.data
+            arrays['search_indices'] = postings.indices
+            arrays['search_indptr'] = postings.indptr
+            arrays['search_doc_lengths'] = search.doc_lengths
+        if retired is not None and len(retired):
+            arrays['retired'] = retired
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(values))
+
+        columns = _save_columns(df, os.path.join(tmp_dir, 'articles')) if df is not None else []
+
+        files = {}
+        for root, _, names in os.walk(tmp_dir):
+            for name in names:
+                filename = os.path.join(root, name)
+                rel = os.path.relpath(filename, tmp_dir)
+                files[rel] = {"sha256": _sha256(filename), "bytes": os.path.getsize(filename)}
+
+        manifest = {
+            "format": FORMAT,
+            "format_version": FORMAT_VERSION,
+            "generation": generation,
+            "model_version": model_version,
+            "created_at": time.time(),
+            "articles": len(df) - (len(retired) if retired is not None else 0) if df is not None else 0,
+            "sync_watermark": sync_watermark.isoformat() if sync_watermark is not None else None,
+            "vectorizer_kind": "hashing" if hashing else "tfidf",
+            "vectorizer": (vectorizer.get_params() if hashing else
+                           {name: vectorizer.get_params()[name] for name in VECTORIZER_PARAMS}) if vectorizer is not None else None,
+            "tfidf_shape": list(tfidf_matrix.shape) if tfidf_matrix is not None else None,
+            "neighbors_k": neighbors.k if neighbors is not None else None,
+            "ann": ann.params() if ann is not None else None,
+            "search_shape": [search.postings.shape[0], len(search.doc_lengths)] if search is not None else None,
+            "columns": columns,
+            "files": files,
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(tmp_dir, os.path.join(path, generation))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    current_tmp = os.path.join(path, f'CURRENT.tmp-{os.getpid()}')
+    with open(current_tmp, 'w') as f:
+        f.write(generation)
+    os.replace(current_tmp, os.path.join(path, 'CURRENT'))
+
+    # Old generations stay readable for workers that still map them
+    generations = sorted(name for name in os.listdir(path) if name.startswith('gen-'))
+    for old in generations[:-keep]:
+        shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+    return generation
+
+
+def load_artifact(path, generation=None, mmap=True, verify=False):
+    """Load a saved generation (the current one by default), or None if absent
+
+    Returns a dict with df, vectorizer, tfidf_matrix, similarity_matrix,
+    neighbors, ann, search_postings, search_doc_lengths, retired,
+    sync_watermark and manifest.
+    """
+    generation = generation or current_generation(path)
+    if generation is None:
+        return None
+    directory = os.path.join(path, generation)
+
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ArtifactError(f"Generation {generation} has no manifest")
+
+    if manifest.get("format") != FORMAT or manifest.get("format_version", 0) > FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported model format {manifest.get('format')} v{manifest.get('format_version')}")
+
+    if verify:
+        for rel, expected in manifest["files"].items():
+            if _sha256(os.path.join(directory, rel)) != expected["sha256"]:
+                raise ArtifactError(f"Checksum mismatch for {generation}/{rel}")
+
+    mmap_mode = 'r' if mmap else None
+
+    def array(name):
+        filename = os.path.join(directory, f'{name}.npy')
+        return np.load(filename, mmap_mode=mmap_mode) if os.path.exists(filename) else None
+
+    vectorizer = None
+    if manifest.get("vectorizer") is not None:
+        params = dict(manifest["vectorizer"])
+        params['ngram_range'] = tuple(params['ngram_range'])
+        if manifest.get("vectorizer_kind", "tfidf") == "hashing":
+            vectorizer = HashingTfidfVectorizer(**params)
+        else:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            vectorizer = TfidfVectorizer(**params)
+            with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+                vectorizer.vocabulary_ = json.load(f)
+        vectorizer.idf_ = np.asarray(array('idf'))
+
+    tfidf_matrix = None
+    if manifest.get("tfidf_shape") is not None:
+        tfidf_matrix = sparse.csr_matrix(
+            (array('tfidf_data'), array('tfidf_indices'), array('tfidf_indptr')),
+            shape=tuple(manifest["tfidf_shape"]),
+            copy=False,
+        )
+
+    neighbors = None
+    if manifest.get("neighbors_k") is not None:
+        neighbors = TopKNeighbors(array('neighbor_indices'), array('neighbor_scores'), manifest["neighbors_k"])
+
+    ann = None
+    if manifest.get("ann") is not None:
+        ann_class = ANN_INDEXES.get(manifest["ann"]["kind"])
+        if ann_class is None:
+            raise ArtifactError(f"Unknown ANN index kind {manifest['ann']['kind']}")
+        ann = ann_class(array('ann_components'), array('ann_centroids'), array('ann_assignments'), manifest["ann"]["n_probe"])
+
+    search_postings = None
+    if manifest.get("search_shape") is not None:
+        search_postings = sparse.csr_matrix(
+            (array('search_data'), array('search_indices'), array('search_indptr')),
+            shape=tuple(manifest["search_shape"]),
+            copy=False,
+        )
+
+    watermark = manifest.get("sync_watermark")
+    return {
+        "df": _load_columns(directory, manifest["columns"], mmap_mode),
+        "vectorizer": vectorizer,
+        "tfidf_matrix": tfidf_matrix,
+        "similarity_matrix": array('similarity'),
+        "neighbors": neighbors,
+        "ann": ann,
+        "search_postings": search_postings,
+        "search_doc_lengths": array('search_doc_lengths'),
+        "retired": array('retired'),
+        "sync_watermark": datetime.fromisoformat(watermark) if watermark else None,
+        "manifest": manifest,
+    }
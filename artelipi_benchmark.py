@@ -0,0 +1,640 @@
+# Benchmarks for the Artelipi recommender hot paths
+# Runs without Firebase credentials: the corpus is synthetic, served from an
+# in-memory Firestore (artelipi_fakestore.py) where the real load path needs one
+#
+#   python artelipi_benchmark.py --sizes 1000 10000 100000
+#   python artelipi_benchmark.py --sizes 10000 100000 --ann
+#   python artelipi_benchmark.py --sizes 1000 10000 --pipeline --endpoints --json run.json
+#   python artelipi_benchmark.py --sizes 1000 10000 --all --json new.json --compare run.json
+#   python artelipi_benchmark.py --sizes 10000 50000 --build --build-workers 1 2 4 8
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy
+import sklearn
+
+from artelipi_recommender import ArtelipiRecommender, RecommenderModel
+from artelipi_neighbors import TopKNeighbors, top_k_indices
+from artelipi_ann import IVFIndex
+from artelipi_fakestore import FakeFirestore
+from artelipi_parallel import build_neighbors, build_pool, fit_tfidf
+
+WORDS = (
+    "python data model learning web design music travel food art code science "
+    "health startup money writing history culture film books space climate "
+    "privacy security cloud mobile react career productivity philosophy poetry"
+).split()
+
+# Articles mostly draw words from one topic, so the corpus has clusters
+TOPICS = [WORDS[i::6] for i in range(6)]
+
+
+def synthetic_articles(n, seed=0, words_per_article=60):
+    """Corpus rows shaped like `ArtelipiRecommender._article_record()` output"""
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp("2025-01-01", tz="UTC")
+    articles = []
+    for i in range(n):
+        topic = TOPICS[rng.integers(len(TOPICS))]
+        words = np.where(rng.random(words_per_article) < 0.7,
+                         rng.choice(topic, size=words_per_article),
+                         rng.choice(WORDS, size=words_per_article))
+        articles.append({
+            'id': f'post{i}',
+            'title': ' '.join(words[:4]),
+            'content': ' '.join(words[4:]),
+            'author': f'author{i % 500}',
+            'slug': f'post-{i}',
+            'tags': list(words[:2]),
+            'likeCount': int(rng.poisson(5)),
+            'viewCount': int(rng.poisson(80)),
+            'bookmarkCount': int(rng.poisson(2)),
+            'createdAt': created + pd.Timedelta(minutes=i),
+        })
+    df = pd.DataFrame(articles)
+    df['full_content'] = df['title'] + ' ' + df['content']
+    return df
+
+
+# Categories offered by the editor (lib/constants.ts)
+CATEGORIES = ('Technology', 'Philosophy', 'Startups', 'Culture', 'Design', 'Science', 'Business', 'Health')
+
+SYLLABLES = [c + v for c in 'bcdfghklmnprstvz' for v in 'aeiou']
+
+
+def _zipf(n, a=1.1):
+    """Cumulative Zipf weights over n ranks, for sampling with searchsorted"""
+    weights = 1.0 / np.arange(1, n + 1) ** a
+    return np.cumsum(weights / weights.sum())
+
+
+def _sample(rng, cdf, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1)
+
+
+def _words(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES, size=rng.integers(2, 4))))
+    return rng.permutation(sorted(words))
+
+
+def synthetic_posts(n, seed=0, now=None, words_per_article=600, authors=None, draft_ratio=0.05):
+    """Firestore `posts` documents ({id: data}) shaped like the editor writes them
+
+    Bodies are HTML paragraphs with lognormal lengths around
+    `words_per_article`, drawn Zipf-wise from a category vocabulary mixed
+    with common words; 1-5 tags come from a Zipf-weighted pool per
+    category. Output per author is Zipf-distributed, views are lognormal
+    (scaled by author popularity) and likes/bookmarks are binomial draws
+    from them. Posts are spread over the year before `now`.
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+    vocabulary = _words(np.random.default_rng(0), 6000)
+    common, topical = vocabulary[:2000], vocabulary[2000:].reshape(len(CATEGORIES), -1)
+    common_cdf, topic_cdf = _zipf(len(common)), _zipf(topical.shape[1])
+    tag_pools = [topical[c, :40] for c in range(len(CATEGORIES))]
+    tag_cdf = _zipf(40, 1.3)
+
+    authors = authors or max(5, n // 25)
+    author_cdf = _zipf(authors, 1.2)
+    popularity = 1.0 / np.arange(1, authors + 1) ** 0.5
+
+    lengths = np.clip(rng.lognormal(np.log(words_per_article), 0.5, n), 80, 6000).astype(int)
+    categories = rng.integers(len(CATEGORIES), size=n)
+    author_ranks = _sample(rng, author_cdf, n)
+    created = now - rng.random(n) * 365 * 86400
+    views = (rng.lognormal(4.0, 1.4, n) * popularity[author_ranks] * 3).astype(int)
+    likes = rng.binomial(views, rng.beta(2, 40, n))
+    bookmarks = rng.binomial(likes, 0.2)
+
+    posts = {}
+    for i in range(n):
+        category = categories[i]
+        topic_words = rng.random(lengths[i]) < 0.6
+        words = np.where(topic_words,
+                         topical[category][_sample(rng, topic_cdf, lengths[i])],
+                         common[_sample(rng, common_cdf, lengths[i])])
+        paragraphs = [' '.join(words[start:start + 60]) for start in range(0, len(words), 60)]
+        title = ' '.join(words[:rng.integers(4, 10)]).capitalize()
+        tags = list(dict.fromkeys(tag_pools[category][_sample(rng, tag_cdf, rng.integers(1, 6))]))
+        created_at = pd.Timestamp(int(created[i]), unit='s', tz='UTC').to_pydatetime()
+        author = int(author_ranks[i])
+        posts[f'post{i}'] = {
+            'title': title,
+            'byline': ' '.join(words[10:20]),
+            'content': ''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs),
+            'authorId': f'user{author}',
+            'authorName': f'Author {author}',
+            'slug': f'{title.lower().replace(" ", "-")}-{i}',
+            'category': CATEGORIES[category],
+            'tags': tags,
+            'keywords': list(dict.fromkeys(topical[category][_sample(rng, topic_cdf, 5)])),
+            'views': int(views[i]),
+            'viewCount': int(views[i]),
+            'likeCount': int(likes[i]),
+            'bookmarkCount': int(bookmarks[i]),
+            'commentCount': int(rng.binomial(likes[i], 0.1)),
+            'status': 'draft' if rng.random() < draft_ratio else 'published',
+            'createdAt': created_at,
+            'updatedAt': created_at,
+        }
+    return posts
+
+
+def synthetic_firestore(n, seed=0, now=None, readers=200):
+    """A FakeFirestore with `n` posts, their authors and `readers` active readers
+
+    Readers like, bookmark and save posts mostly from one favorite category
+    and follow a few authors, so /recommendations/user/{uid} has history.
+    """
+    rng = np.random.default_rng(seed + 1)
+    posts = synthetic_posts(n, seed, now)
+    published = [post_id for post_id, post in posts.items() if post['status'] == 'published']
+    by_category = {}
+    for post_id in published:
+        by_category.setdefault(posts[post_id]['category'], []).append(post_id)
+    author_ids = sorted({post['authorId'] for post in posts.values()}, key=lambda uid: int(uid[4:]))
+
+    users = {uid: {'name': f'Author {uid[4:]}', 'username': f'author{uid[4:]}', 'photoURL': None,
+                   'readingList': [], 'following': []} for uid in author_ids}
+    likes = {}
+    bookmarks = {}
+    
+    def pick(favorite, count):
+        pool = favorite if favorite and rng.random() < 0.8 else published
+        return [pool[i] for i in rng.integers(len(pool), size=count)] if pool else []
+    
+    for r in range(readers):
+        uid = f'reader{r}'
+        favorite = by_category.get(CATEGORIES[rng.integers(len(CATEGORIES))], [])
+        for post_id in pick(favorite, int(rng.geometric(1 / 20))):
+            likes[f'{uid}_{post_id}'] = {'userId': uid, 'postId': post_id}
+        for post_id in pick(favorite, int(rng.geometric(1 / 5))):
+            bookmarks[f'{uid}_{post_id}'] = {'userId': uid, 'postId': post_id}
+        users[uid] = {
+            'name': f'Reader {r}',
+            'username': f'reader{r}',
+            'photoURL': None,
+            'readingList': list(dict.fromkeys(pick(favorite, int(rng.integers(0, 6))))),
+            'following': [author_ids[i] for i in rng.integers(len(author_ids), size=int(rng.integers(0, 6)))],
+        }
+
+    db = FakeFirestore()
+    db.load('posts', posts)
+    db.load('users', users)
+    db.load('likes', likes)
+    db.load('bookmarks', bookmarks)
+    return db
+
+
+def legacy_get_recommendations(df, similarity_matrix, article_id, limit=5):
+    """The pre-argpartition query path, kept for comparison"""
+    article_idx = df[df['id'] == article_id].index[0]
+    similarity_scores = list(enumerate(similarity_matrix[article_idx]))
+    similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
+    top_indices = [i[0] for i in similarity_scores[1:limit+1]]
+    recommendations = []
+    for idx in top_indices:
+        rec = df.iloc[idx].to_dict()
+        rec['similarity_score'] = similarity_scores[idx][1]
+        recommendations.append(rec)
+    return recommendations
+
+
+def time_calls(fn, args_list):
+    """Per-call latencies in milliseconds"""
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def summarize(latencies):
+    return {
+        "mean_ms": round(float(latencies.mean()), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "calls": int(len(latencies)),
+    }
+
+
+def bench_get_recommendations(n, requests=200, limit=5, k=50, seed=0):
+    """Per-request latency of get_recommendations() on an N-article corpus
+
+    The dense N x N matrix is stood in for by a broadcast view of one random
+    row, so every path does its real per-request work without O(N^2) memory.
+    """
+    rng = np.random.default_rng(seed)
+    df = synthetic_articles(n, seed)
+    row = rng.random(n)
+    similarity_matrix = np.broadcast_to(row, (n, n))
+    ids = [(f'post{i}',) for i in rng.integers(0, n, size=requests)]
+
+    recommender = ArtelipiRecommender(top_k=None)
+    recommender.model = RecommenderModel(df, similarity_matrix=similarity_matrix)
+
+    results = {}
+    legacy_ids = ids[:max(1, min(requests, 2_000_000 // n))]
+    results["legacy_sorted"] = summarize(time_calls(
+        lambda article_id: legacy_get_recommendations(df, similarity_matrix, article_id, limit), legacy_ids))
+    results["dense_argpartition"] = summarize(time_calls(
+        lambda article_id: recommender.get_recommendations(article_id, limit), ids))
+
+    recommender.model = RecommenderModel(df, neighbors=TopKNeighbors(
+        rng.integers(0, n, size=(n, k), dtype=np.int32),
+        np.sort(rng.random((n, k), dtype=np.float32), axis=1)[:, ::-1].copy(),
+        k,
+    ))
+    results["top_k_neighbors"] = summarize(time_calls(
+        lambda article_id: recommender.get_recommendations(article_id, limit), ids))
+    return results
+
+
+def bench_content_ann(n, queries=200, limit=10, probes=(1, 2, 4, 8, 16), seed=0):
+    """Recall@limit and latency of IVFIndex vs. exact get_recommendations_by_content()
+
+    Recall counts an approximate result as correct when its score reaches
+    the exact k-th best score, so ties between equal articles don't count
+    as misses.
+    """
+    df = synthetic_articles(n, seed)
+    drafts = [(text,) for text in synthetic_articles(queries, seed + 1)['full_content']]
+    
+    recommender = ArtelipiRecommender(top_k=None)
+    vectorizer = recommender._new_vectorizer()
+    tfidf = vectorizer.fit_transform(df['full_content'])
+    df = df.drop(columns=['content', 'full_content'])
+    
+    results = {}
+    recommender.model = RecommenderModel(df, vectorizer, tfidf)
+    results["exact"] = summarize(time_calls(
+        lambda content: recommender.get_recommendations_by_content(content, limit), drafts))
+    
+    query_vectors = vectorizer.transform([content for content, in drafts])
+    exact_scores = (query_vectors @ tfidf.T).toarray()
+    kth_best = np.array([scores[top_k_indices(scores, limit)[-1]] for scores in exact_scores])
+    
+    started = time.perf_counter()
+    ann = IVFIndex.build(tfidf)
+    results["ivf_build"] = {
+        "seconds": round(time.perf_counter() - started, 3),
+        "n_lists": ann.n_lists,
+        "nbytes": int(ann.nbytes),
+    }
+    recommender.model = RecommenderModel(df, vectorizer, tfidf, ann=ann)
+    
+    for n_probe in probes:
+        ann.n_probe = n_probe
+        stats = summarize(time_calls(
+            lambda content: recommender.get_recommendations_by_content(content, limit), drafts))
+        found = ann.search(query_vectors, tfidf, limit)
+        hits = [np.sum(scores >= kth - 1e-9) for (_, scores), kth in zip(found, kth_best)]
+        stats["recall_at_k"] = round(float(np.mean(hits)) / limit, 4)
+        results[f"ivf_probe_{n_probe}"] = stats
+    return results
+
+
+def _drafts(count, seed, words=120):
+    """Plain-text drafts for content queries (short enough for a query string)"""
+    posts = synthetic_posts(count, seed, words_per_article=words)
+    return [' '.join(post['content'].replace('<p>', ' ').replace('</p>', ' ').split()[:words]) for post in posts.values()]
+
+
+def bench_pipeline(n, requests=200, limit=5, seed=0, top_k=50, vectorizer_kind='tfidf'):
+    """End-to-end recommender timings against a FakeFirestore with n posts
+
+    Times load_artelipi_articles() and build_ml_model() once each (the
+    build streams the bodies again, as it does in production) and the
+    per-call latency of get_recommendations() and
+    get_recommendations_by_content().
+    """
+    rng = np.random.default_rng(seed)
+    db = synthetic_firestore(n, seed)
+    recommender = ArtelipiRecommender(db=db, top_k=top_k, vectorizer_kind=vectorizer_kind)
+
+    results = {}
+    reads, started = db.reads, time.perf_counter()
+    df = recommender.load_artelipi_articles()
+    results["load_artelipi_articles"] = {
+        "seconds": round(time.perf_counter() - started, 4),
+        "articles": len(df),
+        "documents_read": db.reads - reads,
+    }
+
+    reads, started = db.reads, time.perf_counter()
+    recommender.build_ml_model()
+    results["build_ml_model"] = {
+        "seconds": round(time.perf_counter() - started, 4),
+        "ml_enabled": recommender.ml_enabled,
+        "documents_read": db.reads - reads,
+        "model_bytes": {name: int(size) for name, size in recommender.model.nbytes().items()},
+    }
+
+    ids = recommender.model.columns['id']
+    article_ids = [(ids[i],) for i in rng.integers(len(ids), size=requests)]
+    results["get_recommendations"] = summarize(time_calls(
+        lambda article_id: recommender.get_recommendations(article_id, limit), article_ids))
+    drafts = [(text,) for text in _drafts(requests, seed + 2)]
+    results["get_recommendations_by_content"] = summarize(time_calls(
+        lambda content: recommender.get_recommendations_by_content(content, limit), drafts))
+    return results
+
+
+def _same_model(a, b):
+    """True when two (tfidf, vocabulary, neighbors) builds are bit-identical"""
+    (tfidf_a, vocabulary_a, neighbors_a), (tfidf_b, vocabulary_b, neighbors_b) = a, b
+    return (vocabulary_a == vocabulary_b
+            and all(np.array_equal(getattr(tfidf_a, name), getattr(tfidf_b, name))
+                    for name in ("indptr", "indices", "data"))
+            and np.array_equal(neighbors_a.indices, neighbors_b.indices)
+            and np.array_equal(neighbors_a.scores, neighbors_b.scores))
+
+
+def bench_build(n, workers=(1, 2, 4), seed=0, top_k=50):
+    """Full model build time against the number of processes
+
+    Times the two stages `_fit()` spreads over a pool (TF-IDF fit and
+    neighbor search, pool start-up included) on the texts the real load
+    path produces, and checks every parallel build matches the serial one.
+    """
+    recommender = ArtelipiRecommender(db=synthetic_firestore(n, seed, readers=0), top_k=top_k)
+    _, _, texts, _ = recommender._fetch_articles()
+
+    results = {}
+    serial = None
+    for count in sorted(set(workers) | {1}):
+        vectorizer = recommender._new_vectorizer()
+        started = time.perf_counter()
+        pool = build_pool(count) if count > 1 else None
+        try:
+            fit_started = time.perf_counter()
+            if pool is not None:
+                tfidf = fit_tfidf(vectorizer, texts, pool, count)
+            else:
+                tfidf = vectorizer.fit_transform(texts)
+            neighbors_started = time.perf_counter()
+            if pool is not None:
+                neighbors = build_neighbors(tfidf, top_k, pool, count)
+            else:
+                neighbors = TopKNeighbors.build(tfidf, top_k)
+            finished = time.perf_counter()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        build = (tfidf, vectorizer.vocabulary_, neighbors)
+        serial = serial or build
+        results[f"workers_{count}"] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "tfidf_fit_seconds": round(neighbors_started - fit_started, 4),
+            "neighbors_seconds": round(finished - neighbors_started, 4),
+            "identical_to_serial": _same_model(build, serial),
+        }
+    base = results["workers_1"]["seconds"]
+    for stats in results.values():
+        stats["speedup"] = round(base / stats["seconds"], 2)
+    return results
+
+
+def _endpoint_calls(recommender, requests, limit, seed):
+    """(name, [(method, url, json body)]) for every HTTP endpoint"""
+    rng = np.random.default_rng(seed)
+    model = recommender.model
+    ids = model.columns['id']
+    pick = lambda: ids[rng.integers(len(ids))]
+    tags = [tag for tags in model.columns['tags'][:200] for tag in tags] or ['python']
+    titles = model.columns['title']
+    categories = [category for category in model.columns['category'][:200] if category] or ['Technology']
+    drafts = _drafts(requests, seed + 2, words=60)
+    hot_ids = [pick() for _ in range(10)]
+
+    def repeat(make):
+        return [make(i) for i in range(requests)]
+
+    return [
+        ("GET /health", repeat(lambda i: ("GET", "/health", None))),
+        ("GET /trending", repeat(lambda i: ("GET", "/trending?limit=10", None))),
+        ("GET /trending?window=7d", repeat(lambda i: ("GET", "/trending?limit=10&window=7d", None))),
+        ("GET /recent", repeat(lambda i: ("GET", "/recent?limit=10", None))),
+        ("GET /recommendations/{id} (cold)", repeat(lambda i: ("GET", f"/recommendations/{pick()}?limit={limit}", None))),
+        ("GET /recommendations/{id} (cached)",
+         repeat(lambda i: ("GET", f"/recommendations/{hot_ids[i % len(hot_ids)]}?limit={limit}", None))),
+        ("GET /recommendations/{id} (re-ranked)",
+         repeat(lambda i: ("GET", f"/recommendations/{pick()}", {
+             "limit": limit, "diversity": 0.3, "max_per_author": 2,
+             "category": categories[rng.integers(len(categories))]}))),
+        ("POST /recommendations/by-content",
+         repeat(lambda i: ("POST", "/recommendations/by-content", {"content": drafts[i], "limit": limit}))),
+        ("POST /recommendations/batch",
+         repeat(lambda i: ("POST", "/recommendations/batch", {"article_ids": [pick() for _ in range(10)], "limit": limit}))),
+        ("GET /search?q=", repeat(lambda i: ("GET", "/search", {"q": ' '.join(titles[rng.integers(len(titles))].split()[:2])}))),
+        ("GET /search?tags=", repeat(lambda i: ("GET", "/search", {"tags": tags[rng.integers(len(tags))]}))),
+        ("GET /recommendations/user/{uid}",
+         repeat(lambda i: ("GET", f"/recommendations/user/reader{rng.integers(200)}?limit=10", None))),
+        ("GET /stats", repeat(lambda i: ("GET", "/stats", None))),
+        ("GET /metrics", repeat(lambda i: ("GET", "/metrics", None))),
+    ]
+
+
+def bench_endpoints(n, requests=200, limit=5, seed=0):
+    """Latency of every HTTP endpoint (in-process ASGI client) on n posts
+
+    The app starts as in production (load from the fake store, fit, save a
+    generation, in the background); startup reports the time to the first
+    /health answer and until /ready. The pipeline stage timings recorded
+    by /metrics during the run are reported alongside. Per-user endpoints
+    skip the Firebase ID token check; any other non-2xx answer fails the run.
+    """
+    from fastapi.testclient import TestClient
+    import artelipi_api_server as server
+    from artelipi_metrics import STAGE_SECONDS
+
+    db = synthetic_firestore(n, seed)
+    with tempfile.TemporaryDirectory() as path:
+        server.recommender.db = db
+        server.MODEL_PATH = path
+        # There is no Firebase project to sign tokens for the fake readers
+        server.app.dependency_overrides[server.require_user] = lambda: None
+        started = time.perf_counter()
+        with TestClient(server.app) as client:
+            client.get("/health")
+            health = time.perf_counter() - started
+            while client.get("/ready").status_code == 503:
+                time.sleep(0.01)
+            results = {"startup": {
+                "health_seconds": round(health, 4),
+                "seconds": round(time.perf_counter() - started, 4),
+                "documents_read": db.reads,
+            }}
+            for name, calls in _endpoint_calls(server.recommender, requests, limit, seed):
+                def call(method, url, body):
+                    if method == "GET":
+                        response = client.get(url, params=body)
+                    elif url.endswith("by-content"):
+                        response = client.post(url, params=body)
+                    else:
+                        response = client.post(url, json=body)
+                    if not 200 <= response.status_code < 300:
+                        raise RuntimeError(f"{name}: {method} {url} answered {response.status_code}: {response.text[:200]}")
+                call(*calls[0])  # Warm-up
+                results[name] = summarize(time_calls(call, calls))
+
+    results["stages"] = {
+        stage: {"count": count, "total_seconds": round(total, 4)}
+        for (stage,), (_, count, total) in STAGE_SECONDS._values.items()
+    }
+    return results
+
+
+def _isolated(func, *args):
+    """Run a benchmark in a fresh process, so sizes don't share caches or metrics"""
+    # Not a multiprocessing.Pool: its daemonic workers can't start the build's own pool
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+
+def environment():
+    """Where a report was produced, to tell runs apart when comparing"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "scikit_learn": sklearn.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def _timings(report, prefix=()):
+    """Flatten a report to {path: p50 ms or seconds} for comparison"""
+    flat = {}
+    for key, value in report.items():
+        if not isinstance(value, dict) or key in ("environment", "args"):
+            continue
+        path = prefix + (key,)
+        for metric in ("p50_ms", "seconds"):
+            if metric in value:
+                flat[" / ".join(path) + f" [{metric}]"] = value[metric]
+        flat.update(_timings(value, path))
+    return flat
+
+
+def compare(report, baseline):
+    """Print the change of every timing present in both reports"""
+    new, old = _timings(report), _timings(baseline)
+    print(f"\nCompared with {baseline.get('environment', {}).get('git_commit') or 'baseline'}:")
+    for path in sorted(set(new) & set(old)):
+        if old[path]:
+            change = (new[path] - old[path]) / old[path] * 100
+            print(f"  {path:<80} {old[path]:>10.3f} -> {new[path]:>10.3f} ({change:+.1f}%)")
+
+
+def _print_stats(suite, n, results):
+    for path, stats in results.items():
+        if "p50_ms" in stats:
+            print(f"{suite:<20} n={n:<7} {path:<36} "
+                  f"mean={stats['mean_ms']:.3f}ms p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
+        elif "seconds" in stats:
+            print(f"{suite:<20} n={n:<7} {path:<36} {stats['seconds']:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Artelipi recommender")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--ann", action="store_true", help="Also benchmark approximate content search")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Benchmark load/build/query through the recommender on a fake Firestore")
+    parser.add_argument("--endpoints", action="store_true", help="Benchmark every HTTP endpoint")
+    parser.add_argument("--build", action="store_true", help="Benchmark full model builds across processes")
+    parser.add_argument("--build-workers", type=int, nargs="+",
+                        default=sorted({w for w in (1, 2, 4, 8, 16) if w <= (os.cpu_count() or 1)} | {os.cpu_count() or 1}))
+    parser.add_argument("--all", action="store_true", help="Run every suite")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Print timing changes against an earlier --json report")
+    args = parser.parse_args()
+    if args.all:
+        args.ann = args.pipeline = args.endpoints = args.build = True
+
+    report = {"environment": environment(), "args": vars(args), "get_recommendations": {}}
+    for n in args.sizes:
+        results = bench_get_recommendations(n, args.requests, args.limit)
+        report["get_recommendations"][str(n)] = results
+        for path, stats in results.items():
+            print(f"get_recommendations  n={n:<7} {path:<20} "
+                  f"mean={stats['mean_ms']:.3f}ms p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
+
+    if args.ann:
+        report["content_ann"] = {}
+        for n in args.sizes:
+            results = bench_content_ann(n, args.requests, max(args.limit, 10), args.probes)
+            report["content_ann"][str(n)] = results
+            build = results.pop("ivf_build")
+            print(f"content_ann          n={n:<7} ivf build={build['seconds']:.1f}s "
+                  f"lists={build['n_lists']} size={build['nbytes'] / 1e6:.1f}MB")
+            for path, stats in results.items():
+                recall = f" recall@k={stats['recall_at_k']:.3f}" if "recall_at_k" in stats else ""
+                print(f"content_ann          n={n:<7} {path:<20} "
+                      f"mean={stats['mean_ms']:.3f}ms p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms{recall}")
+            results["ivf_build"] = build
+    
+    if args.pipeline:
+        report["pipeline"] = {}
+        for n in args.sizes:
+            results = _isolated(bench_pipeline, n, args.requests, args.limit, args.seed)
+            report["pipeline"][str(n)] = results
+            _print_stats("pipeline", n, results)
+    
+    if args.endpoints:
+        report["endpoints"] = {}
+        for n in args.sizes:
+            results = _isolated(bench_endpoints, n, args.requests, args.limit, args.seed)
+            report["endpoints"][str(n)] = results
+            _print_stats("endpoints", n, results)
+    
+    if args.build:
+        report["build"] = {}
+        for n in args.sizes:
+            results = _isolated(bench_build, n, args.build_workers, args.seed)
+            report["build"][str(n)] = results
+            for name, stats in results.items():
+                print(f"{'build':<20} n={n:<7} {name:<36} {stats['seconds']:.3f}s "
+                      f"(fit {stats['tfidf_fit_seconds']:.3f}s, neighbors {stats['neighbors_seconds']:.3f}s) "
+                      f"x{stats['speedup']} identical={stats['identical_to_serial']}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
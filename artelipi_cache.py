@@ -0,0 +1,196 @@
+# In-process caches for the Artelipi Recommendation API
+
+import threading
+from collections import OrderedDict
+import time
+
+
+class CorpusCache:
+    def __init__(self, loader, ttl=300):
+        """Cache the last good corpus snapshot returned by `loader`.
+
+        Stale snapshots keep being served while a single background refresh
+        runs; only the very first load blocks callers.
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.snapshot = None
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._inflight = None  # threading.Event of the running load, if any
+
+    def prime(self, snapshot, loaded_at=None):
+        """Seed the cache, e.g. with a model loaded from disk at startup.
+
+        Pass `loaded_at=0` to serve the snapshot but refresh it on first use.
+        """
+        with self._lock:
+            self.snapshot = snapshot
+            self.loaded_at = time.time() if loaded_at is None else loaded_at
+
+    def age(self):
+        """Seconds since the current snapshot was loaded (None if empty)"""
+        if self.loaded_at is None:
+            return None
+        return time.time() - self.loaded_at
+
+    def is_stale(self):
+        age = self.age()
+        return age is None or age >= self.ttl
+
+    def get(self):
+        """Return the current snapshot, refreshing it if needed"""
+        with self._lock:
+            if self.snapshot is not None:
+                self.hits += 1
+                if self.is_stale() and self._inflight is None:
+                    self._start_refresh_locked(background=True)
+                return self.snapshot
+
+            self.misses += 1
+            event = self._inflight
+            if event is None:
+                event = self._start_refresh_locked(background=False)
+                owner = True
+            else:
+                owner = False
+
+        if owner:
+            self._run_refresh(event)
+        else:
+            event.wait()
+
+        if self.snapshot is None and self.last_error is not None:
+            raise self.last_error
+        return self.snapshot
+
+    def refresh(self, wait=True):
+        """Force a reload, joining any refresh already in flight"""
+        with self._lock:
+            event = self._inflight
+            if event is None:
+                event = self._start_refresh_locked(background=not wait)
+                owner = wait
+            else:
+                owner = False
+
+        if owner:
+            self._run_refresh(event)
+        elif wait:
+            event.wait()
+
+        if wait and self.last_error is not None:
+            raise self.last_error
+        return self.snapshot
+
+    def _start_refresh_locked(self, background):
+        event = threading.Event()
+        self._inflight = event
+        if background:
+            thread = threading.Thread(
+                target=self._run_refresh,
+                args=(event,),
+                name="corpus-cache-refresh",
+                daemon=True,
+            )
+            thread.start()
+        return event
+
+    def _run_refresh(self, event):
+        try:
+            snapshot = self.loader()
+            with self._lock:
+                self.snapshot = snapshot
+                self.loaded_at = time.time()
+                self.refreshes += 1
+                self.last_error = None
+        except Exception as e:
+            print(f"⚠️ Corpus refresh failed, serving last snapshot: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+                self.last_error = e
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+    def stats(self):
+        age = self.age()
+        total = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "stale": self.is_stale(),
+            "refreshing": self._inflight is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+
+class ResponseCache:
+    def __init__(self, maxsize=4096):
+        """Size-bounded LRU cache of encoded responses for one model version
+
+        Entries are only valid for the model version they were computed
+        from; the first lookup with a newer version drops them all.
+        """
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version_locked(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        """Cached value for `key` under model `version`, or None"""
+        with self._lock:
+            self._check_version_locked(version)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            if self.version is not None and version < self.version:
+                return  # Computed from a model that has since been replaced
+            self._check_version_locked(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "maxsize": self.maxsize,
+            "size": len(self._entries),
+            "model_version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
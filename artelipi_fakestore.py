@@ -0,0 +1,225 @@
+# In-memory stand-in for the parts of the Firestore client the recommender uses
+# Lets benchmarks and local runs exercise the real load/sync/listener code
+# without Firebase credentials:
+#
+#   db = FakeFirestore()
+#   db.collection('posts').document('p1').set({...})
+#   recommender = ArtelipiRecommender(db=db)
+
+import itertools
+import threading
+
+# Comparison operators supported by FakeQuery.where()
+OPERATORS = {
+    '==': lambda value, target: value == target,
+    '!=': lambda value, target: value != target,
+    '<': lambda value, target: value < target,
+    '<=': lambda value, target: value <= target,
+    '>': lambda value, target: value > target,
+    '>=': lambda value, target: value >= target,
+    'in': lambda value, target: value in target,
+    'array_contains': lambda value, target: isinstance(value, list) and target in value,
+}
+
+_MISSING = object()
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeChange:
+    class Type:
+        def __init__(self, name):
+            self.name = name
+
+    def __init__(self, kind, document):
+        self.type = FakeChange.Type(kind)  # ADDED, MODIFIED or REMOVED
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, collection, callback):
+        self.collection = collection
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self.collection.store.lock:
+            if self in self.collection.watches:
+                self.collection.watches.remove(self)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self):
+        self.collection.store.reads += 1
+        with self.collection.store.lock:
+            return FakeDocumentSnapshot(self.id, self.collection.docs.get(self.id))
+
+    def set(self, data, merge=False):
+        with self.collection.store.lock:
+            current = self.collection.docs.get(self.id)
+            kind = 'ADDED' if current is None else 'MODIFIED'
+            self.collection.docs[self.id] = dict(current or {}, **data) if merge else dict(data)
+        self.collection.notify(kind, self.id)
+
+    def update(self, data):
+        with self.collection.store.lock:
+            if self.id not in self.collection.docs:
+                raise KeyError(f"No document to update: {self.collection.name}/{self.id}")
+        self.set(data, merge=True)
+
+    def delete(self):
+        with self.collection.store.lock:
+            if self.collection.docs.pop(self.id, None) is None:
+                return
+        self.collection.notify('REMOVED', self.id)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), order=None, limit=None, cursor=None, fields=None):
+        self.collection = collection
+        self.filters = tuple(filters)
+        self.order = order
+        self._limit = limit
+        self.cursor = cursor
+        self.fields = fields  # Projection set by select(), None for whole documents
+
+    def _copy(self, **changes):
+        args = dict(filters=self.filters, order=self.order, limit=self._limit, cursor=self.cursor, fields=self.fields)
+        args.update(changes)
+        return FakeQuery(self.collection, **args)
+
+    def where(self, field, op, value):
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator {op!r}")
+        return self._copy(filters=self.filters + ((field, op, value),))
+
+    def order_by(self, field):
+        return self._copy(order=field)
+
+    def select(self, field_paths):
+        return self._copy(fields=tuple(field_paths))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document):
+        return self._copy(cursor=self._sort_key(document.id, document.to_dict()))
+
+    def _sort_key(self, doc_id, data):
+        if self.order in (None, '__name__'):
+            return (doc_id,)
+        return (data.get(self.order), doc_id)
+
+    def _matches(self, data):
+        for field, op, target in self.filters:
+            value = data.get(field, _MISSING)
+            # Like Firestore, documents without the field never match
+            if value is _MISSING or value is None and op not in ('==', '!='):
+                return False
+            try:
+                if not OPERATORS[op](value, target):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def stream(self):
+        with self.collection.store.lock:
+            items = [(doc_id, dict(data)) for doc_id, data in self.collection.docs.items() if self._matches(data)]
+        if self.order not in (None, '__name__'):
+            items = [(doc_id, data) for doc_id, data in items if data.get(self.order) is not None]
+        items.sort(key=lambda item: self._sort_key(*item))
+        if self.cursor is not None:
+            items = [item for item in items if self._sort_key(*item) > self.cursor]
+        if self._limit is not None:
+            items = items[:self._limit]
+        self.collection.store.reads += len(items)
+        for doc_id, data in items:
+            if self.fields is not None:
+                data = {field: data[field] for field in self.fields if field in data}
+            yield FakeDocumentSnapshot(doc_id, data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store, name):
+        super().__init__(self)
+        self.store = store
+        self.name = name
+        self.docs = {}
+        self.watches = []
+        self._ids = itertools.count()
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            doc_id = f'{self.name}-{next(self._ids)}'
+        return FakeDocumentReference(self, doc_id)
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def on_snapshot(self, callback):
+        """Call `callback(snapshot, changes, read_time)` with every document, then on each write"""
+        watch = FakeWatch(self, callback)
+        with self.store.lock:
+            self.watches.append(watch)
+            changes = [FakeChange('ADDED', FakeDocumentSnapshot(doc_id, dict(data)))
+                       for doc_id, data in self.docs.items()]
+        self.store.reads += len(changes)
+        callback(None, changes, None)
+        return watch
+
+    def notify(self, kind, doc_id):
+        with self.store.lock:
+            watches = list(self.watches)
+            data = self.docs.get(doc_id)
+        if not watches:
+            return
+        change = FakeChange(kind, FakeDocumentSnapshot(doc_id, dict(data) if data is not None else None))
+        for watch in watches:
+            self.store.reads += 1
+            watch.callback(None, [change], None)
+
+
+class FakeFirestore:
+    def __init__(self):
+        """Collections of plain dicts behind the Firestore query API
+
+        Supports where/select/order_by/limit/start_after/stream, document
+        get/set/update/delete and collection on_snapshot listeners (delivered
+        synchronously). `reads` counts documents returned, as Firestore bills.
+        """
+        self.collections = {}
+        self.reads = 0
+        self.lock = threading.RLock()
+
+    def collection(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self, name)
+            return self.collections[name]
+
+    def load(self, name, documents):
+        """Bulk-insert {doc_id: data} into a collection (no listener events)"""
+        collection = self.collection(name)
+        with self.lock:
+            collection.docs.update((doc_id, dict(data)) for doc_id, data in documents.items())
+        return collection
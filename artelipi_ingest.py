@@ -0,0 +1,130 @@
+# Streaming, memory-bounded corpus ingestion for the Artelipi recommender
+
+import numpy as np
+from scipy import sparse
+
+
+def stream_published_posts(db, page_size=500):
+    """Yield pages of published post documents using query cursors
+
+    Only one page of documents (and their bodies) is held at a time.
+    """
+    return stream_documents(db.collection('posts').where('status', '==', 'published'), page_size)
+
+
+def stream_documents(query, page_size=500):
+    """Yield pages of the documents matched by `query`, in document id order"""
+    query = query.order_by('__name__').limit(page_size)
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc is not None else query
+        docs = list(page_query.stream())
+        if not docs:
+            break
+        yield docs
+        if len(docs) < page_size:
+            break
+        last_doc = docs[-1]
+
+
+class HashingTfidfVectorizer:
+    def __init__(self, n_features=2 ** 18, stop_words='english', ngram_range=(1, 2)):
+        """Stateless HashingVectorizer + TfidfTransformer
+
+        Needs no vocabulary pass, so each page of articles can be turned into
+        term counts as it arrives and its bodies dropped right away. Only the
+        IDF weights are fitted, from the stacked counts.
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+
+        self.n_features = n_features
+        self.stop_words = stop_words
+        self.ngram_range = tuple(ngram_range)
+        self.hashing = HashingVectorizer(
+            n_features=n_features,
+            stop_words=stop_words,
+            ngram_range=self.ngram_range,
+            alternate_sign=False,
+            norm=None,
+        )
+        self.transformer = TfidfTransformer()
+
+    def get_params(self):
+        return {
+            'n_features': self.n_features,
+            'stop_words': self.stop_words,
+            'ngram_range': list(self.ngram_range),
+        }
+
+    @property
+    def idf_(self):
+        return self.transformer.idf_
+
+    @idf_.setter
+    def idf_(self, value):
+        self.transformer.idf_ = value
+
+    def count(self, texts):
+        """Hashed term counts for a chunk of texts (no fitted state needed)"""
+        return self.hashing.transform(texts)
+
+    def fit_counts(self, counts):
+        """Fit IDF on stacked counts and turn them into TF-IDF rows in place"""
+        from sklearn.preprocessing import normalize
+
+        self.transformer.fit(counts)
+        counts = counts.tocsr()
+        counts.data *= self.transformer.idf_[counts.indices]
+        return normalize(counts, copy=False)
+
+    def fit_transform(self, texts):
+        return self.fit_counts(self.count(texts))
+
+    def transform(self, texts):
+        return self.transformer.transform(self.count(texts))
+
+
+def article_frame(data):
+    """DataFrame of article records (or columns) with None for missing values
+
+    pandas 3 stores text columns with a str dtype, where a missing value
+    (e.g. `category: null`) becomes NaN; they are kept as objects instead.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(data)
+    for name in df.columns:
+        if pd.api.types.is_string_dtype(df[name]) and df[name].dtype != object:
+            df[name] = df[name].astype(object).where(df[name].notna(), None)
+    return df
+
+
+def stack_counts(chunks, n_features):
+    """vstack count chunks (an empty corpus gives a 0-row matrix)"""
+    if not chunks:
+        return sparse.csr_matrix((0, n_features))
+    return sparse.vstack(chunks, format='csr')
+
+
+def reweight_tfidf(vectorizer, matrix):
+    """Refit the IDF weights of a fitted vectorizer on its own TF-IDF rows
+
+    Rows are l2-normalized (counts * idf), so rescaling each term by
+    new_idf / old_idf and renormalizing gives exactly the rows a fit on the
+    same texts would, without the texts. The vocabulary itself (for
+    'tfidf') stays the one chosen by the last fit on texts. Returns
+    (vectorizer, matrix); the inputs are not modified.
+    """
+    import copy
+    from sklearn.preprocessing import normalize
+
+    matrix = matrix.tocsr(copy=True)
+    matrix.eliminate_zeros()
+    doc_freq = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    # TfidfTransformer's default smooth_idf
+    idf = np.log((1 + matrix.shape[0]) / (1 + doc_freq)) + 1
+    matrix.data *= (idf / vectorizer.idf_)[matrix.indices]
+
+    vectorizer = copy.deepcopy(vectorizer)
+    vectorizer.idf_ = idf
+    return vectorizer, normalize(matrix, copy=False)
@@ -0,0 +1,293 @@
+# Prometheus-style metrics and an opt-in sampling profiler for the Artelipi API
+#
+# Metrics are kept per process and rendered in the Prometheus text format
+# (version 0.0.4) at /metrics.
+
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+# Histogram buckets in seconds: sub-millisecond queries up to full rebuilds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, help, labelnames=(), func=None):
+        """A metric family; `func` returns its samples at scrape time instead
+
+        `func` returns a number, or a dict of label-value tuples -> number.
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) for every series"""
+        if self.func is not None:
+            values = self.func()
+            if values is None:
+                return []
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [('', key, (), value) for key, value in values.items() if value is not None]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), count, total) for key, (counts, count, total) in self._values.items()}
+        samples = []
+        for key, (counts, count, total) in values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(('_bucket', key, (('le', _number(float(bound))),), cumulative))
+            samples.append(('_bucket', key, (('le', '+Inf'),), count))
+            samples.append(('_count', key, (), count))
+            samples.append(('_sum', key, (), total))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric (an already registered name returns the existing one)"""
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing callback must not break the whole scrape
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Content type of the text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'artelipi_stage_seconds',
+    'Duration of model pipeline stages (Firestore reads, DataFrame, TF-IDF fit, similarity, encoding, ...)',
+    ('stage',),
+))
+DOCUMENTS_READ = REGISTRY.register(Counter(
+    'artelipi_firestore_documents_read_total',
+    'Firestore documents read, by collection',
+    ('collection',),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'artelipi_request_seconds',
+    'HTTP request latency by endpoint',
+    ('method', 'endpoint', 'status'),
+))
+
+
+def timed(stage):
+    """Context manager recording a pipeline stage in artelipi_stage_seconds"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def read_pages(pages, collection):
+    """Pass through pages of Firestore documents, timing reads and counting docs
+
+    Only the waits on the stream count as 'firestore_read'; the caller's
+    work on each page is not included.
+    """
+    pages = iter(pages)
+    while True:
+        started = time.perf_counter()
+        try:
+            docs = next(pages)
+        except StopIteration:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage='firestore_read')
+            return
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='firestore_read')
+        DOCUMENTS_READ.inc(len(docs), collection=collection)
+        yield docs
+
+
+# Innermost frames of threads parked on a lock, queue or selector
+IDLE_FILES = ('threading.py', 'queue.py', 'selectors.py')
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, include_idle=False):
+        """Statistical profiler for a live process (off until started)
+
+        A background thread samples the Python stack of every other thread
+        each `interval` seconds and tallies them as collapsed stacks
+        ("outer;...;inner count"), the input format of flame graph tools.
+        Threads waiting in IDLE_FILES are skipped unless `include_idle`.
+        """
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = _Tally()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval=None):
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.interval = interval or self.interval
+            self.stacks = _Tally()
+            self.samples = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return False
+            self._stop.set()
+            self._thread = None
+        thread.join(timeout=5)
+        self.stopped_at = time.time()
+        return True
+
+    def toggle(self, path=None):
+        """Start, or stop and write the report to `path` (e.g. from a signal)"""
+        if self.start():
+            print(f"✅ Sampling profiler started in pid {os.getpid()}")
+            return None
+        self.stop()
+        path = path or f"artelipi-profile-{os.getpid()}-{int(self.stopped_at)}.txt"
+        with open(path, 'w') as f:
+            f.write(self.report())
+        print(f"✅ Sampling profile ({self.samples} samples) written to {path}")
+        return path
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not self.include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def report(self, limit=None):
+        """Collapsed stacks, most sampled first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common(limit))
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
@@ -0,0 +1,186 @@
+# Compact top-K nearest-neighbor lists for Artelipi article similarity
+# Replaces the dense N x N cosine similarity matrix: memory is O(N * K)
+
+import numpy as np
+
+# Upper bound on the dense (rows x N) similarity block held at once
+BLOCK_ELEMENTS = 1 << 24
+
+
+def top_k_indices(scores, k):
+    """Indices of the k largest scores, best first (argpartition + sort of k)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(scores, -k)[-k:]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def top_k_matrix(scores, k):
+    """Row-wise top-k of a 2-D score array: (indices, scores), best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def block_rows(n_articles, block_size=None):
+    """Rows per similarity block so a block stays within BLOCK_ELEMENTS"""
+    if block_size:
+        return block_size
+    return max(1, BLOCK_ELEMENTS // max(n_articles, 1))
+
+
+def top_k_rows(matrix, rows, k, block_size=None):
+    """Top-k neighbors (excluding self) of the given rows of an L2-normalized matrix
+
+    Cosine similarity is computed one sparse block of rows at a time, so only
+    a (block x N) slice is ever dense.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    if k == 0 or len(rows) == 0:
+        return indices, scores
+
+    matrix_t = matrix.T.tocsc()
+    step = block_rows(matrix.shape[0], block_size)
+    for start in range(0, len(rows), step):
+        block = rows[start:start + step]
+        sims = (matrix[block] @ matrix_t).toarray().astype(np.float32, copy=False)
+        sims[np.arange(len(block)), block] = -np.inf
+        indices[start:start + len(block)], scores[start:start + len(block)] = top_k_matrix(sims, k)
+    return indices, scores
+
+
+def similarity_block(rows, matrix, transposed):
+    """Dense cosine similarities of the CSR `rows` to every row of `matrix`
+
+    `transposed` is the transpose (as CSR) of the first rows of `matrix`,
+    kept across incremental updates so the whole matrix is never transposed
+    again; rows appended after it are multiplied directly.
+    """
+    n_cached = transposed.shape[1]
+    sims = np.empty((rows.shape[0], matrix.shape[0]), dtype=np.float32)
+    sims[:, :n_cached] = (rows @ transposed).toarray()
+    if matrix.shape[0] > n_cached:
+        sims[:, n_cached:] = (rows @ matrix[n_cached:].T).toarray()
+    return sims
+
+
+class TopKNeighbors:
+    def __init__(self, indices, scores, k):
+        """Per-article neighbor lists, sorted by descending similarity"""
+        self.indices = indices  # (N, k) int32 row positions
+        self.scores = scores    # (N, k) float32 cosine similarities
+        self.k = k              # Requested K (lists are shorter if N <= K)
+
+    @classmethod
+    def build(cls, matrix, k, block_size=None):
+        n = matrix.shape[0]
+        width = min(k, max(n - 1, 0))
+        indices, scores = top_k_rows(matrix, np.arange(n), width, block_size)
+        return cls(indices, scores, k)
+
+    @property
+    def width(self):
+        return self.indices.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.scores.nbytes
+
+    def neighbors(self, row, limit):
+        """(row positions, scores) of the `limit` nearest neighbors of `row`"""
+        limit = max(0, min(limit, self.width))
+        indices, scores = self.indices[row, :limit], self.scores[row, :limit]
+        if limit > 0 and indices[-1] < 0:
+            # Lists that lost retired neighbors end in -1 padding
+            valid = indices >= 0
+            return indices[valid], scores[valid]
+        return indices, scores
+
+    def patched(self, matrix, retired, similarities, block_size=None):
+        """Neighbor lists after an incremental corpus change
+
+        Rows never move between full builds: rows of `matrix` past the
+        current lists were appended, and the newly `retired` rows (sorted)
+        leave every list, which then ends in -1 padding until the next build
+        rather than being searched again. `similarities(rows)` gives the
+        dense similarities of the given rows to every row, with all retired
+        rows at -inf. A list takes an appended row only where it beats the
+        list's last entry, so every list stays a prefix of the exact one.
+        """
+        n = matrix.shape[0]
+        width = min(self.k, max(n - 1, 0))
+        # A small corpus outgrowing its lists is recomputed in full
+        n_old = self.indices.shape[0] if width == self.width else 0
+
+        indices = np.full((n, width), -1, dtype=np.int32)
+        scores = np.full((n, width), -np.inf, dtype=np.float32)
+        if width == 0:
+            return TopKNeighbors(indices, scores, self.k)
+        if n_old:
+            indices[:n_old] = self.indices
+            scores[:n_old] = self.scores
+
+        if n_old and len(retired):
+            # One extra slot so existing -1 padding maps to "not retired"
+            gone = np.zeros(n_old + 1, dtype=bool)
+            gone[retired] = True
+            gone = gone[indices[:n_old]]
+            rows = np.flatnonzero(gone.any(axis=1))
+            self._drop(indices, scores, rows, gone[rows])
+
+        step = block_rows(n, block_size)
+        for start in range(n_old, n, step):
+            block = np.arange(start, min(start + step, n))
+            sims = similarities(block)
+            sims[np.arange(len(block)), block] = -np.inf
+            indices[block], scores[block] = top_k_matrix(sims, width)
+            self._pad(indices, scores, block)
+            if n_old:
+                self._merge(indices, scores, n_old, block, sims[:, :n_old].T)
+        return TopKNeighbors(indices, scores, self.k)
+
+    @staticmethod
+    def _pad(indices, scores, rows):
+        """Mark -inf entries (retired rows, or too few live ones) as padding"""
+        row_indices = indices[rows]
+        row_indices[np.isneginf(scores[rows])] = -1
+        indices[rows] = row_indices
+
+    @staticmethod
+    def _drop(indices, scores, rows, gone):
+        """Remove the `gone` entries of `rows` in place, padding the lists at the end"""
+        if len(rows) == 0:
+            return
+        row_indices, row_scores = indices[rows], scores[rows]
+        row_indices[gone] = -1
+        row_scores[gone] = -np.inf
+        order = np.argsort(-row_scores, axis=1, kind='stable')
+        indices[rows] = np.take_along_axis(row_indices, order, axis=1)
+        scores[rows] = np.take_along_axis(row_scores, order, axis=1)
+
+    @staticmethod
+    def _merge(indices, scores, n_old, block, cross):
+        """Insert the appended `block` rows into the first `n_old` lists in place
+
+        `cross` holds their (n_old x block) similarities. Padding is not a
+        free slot: a row only enters a list above the list's last real entry.
+        """
+        last = scores[:n_old]
+        floor = np.where(np.isneginf(last), np.inf, last).min(axis=1)
+        rows = np.flatnonzero((cross > floor[:, None]).any(axis=1))
+        if len(rows) == 0:
+            return
+        candidates = np.where(cross[rows] > floor[rows, None], cross[rows], -np.inf)
+        merged = np.hstack([indices[rows], np.broadcast_to(block, (len(rows), len(block)))])
+        top, top_scores = top_k_matrix(np.hstack([scores[rows], candidates]), indices.shape[1])
+        indices[rows] = np.take_along_axis(merged, top, axis=1)
+        scores[rows] = top_scores
+        TopKNeighbors._pad(indices, scores, rows)
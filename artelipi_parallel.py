@@ -0,0 +1,215 @@
+# Multi-process model builds for the Artelipi recommender
+#
+# Output is identical to the serial build. The corpus is tokenized in
+# contiguous shards whose vocabularies merge back into the first-seen order
+# a single TfidfVectorizer pass would assign, before the same pruning; and
+# neighbor lists are computed in row ranges, since a row's scores don't
+# depend on which block it is computed in.
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Integral
+
+import numpy as np
+from scipy import sparse
+
+from artelipi_neighbors import TopKNeighbors, top_k_rows
+
+# Below this many articles starting a pool costs more than it saves
+PARALLEL_MIN_ARTICLES = 2000
+
+# Slow imports done once by the fork server rather than by every worker
+PRELOAD = ['numpy', 'scipy.sparse', 'sklearn.feature_extraction.text']
+
+# Row ranges per worker for the neighbor search (evens out slow ranges)
+TASKS_PER_WORKER = 4
+
+
+def build_pool(workers):
+    """Process pool for one build
+
+    Builds run on background threads of the API server, so workers are
+    started from a fork server (or spawned) rather than forked mid-request.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Imported once in the server instead of in every worker
+        context.set_forkserver_preload(PRELOAD)
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+
+def split_rows(n, parts):
+    """Contiguous (start, stop) ranges covering n rows in at most `parts` pieces"""
+    bounds = np.linspace(0, n, max(parts, 1) + 1).astype(np.int64)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def count_terms(vectorizer, texts):
+    """Term counts of a shard: (terms in first-seen order, CSR counts)
+
+    The counting loop of CountVectorizer, with the vectorizer's analyzer.
+    """
+    analyze = vectorizer.build_analyzer()
+    vocabulary = {}
+    indices = []
+    values = []
+    indptr = [0]
+    for text in texts:
+        counts = {}
+        for term in analyze(text):
+            column = vocabulary.setdefault(term, len(vocabulary))
+            counts[column] = counts.get(column, 0) + 1
+        indices.extend(counts)
+        values.extend(counts.values())
+        indptr.append(len(indices))
+    counts = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.intc), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(texts), len(vocabulary)),
+    )
+    return list(vocabulary), counts
+
+
+def merge_counts(shards, dtype=np.float64):
+    """Stack shard counts under one vocabulary: (terms in first-seen order, counts)"""
+    vocabulary = {}
+    data, indices, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+    rows = 0
+    for terms, counts in shards:
+        columns = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for term in terms),
+                              dtype=np.int64, count=len(terms))
+        data.append(counts.data)
+        indices.append(columns[counts.indices])
+        indptr.append(counts.indptr[1:] + indptr[-1][-1])
+        rows += counts.shape[0]
+    nnz = int(indptr[-1][-1])
+    # Same index width CountVectorizer picks
+    index_dtype = np.int64 if nnz > np.iinfo(np.int32).max else np.int32
+    counts = sparse.csr_matrix(
+        (np.concatenate(data), np.concatenate(indices).astype(index_dtype),
+         np.concatenate(indptr).astype(index_dtype)),
+        shape=(rows, len(vocabulary)),
+        dtype=dtype,
+    )
+    counts.sort_indices()
+    return list(vocabulary), counts
+
+
+# The pruning below follows CountVectorizer step for step (the order
+# columns are renumbered in decides ties), with the vocabulary kept as a
+# list of terms by column rather than a dict updated term by term. Those are
+# private sklearn methods, hence the scikit-learn pin in requirements.txt
+
+
+def _sort_features(counts, terms):
+    """Renumber columns alphabetically, in place"""
+    order = sorted(range(len(terms)), key=terms.__getitem__)
+    map_index = np.empty(len(terms), dtype=counts.indices.dtype)
+    map_index[order] = np.arange(len(terms))
+    counts.indices = map_index.take(counts.indices, mode='clip')
+    return counts, [terms[i] for i in order]
+
+
+def _limit_features(counts, terms, high, low, limit):
+    """Drop terms outside [low, high] documents, then all but the `limit` most frequent"""
+    dfs = np.bincount(counts.indices, minlength=counts.shape[1])
+    mask = (dfs <= high) & (dfs >= low)
+    if limit is not None and mask.sum() > limit:
+        tfs = np.asarray(counts.sum(axis=0)).ravel()
+        mask_inds = (-tfs[mask]).argsort()[:limit]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+
+    kept = np.where(mask)[0]
+    if len(kept) == 0:
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    return counts[:, kept], [terms[i] for i in kept]
+
+
+def prune_features(vectorizer, counts, terms):
+    """The min_df/max_df/max_features pruning of CountVectorizer.fit_transform()
+
+    Returns the pruned counts and the vocabulary ({term: column}).
+    """
+    n_docs = counts.shape[0]
+    max_df, min_df, max_features = vectorizer.max_df, vectorizer.min_df, vectorizer.max_features
+    high = max_df if isinstance(max_df, Integral) else max_df * n_docs
+    low = min_df if isinstance(min_df, Integral) else min_df * n_docs
+    if high < low:
+        raise ValueError("max_df corresponds to < documents than min_df")
+    if max_features is not None:
+        counts, terms = _sort_features(counts, terms)
+    counts, terms = _limit_features(counts, terms, high, low, max_features)
+    if max_features is None:
+        counts, terms = _sort_features(counts, terms)
+    return counts, dict(zip(terms, range(len(terms))))
+
+
+def fit_tfidf(vectorizer, texts, pool, workers):
+    """`vectorizer.fit_transform(texts)` with tokenization spread over `pool`"""
+    shards = [texts[start:stop] for start, stop in split_rows(len(texts), workers)]
+    terms, counts = merge_counts(pool.map(count_terms, [vectorizer] * len(shards), shards), vectorizer.dtype)
+    if not terms:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+    if vectorizer.binary:
+        counts.data.fill(1)
+    counts, vocabulary = prune_features(vectorizer, counts, terms)
+
+    from sklearn.feature_extraction.text import TfidfTransformer
+    transformer = TfidfTransformer(
+        norm=vectorizer.norm,
+        use_idf=vectorizer.use_idf,
+        smooth_idf=vectorizer.smooth_idf,
+        sublinear_tf=vectorizer.sublinear_tf,
+    )
+    transformer.fit(counts)
+    # The fitted state a loaded artifact has (see artelipi_artifacts.load_artifact)
+    vectorizer.vocabulary_ = vocabulary
+    vectorizer.idf_ = transformer.idf_
+    return transformer.transform(counts, copy=False)
+
+
+# Matrix mapped by a pool worker: (directory, csr_matrix)
+_shared = None
+
+
+def _neighbor_rows(directory, shape, start, stop, width, block_size):
+    global _shared
+    if _shared is None or _shared[0] != directory:
+        arrays = [np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+                  for name in ('data', 'indices', 'indptr')]
+        _shared = (directory, sparse.csr_matrix(tuple(arrays), shape=shape))
+    return top_k_rows(_shared[1], np.arange(start, stop), width, block_size)
+
+
+def build_neighbors(matrix, k, pool, workers, block_size=None):
+    """`TopKNeighbors.build(matrix, k)` with row ranges spread over `pool`
+
+    The matrix goes to the workers once, as memory-mapped .npy files, so
+    they share a single copy in the page cache.
+    """
+    matrix = matrix.tocsr()
+    n = matrix.shape[0]
+    width = min(k, max(n - 1, 0))
+    indices = np.empty((n, width), dtype=np.int32)
+    scores = np.empty((n, width), dtype=np.float32)
+    if width == 0:
+        return TopKNeighbors(indices, scores, k)
+
+    directory = tempfile.mkdtemp(prefix='artelipi-build-')
+    try:
+        for name in ('data', 'indices', 'indptr'):
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(matrix, name))
+        ranges = split_rows(n, workers * TASKS_PER_WORKER)
+        futures = [pool.submit(_neighbor_rows, directory, matrix.shape, start, stop, width, block_size)
+                   for start, stop in ranges]
+        for (start, stop), future in zip(ranges, futures):
+            indices[start:stop], scores[start:stop] = future.result()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return TopKNeighbors(indices, scores, k)
@@ -0,0 +1,173 @@
+# Cached user profiles for personalized Artelipi recommendations
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+# Weight of each interaction in the profile vector
+INTERACTION_WEIGHTS = {
+    'likes': 1.0,
+    'bookmarks': 2.0,
+    'reading_list': 1.5,
+}
+
+# Interaction events accepted by the API -> profile field they change
+INTERACTION_KINDS = {
+    'like': 'likes',
+    'bookmark': 'bookmarks',
+    'reading_list': 'reading_list',
+    'follow': 'following',
+}
+
+# Added to the cosine score of articles by followed authors when ranking
+FOLLOW_BOOST = 0.05
+
+# Most recent interactions of each kind used to build the profile
+MAX_PROFILE_ARTICLES = 200
+
+
+class UserProfile:
+    def __init__(self, uid, interactions, following):
+        """A user's liked/bookmarked/reading-list articles and followed authors
+
+        The profile vector is the weighted sum of the TF-IDF rows of those
+        articles, built lazily for each published model and patched in
+        place as interactions change.
+        """
+        self.uid = uid
+        # kind -> article ids (dict keeps insertion order, newest last)
+        self.interactions = {kind: dict.fromkeys(interactions.get(kind, ())) for kind in INTERACTION_WEIGHTS}
+        self.following = set(following)
+        self.fetched_at = time.time()
+        self.model_version = None
+        self.vector = None  # (1 x n_features) CSR, unnormalized
+        self.row_weights = {}  # Corpus row -> summed interaction weight
+        self.rows = np.empty(0, dtype=np.int64)  # Corpus rows the user interacted with
+        self._lock = threading.Lock()
+
+    def counts(self):
+        counts = {kind: len(ids) for kind, ids in self.interactions.items()}
+        counts['following'] = len(self.following)
+        return counts
+
+    def _weights(self, model):
+        """row -> summed weight of the user's recent interactions in `model`"""
+        weights = {}
+        for kind, ids in self.interactions.items():
+            for article_id in list(ids)[-MAX_PROFILE_ARTICLES:]:
+                row = model.row_by_id.get(article_id)
+                if row is not None:
+                    weights[row] = weights.get(row, 0.0) + INTERACTION_WEIGHTS[kind]
+        return weights
+
+    def vector_for(self, model):
+        """(profile vector or None, interacted rows) for a published model"""
+        with self._lock:
+            if self.model_version != model.version:
+                self.row_weights = self._weights(model)
+                self.vector = None
+                if self.row_weights and model.tfidf_matrix is not None:
+                    rows = np.fromiter(self.row_weights, dtype=np.int64)
+                    values = np.fromiter(self.row_weights.values(), dtype=np.float64)
+                    self.vector = sparse.csr_matrix(values @ model.tfidf_matrix[rows])
+                self._set_rows()
+                self.model_version = model.version
+            return self.vector, self.rows
+
+    def _set_rows(self):
+        self.rows = np.array(sorted(row for row, weight in self.row_weights.items() if weight > 0), dtype=np.int64)
+
+    def update(self, kind, target_id, active, model=None):
+        """Apply one interaction change (kind 'following' takes a user id)
+
+        When the profile vector was built for `model`, the article's TF-IDF
+        row is added to or subtracted from it in place.
+        """
+        with self._lock:
+            if kind == 'following':
+                (self.following.add if active else self.following.discard)(target_id)
+                return
+
+            ids = self.interactions[kind]
+            present = target_id in ids
+            ids.pop(target_id, None)
+            if active:
+                ids[target_id] = None  # Newest last
+            if present == active:
+                return  # e.g. a repeated event
+
+            row = model.row_by_id.get(target_id) if model is not None else None
+            if model is None or self.model_version != model.version or model.tfidf_matrix is None:
+                self.model_version = None  # Rebuilt on next use
+                return
+            if row is None:
+                return  # Not in the corpus; nothing to score with
+
+            weight = INTERACTION_WEIGHTS[kind] if active else -INTERACTION_WEIGHTS[kind]
+            self.row_weights[row] = self.row_weights.get(row, 0.0) + weight
+            change = weight * model.tfidf_matrix[row]
+            self.vector = sparse.csr_matrix(change if self.vector is None else self.vector + change)
+            self.vector.eliminate_zeros()
+            self._set_rows()
+
+
+class UserProfileCache:
+    def __init__(self, fetch, ttl=600, maxsize=10000):
+        """LRU cache of UserProfiles, refetched with `fetch(uid)` after `ttl` seconds
+
+        `fetch` returns (interactions by kind, followed user ids).
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.updates = 0
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uid):
+        with self._lock:
+            profile = self._profiles.get(uid)
+            if profile is not None and time.time() - profile.fetched_at < self.ttl:
+                self._profiles.move_to_end(uid)
+                self.hits += 1
+                return profile
+            self.misses += 1
+
+        interactions, following = self.fetch(uid)
+        profile = UserProfile(uid, interactions, following)
+        with self._lock:
+            self._profiles[uid] = profile
+            self._profiles.move_to_end(uid)
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+                self.evictions += 1
+        return profile
+
+    def update(self, uid, kind, target_id, active=True, model=None):
+        """Patch a cached profile; uncached users pick the change up when fetched"""
+        with self._lock:
+            profile = self._profiles.get(uid)
+        if profile is None:
+            return False
+        profile.update(kind, target_id, active, model)
+        self.updates += 1
+        return True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl,
+            "maxsize": self.maxsize,
+            "size": len(self._profiles),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+            "incremental_updates": self.updates,
+        }
@@ -1,260 +1,1254 @@
 # Artelipi-Only Recommendation System
 # Uses ONLY articles from Artelipi platform (Firestore)
 
-import pandas as pd
+# pandas, sklearn and firebase_admin are imported where they're first
+# needed: they take most of the API server's import time, and a server
+# loading a saved model can answer /health before any of them is used
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
+from scipy import sparse
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
+import queue
+import threading
+import time
 from datetime import datetime, timedelta
 
 import json
+import logging
+
+from artelipi_neighbors import TopKNeighbors, similarity_block, top_k_indices, top_k_matrix
+from artelipi_parallel import PARALLEL_MIN_ARTICLES, build_neighbors, build_pool, fit_tfidf
+from artelipi_rerank import (
+    OVERFETCH, allowed_rows, diversify, excluded_rows, fetch_size, filter_candidates, is_member
+)
+from artelipi_profiles import FOLLOW_BOOST, UserProfileCache
+from artelipi_ann import ANN_INDEXES
+from artelipi_artifacts import ArtifactError, load_artifact, save_artifact
+from artelipi_ingest import (
+    HashingTfidfVectorizer, article_frame, reweight_tfidf, stack_counts, stream_documents, stream_published_posts
+)
+from artelipi_metrics import DOCUMENTS_READ, STAGE_SECONDS, read_pages, timed
+from artelipi_search import SEARCH_FEATURES, AuthorIndex, SearchIndex, count_terms, search_text
+from artelipi_trending import TrendingIndex, engagement_scores
+
+logger = logging.getLogger(__name__)
+
+# Post fields holding the engagement counts (see sync_engagement)
+ENGAGEMENT_FIELDS = ('likeCount', 'viewCount', 'bookmarkCount')
+
+
+class RecommenderModel:
+    def __init__(self, df=None, vectorizer=None, tfidf_matrix=None, similarity_matrix=None, neighbors=None, ann=None,
+                 retired=None):
+        """Immutable snapshot of the corpus and the model fitted on it
+
+        ArtelipiRecommender publishes a new snapshot by swapping a single
+        reference, so readers always see a consistent (df, vectorizer,
+        matrix) triple and never a half-built model.
+        Between full builds rows never move: changed articles are appended
+        as new rows and their old rows are `retired` (sorted row positions),
+        which every query path skips.
+        """
+        self._frames = [df] if df is not None else []
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.similarity_matrix = similarity_matrix  # Square over the rows of the last full build
+        self.neighbors = neighbors  # TopKNeighbors in top-K mode
+        self.ann = ann              # Approximate index for content queries, if built
+        self.search = None          # SearchIndex, set before publishing
+        self.trending = TrendingIndex()  # Built for this snapshot when published
+        self.version = 0            # Assigned when published
+        self.published_at = None
+        self.build_seconds = None   # Set on fully fitted models
+        self.n_rows = len(df) if df is not None else 0
+        self.retired = np.asarray(retired if retired is not None else [], dtype=np.int64)
+        self.transposed = None      # Cached tfidf_matrix.T, shared by patched snapshots
+        self.features = None        # Texts (or hashed counts) to fit on, kept only without a TF-IDF matrix
+        
+        # Precomputed id -> row lookup and columnar arrays for the query path
+        if df is not None and 'id' in df.columns:
+            self.row_by_id = {article_id: row for row, article_id in enumerate(df['id'].tolist())}
+            for row in self.retired.tolist():
+                article_id = df['id'].iat[row]
+                if self.row_by_id.get(article_id) == row:
+                    del self.row_by_id[article_id]
+        else:
+            self.row_by_id = {}
+        # Python lists of JSON-native values (dates as ISO strings), so
+        # records can be encoded without any per-row conversion
+        self.columns = {col: self._json_column(df[col]) for col in df.columns} if df is not None else {}
+        self.created = self._created(df)
+    
+    @classmethod
+    def patched(cls, model, changed, retired, tfidf_matrix=None):
+        """Snapshot of `model` with the `changed` rows appended and `retired` rows retired
+
+        Only the appended rows are converted; the other arrays are copied
+        as a whole (no per-row work). Neighbors, ANN and search indexes are
+        patched by the caller.
+        """
+        new = cls.__new__(cls)
+        new.__dict__.update(model.__dict__)
+        new._frames = model._frames + [changed]
+        new.tfidf_matrix = tfidf_matrix
+        new.neighbors = None
+        new.ann = None
+        new.search = None
+        new.trending = TrendingIndex()
+        new.version = 0
+        new.published_at = None
+        new.build_seconds = None
+        n_old = model.n_rows
+        new.n_rows = n_old + len(changed)
+        new.retired = np.union1d(model.retired, retired).astype(np.int64)
+        
+        new.row_by_id = dict(model.row_by_id)
+        ids = model.columns.get('id') or []
+        for row in retired:
+            new.row_by_id.pop(ids[row], None)
+        for row, article_id in enumerate(changed['id'].tolist() if 'id' in changed.columns else (), n_old):
+            new.row_by_id[article_id] = row
+        
+        new.columns = {}
+        for col in dict.fromkeys(list(model.columns) + list(changed.columns)):
+            old_values = model.columns.get(col, [None] * n_old)
+            new_values = cls._json_column(changed[col]) if col in changed.columns else [None] * len(changed)
+            new.columns[col] = old_values + new_values
+        if model.created is not None or 'createdAt' in changed.columns:
+            old_created = model.created if model.created is not None else np.zeros(n_old)
+            new_created = cls._created(changed)
+            new.created = np.concatenate([old_created, new_created if new_created is not None else np.zeros(len(changed))])
+        return new
+    
+    @property
+    def df(self):
+        """The corpus rows as a DataFrame, retired rows included (row-aligned)"""
+        if len(self._frames) > 1:
+            import pandas as pd
+            # Patched snapshots concatenate their appended frames on first use
+            self._frames = [pd.concat(self._frames, ignore_index=True)]
+        return self._frames[0] if self._frames else None
+    
+    def live_rows(self):
+        """Row positions of the articles in the corpus (not retired)"""
+        rows = np.arange(self.n_rows)
+        return rows[~np.isin(rows, self.retired)] if len(self.retired) else rows
+    
+    def similarity_rows(self, rows):
+        """Dense cosine similarities of `rows` to every row (retired rows at -inf)
+
+        The similarity matrix covers the rows of the last full build; rows
+        appended since are scored against the TF-IDF matrix on the fly.
+        """
+        n_dense = self.similarity_matrix.shape[0]
+        rows = np.asarray(rows, dtype=np.int64)
+        sims = np.empty((len(rows), self.n_rows), dtype=np.float64)
+        base = rows < n_dense
+        if base.any():
+            sims[base, :n_dense] = self.similarity_matrix[rows[base]]
+        if self.n_rows > n_dense or not base.all():
+            products = (self.tfidf_matrix[rows] @ self.tfidf_matrix.T).toarray()
+            sims[base, n_dense:] = products[base, n_dense:]
+            sims[~base] = products[~base]
+        if len(self.retired):
+            sims[:, self.retired] = -np.inf
+        return sims
+    
+    @staticmethod
+    def _created(df):
+        """Creation time in epoch seconds (0 when unknown) for recency ranking"""
+        if df is None or 'createdAt' not in df.columns:
+            return None
+        import pandas as pd
+        created = pd.to_datetime(df['createdAt'], utc=True, errors='coerce')
+        seconds = created.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+        return np.where(created.isna().to_numpy(), 0.0, seconds)
+    
+    @staticmethod
+    def _json_column(series):
+        import pandas as pd
+        if pd.api.types.is_datetime64_any_dtype(series) or series.name == 'createdAt':
+            # ISO 8601 in UTC, as JavaScript's Date.toISOString() writes it
+            dates = pd.to_datetime(series, utc=True, errors='coerce').dt.tz_localize(None).to_numpy()
+            strings = np.datetime_as_string(dates, unit='ms', timezone='UTC').astype(object)
+            strings[np.isnat(dates)] = None
+            return strings.tolist()
+        if pd.api.types.is_string_dtype(series):
+            # Missing text is NaN in a str column (and may be in an object one)
+            values = series.astype(object).where(series.notna(), None).tolist()
+        else:
+            values = series.tolist()
+        if series.dtype == object:
+            return [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        return values
+    
+    @property
+    def ml_enabled(self):
+        return self.similarity_matrix is not None or self.neighbors is not None
+    
+    def __len__(self):
+        return self.n_rows - len(self.retired)
+    
+    def nbytes(self):
+        """Bytes held by each model component (memory-mapped or not)"""
+        sizes = {}
+        if self.tfidf_matrix is not None:
+            matrix = self.tfidf_matrix
+            sizes['tfidf'] = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        if self.neighbors is not None:
+            sizes['neighbors'] = self.neighbors.nbytes
+        if self.similarity_matrix is not None:
+            sizes['similarity'] = self.similarity_matrix.nbytes
+        if self.ann is not None:
+            sizes['ann'] = self.ann.nbytes
+        if self.search is not None:
+            sizes['search'] = self.search.nbytes
+        return sizes
+    
+    def records(self, rows, scores=None, fields=None):
+        """Build result dicts for the given row positions from the columnar arrays
+
+        `fields` limits the columns returned (None returns all of them).
+        """
+        if fields is None:
+            columns = self.columns.items()
+        else:
+            columns = [(col, self.columns[col]) for col in fields if col in self.columns]
+        recommendations = []
+        for i, row in enumerate(rows):
+            rec = {col: values[row] for col, values in columns}
+            if scores is not None:
+                rec['similarity_score'] = float(scores[i])
+            recommendations.append(rec)
+        return recommendations
+
 
 class ArtelipiRecommender:
-    def __init__(self):
-        """Initialize recommender with Firestore connection"""
-        self.db = None
-        self.df = None
-        self.tfidf_matrix = None
-        self.vectorizer = None
-        self.similarity_matrix = None
+    def __init__(self, db=None, top_k=50, vectorizer_kind='tfidf', page_size=500, trending_half_life_hours=48,
+                 ann_kind=None, ann_min_articles=1000, ann_probe=16, profile_ttl=600, profile_cache_size=10000,
+                 build_workers=1, listener_batch_seconds=0.5):
+        """Initialize recommender with Firestore connection
+
+        `db` may be any Firestore-compatible client (e.g. one pointed at the
+        emulator via FIRESTORE_EMULATOR_HOST, or a local fake for testing).
+        `top_k` neighbors are kept per article; pass None to build the full
+        dense similarity matrix instead (O(N^2) memory).
+        `vectorizer_kind` is 'tfidf' (fitted vocabulary) or 'hashing'
+        (stateless, vectorized page by page so peak memory stays flat).
+        Posts are read `page_size` documents at a time.
+        Trending scores decay with a `trending_half_life_hours` half-life.
+        `ann_kind` (e.g. 'ivf') builds an approximate index for content
+        queries once the corpus has `ann_min_articles` articles; it scans
+        `ann_probe` clusters per query.
+        User profiles for personalized recommendations are cached for
+        `profile_ttl` seconds (up to `profile_cache_size` users).
+        Full builds of at least PARALLEL_MIN_ARTICLES articles tokenize and
+        search neighbors in `build_workers` processes (same model as serial).
+        Listener events arriving within `listener_batch_seconds` of each
+        other are applied as one change.
+        """
+        self.db = db
+        self.model = RecommenderModel()  # Replaced as a whole, never mutated
+        self.top_k = top_k
+        self.vectorizer_kind = vectorizer_kind
+        self.page_size = page_size
         self.min_articles_for_ml = 10  # Minimum articles before using ML
+        self.sync_watermark = None  # Latest `updatedAt` applied to the corpus
+        self.last_build = None  # Summary of the last fully fitted model
+        self.changes_since_build = 0  # Articles upserted/deleted since then
+        self._write_lock = threading.RLock()  # Serializes model builders
+        self._listener = None
+        self.listener_batch_seconds = listener_batch_seconds
+        # (kind, id, data) changes queued by the listener for its worker thread
+        self._listener_changes = queue.Queue()
+        self._listener_thread = None
+        self.trending_half_life_hours = trending_half_life_hours
+        self.ann_kind = ann_kind
+        self.ann_min_articles = ann_min_articles
+        self.ann_probe = ann_probe
+        self.build_workers = build_workers
+        self.authors = None  # AuthorIndex of the `users` collection, once loaded
+        self.generation = None  # Saved generation the model was last written to/read from
+        self.saved_version = None  # Model version written in that generation
+        self.profiles = UserProfileCache(self._fetch_interactions, profile_ttl, profile_cache_size)
+        # Engagement counts seen since the corpus rows were loaded
+        self._engagement_overrides = {}
+    
+    def _publish(self, model, rebuilt=False, retired=None):
+        """Make `model` the current model with a single reference swap
+
+        `retired` (the rows newly retired) marks `model` as patched from the
+        current one, whose trending index is then patched rather than rebuilt.
+        """
+        model.version = self.model.version + 1
+        model.published_at = time.time()
+        if retired is not None and len(self.model.trending.keys) == self.model.n_rows:
+            model.trending = self.model.trending.patched(model, retired)
+        else:
+            model.trending = TrendingIndex.build(model, self.trending_half_life_hours, self._engagement_overrides)
+        if rebuilt:
+            self.last_build = {
+                "version": model.version,
+                "built_at": model.published_at,
+                "duration_seconds": round(model.build_seconds, 3) if model.build_seconds is not None else None,
+                "articles": len(model),
+            }
+            self.changes_since_build = 0
+        self.model = model
+    
+    def model_stats(self):
+        """Version, last build and corpus delta since that build"""
+        model = self.model
+        return {
+            "version": model.version,
+            "published_at": model.published_at,
+            "articles": len(model),
+            "last_build": self.last_build,
+            "generation": self.generation,
+            "corpus_delta": {
+                "changes_since_build": self.changes_since_build,
+                "articles_since_build": len(model) - self.last_build["articles"] if self.last_build else None,
+            },
+        }
+    
+    # Read-only views of the currently published model
+    @property
+    def df(self):
+        return self.model.df
+    
+    @property
+    def vectorizer(self):
+        return self.model.vectorizer
+    
+    @property
+    def tfidf_matrix(self):
+        return self.model.tfidf_matrix
+    
+    @property
+    def similarity_matrix(self):
+        return self.model.similarity_matrix
+    
+    @property
+    def neighbors(self):
+        return self.model.neighbors
+    
+    @property
+    def ml_enabled(self):
+        return self.model.ml_enabled
         
     def initialize_firebase(self):
         """Initialize Firebase connection"""
+        from firebase_admin import firestore
+
+        try:
+            app = self.firebase_app()
+        except Exception as e:
+            # Fallback: Initialize without credentials (will use environment)
+            logger.warning("Could not initialize Firebase: %s (is FIREBASE_SERVICE_ACCOUNT_JSON set?)", e)
+            # For now, we'll create empty dataframe
+            import pandas as pd
+            self._publish(RecommenderModel(pd.DataFrame()))
+            return
+        self.db = firestore.client(app)
+    
+    @staticmethod
+    def firebase_app():
+        """The default Firebase app, initialized on first use (raises if that fails)"""
+        import firebase_admin
+        from firebase_admin import credentials
+
         try:
             # Check if already initialized
-            app = firebase_admin.get_app()
-            self.db = firestore.client(app)
-            print("✅ Using existing Firebase app")
+            return firebase_admin.get_app()
         except ValueError:
-            # Initialize new app
-            try:
-                # First, try to load from FIREBASE_SERVICE_ACCOUNT_JSON env var
-                firebase_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT_JSON")
-                if firebase_json:
-                    firebase_config = json.loads(firebase_json)
-                    cred = credentials.Certificate(firebase_config)
-                    firebase_admin.initialize_app(cred)
-                    self.db = firestore.client()
-                    print(f"✅ Initialized Firebase from JSON env var for project: {firebase_config.get('project_id')}")
-                else:
-                    # Fallback: Try default credentials
-                    cred = credentials.ApplicationDefault()
-                    firebase_admin.initialize_app(cred)
-                    self.db = firestore.client()
-                    print("✅ Initialized Firebase with default credentials")
-            except Exception as e:
-                # Fallback: Initialize without credentials (will use environment)
-                print(f"⚠️ Could not initialize Firebase: {e}")
-                print("⚠️ Make sure FIREBASE_SERVICE_ACCOUNT_JSON is set")
-                # For now, we'll create empty dataframe
-                self.df = pd.DataFrame()
-                return
+            pass
         
-        if not self.db:
-            self.db = firestore.client()
+        # First, try to load from FIREBASE_SERVICE_ACCOUNT_JSON env var
+        firebase_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT_JSON")
+        if firebase_json:
+            firebase_config = json.loads(firebase_json)
+            app = firebase_admin.initialize_app(credentials.Certificate(firebase_config))
+            logger.info("Initialized Firebase from JSON env var for project: %s", firebase_config.get('project_id'))
+        else:
+            # Fallback: Try default credentials
+            app = firebase_admin.initialize_app(credentials.ApplicationDefault())
+            logger.info("Initialized Firebase with default credentials")
+        return app
     
     def load_artelipi_articles(self):
         """Load articles ONLY from Artelipi Firestore"""
-        print("Loading Artelipi articles from Firestore...")
+        with self._write_lock:
+            df, watermark, features, search_counts = self._fetch_articles()
+            self._engagement_overrides = {}
+            # Corpus only; call build_ml_model() (or use reload()) for ML
+            model = RecommenderModel(df)
+            model.features = features
+            with timed('search_index'):
+                model.search = SearchIndex.build(model, search_counts)
+            self._publish(model)
+            self.sync_watermark = watermark
+        
+        self.load_authors()
+        return df
+    
+    def reload(self):
+        """Load articles and build the model, publishing both in one swap"""
+        with self._write_lock:
+            df, watermark, features, search_counts = self._fetch_articles()
+            self._engagement_overrides = {}
+            model = self._fit(df, features)
+            rebuilt = model is not None
+            if model is None:
+                model = RecommenderModel(df)
+                model.features = features
+            with timed('search_index'):
+                model.search = SearchIndex.build(model, search_counts)
+            self._publish(model, rebuilt=rebuilt)
+            self.sync_watermark = watermark
+        
+        # Authors change rarely; refreshed with every full load
+        self.load_authors()
+        return df
+    
+    def load_authors(self):
+        """Load the `users` collection into the author search index"""
+        if not self.db:
+            self.initialize_firebase()
+        
+        authors = []
+        try:
+            for docs in read_pages(stream_documents(self.db.collection('users'), self.page_size), 'users'):
+                authors.extend(AuthorIndex.author_record(doc.id, doc.to_dict()) for doc in docs)
+        except Exception as e:
+            # Article search works without it; keep the previous index
+            logger.warning("Could not load authors: %s", e)
+            return self.authors
+        
+        article_counts = {}
+        author_ids = self.model.columns.get('authorId') or []
+        for row in self.model.live_rows() if author_ids else ():
+            article_counts[author_ids[row]] = article_counts.get(author_ids[row], 0) + 1
+        self.authors = AuthorIndex(authors, article_counts)
+        return self.authors
+    
+    def _fetch_articles(self):
+        """Page through published posts (no side effects)
+
+        Returns (df, watermark, features, search_counts): the corpus metadata
+        without article bodies, the latest `updatedAt`, the text features to
+        fit on (texts for 'tfidf', hashed term counts for 'hashing') and the
+        term counts for the search index.
+        """
+        logger.info("Loading Artelipi articles from Firestore...")
         
         if not self.db:
             self.initialize_firebase()
         
-        # Fetch all published articles from Firestore
-        posts_ref = self.db.collection('posts')
-        docs = posts_ref.where('status', '==', 'published').stream()
+        with timed('corpus_load'):
+            return self._stream_articles()
+    
+    def _stream_articles(self):
+        """The paging loop of `_fetch_articles()`"""
+        hashing = self._new_vectorizer() if self.vectorizer_kind == 'hashing' else None
         
         articles = []
-        for doc in docs:
-            data = doc.to_dict()
-            articles.append({
-                'id': doc.id,
-                'title': data.get('title', ''),
-                'content': data.get('content', ''),
-                'author': data.get('authorName', 'Unknown'),
-                'slug': data.get('slug', ''),
-                'tags': data.get('tags', []),
-                'likeCount': data.get('likeCount', 0),
-                'viewCount': data.get('viewCount', 0),
-                'bookmarkCount': data.get('bookmarkCount', 0),
-                'createdAt': data.get('createdAt'),
-            })
-        
-        self.df = pd.DataFrame(articles)
-        
-        if len(self.df) == 0:
-            print("⚠️ No articles found in Artelipi platform")
-            return self.df
-        
-        # Combine title and content
-        self.df['full_content'] = self.df['title'] + ' ' + self.df['content']
-        
-        print(f"✅ Loaded {len(self.df)} articles from Artelipi")
+        texts = []
+        count_chunks = []
+        search_chunks = []
+        watermark = None
+        for docs in read_pages(stream_published_posts(self.db, self.page_size), 'posts'):
+            page_texts = []
+            page_search = []
+            for doc in docs:
+                data = doc.to_dict()
+                record = self._article_record(doc.id, data)
+                page_search.append(search_text(record))
+                page_texts.append(self._pop_text(record))
+                articles.append(record)
+                watermark = self._later(watermark, data.get('updatedAt'))
+            
+            search_chunks.append(count_terms(page_search))
+            # Hashed counts need no vocabulary, so the page's bodies go now
+            if hashing is not None:
+                count_chunks.append(hashing.count(page_texts))
+            else:
+                texts.extend(page_texts)
+        
+        with timed('dataframe'):
+            df = article_frame(articles)
+            features = stack_counts(count_chunks, hashing.n_features) if hashing is not None else texts
+            search_counts = stack_counts(search_chunks, SEARCH_FEATURES)
+        
+        if len(df) == 0:
+            logger.warning("No articles found in Artelipi platform")
+            return df, watermark, features, search_counts
+        
+        logger.info("Loaded %d articles from Artelipi", len(df))
+        return df, watermark, features, search_counts
+    
+    @staticmethod
+    def _pop_text(record):
+        """Remove the body from a corpus row, returning the text to vectorize"""
+        return f"{record['title'] or ''} {record.pop('content') or ''}"
+    
+    @staticmethod
+    def _article_record(doc_id, data):
+        """Map a Firestore post document to a corpus row"""
+        return {
+            'id': doc_id,
+            'title': data.get('title', ''),
+            'content': data.get('content', ''),
+            'author': data.get('authorName', 'Unknown'),
+            'authorId': data.get('authorId'),
+            'slug': data.get('slug', ''),
+            'category': data.get('category'),
+            'tags': data.get('tags', []),
+            'keywords': data.get('keywords', []),
+            'likeCount': data.get('likeCount', 0),
+            'viewCount': data.get('viewCount', 0),
+            'bookmarkCount': data.get('bookmarkCount', 0),
+            'createdAt': data.get('createdAt'),
+        }
+    
+    @staticmethod
+    def _later(a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return max(a, b)
+    
+    def sync_articles(self):
+        """Apply only the posts changed since the last sync (incremental mode)
+
+        Polls `updatedAt > watermark`; unpublished posts are dropped from the
+        corpus. Hard deletes are only seen by `start_listener()`. Falls back
+        to a full load when there is no watermark yet.
+        """
+        with self._write_lock:
+            if self.df is None or self.sync_watermark is None:
+                return self.reload()
+            
+            if not self.db:
+                self.initialize_firebase()
+            
+            # Single-field range query, so no composite index is needed
+            docs = self.db.collection('posts').where('updatedAt', '>', self.sync_watermark).stream()
+            
+            upserts = []
+            deleted_ids = []
+            watermark = self.sync_watermark
+            for doc in docs:
+                DOCUMENTS_READ.inc(collection='posts')
+                data = doc.to_dict()
+                watermark = self._later(watermark, data.get('updatedAt'))
+                if data.get('status') == 'published':
+                    upserts.append(self._article_record(doc.id, data))
+                else:
+                    deleted_ids.append(doc.id)
+            
+            if upserts or deleted_ids:
+                self.apply_changes(upserts, deleted_ids)
+                logger.info("Synced %d updated and %d removed articles", len(upserts), len(deleted_ids))
+            self.sync_watermark = watermark
+        
+        if self.authors is None:
+            self.load_authors()
         return self.df
     
-    def get_trending_articles(self, limit=10):
-        """Get trending articles based on engagement (internal only)"""
-        if self.df is None or len(self.df) == 0:
-            return []
+    def sync_engagement(self):
+        """Re-read the likes, views and bookmarks of every published post
+
+        The app increments them without touching `updatedAt`, so
+        `sync_articles()` never sees them (the listener does). Only the
+        three count fields are read; changed counts re-rank trending.
+        """
+        if not self.db:
+            self.initialize_firebase()
+        
+        query = self.db.collection('posts').where('status', '==', 'published').select(ENGAGEMENT_FIELDS)
+        counts = {}
+        with timed('engagement_sync'):
+            for docs in read_pages(stream_documents(query, self.page_size), 'posts'):
+                for doc in docs:
+                    data = doc.to_dict()
+                    counts[doc.id] = tuple(data.get(field, 0) for field in ENGAGEMENT_FIELDS)
+        return self.update_engagement_many(counts)
+    
+    def start_listener(self):
+        """Subscribe to the `posts` collection and apply changes as they arrive
+
+        The snapshot callback only queues the changes: a worker thread
+        applies them, so Firestore's callback thread never waits on the
+        write lock (held through reloads and refits).
+        """
+        if self._listener is not None:
+            return self._listener
+        
+        if not self.db:
+            self.initialize_firebase()
+        
+        def on_snapshot(col_snapshot, changes, read_time):
+            DOCUMENTS_READ.inc(len(changes), collection='posts')
+            self._listener_changes.put([
+                (change.type.name, change.document.id,
+                 change.document.to_dict() if change.type.name != 'REMOVED' else None)
+                for change in changes
+            ])
+        
+        self._listener_thread = threading.Thread(target=self._run_listener, name="posts-listener", daemon=True)
+        self._listener_thread.start()
+        self._listener = self.db.collection('posts').on_snapshot(on_snapshot)
+        logger.info("Listening for Artelipi post changes")
+        return self._listener
+    
+    def stop_listener(self):
+        if self._listener is not None:
+            self._listener.unsubscribe()
+            self._listener = None
+        if self._listener_thread is not None:
+            self._listener_changes.put(None)
+            self._listener_thread.join(timeout=5)
+            self._listener_thread = None
+    
+    def flush_listener(self):
+        """Block until every queued listener change has been applied"""
+        self._listener_changes.join()
+    
+    def _run_listener(self):
+        while True:
+            batches = [self._listener_changes.get()]
+            if batches[0] is not None and self.listener_batch_seconds:
+                # Coalesce bursts (e.g. an editor autosaving) into one change
+                time.sleep(self.listener_batch_seconds)
+            while True:
+                try:
+                    batches.append(self._listener_changes.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                changes = [change for batch in batches if batch is not None for change in batch]
+                if changes:
+                    with self._write_lock:
+                        self._apply_snapshot(changes)
+            except Exception as e:
+                logger.warning("Could not apply snapshot changes: %s", e)
+            finally:
+                for _ in batches:
+                    self._listener_changes.task_done()
+            if None in batches:
+                return
+    
+    def _apply_snapshot(self, changes):
+        """Apply queued listener changes (oldest first) to the corpus"""
+        # Only the last change of each document matters
+        latest = {}
+        for kind, doc_id, data in changes:
+            latest.pop(doc_id, None)
+            latest[doc_id] = (kind, data)
+        
+        upserts = []
+        deleted_ids = []
+        watermark = self.sync_watermark
+        for doc_id, (kind, data) in latest.items():
+            if kind == 'REMOVED':
+                deleted_ids.append(doc_id)
+                continue
+            updated_at = data.get('updatedAt')
+            # The initial snapshot replays every document; skip the ones
+            # already reflected in the corpus. Likes, views and bookmarks
+            # are incremented without touching `updatedAt`, so those still
+            # reach the trending index.
+            if (self.sync_watermark is not None and updated_at is not None
+                    and updated_at <= self.sync_watermark):
+                if data.get('status') == 'published':
+                    self.update_engagement(
+                        doc_id, data.get('likeCount', 0), data.get('viewCount', 0), data.get('bookmarkCount', 0))
+                continue
+            watermark = self._later(watermark, updated_at)
+            if data.get('status') == 'published':
+                upserts.append(self._article_record(doc_id, data))
+            else:
+                deleted_ids.append(doc_id)
         
-        # Calculate engagement score
-        self.df['engagement_score'] = (
-            self.df['likeCount'] * 3 +
-            self.df['viewCount'] * 1 +
-            self.df['bookmarkCount'] * 5
+        if upserts or deleted_ids:
+            self.apply_changes(upserts, deleted_ids)
+        self.sync_watermark = watermark
+    
+    def apply_changes(self, upserts, deleted_ids=()):
+        """Upsert/delete articles in the corpus and publish a patched model
+
+        Changed articles are appended as new rows, vectorized with the
+        existing vocabulary and IDF weights (refreshed on the next full
+        `build_ml_model()`), and their old rows are retired. Only the new
+        rows' similarities are computed, against a transpose of the matrix
+        cached across snapshots, so the work follows the number of changes;
+        the rest of the model is shared or copied as whole arrays. Returns
+        the DataFrame of upserted rows.
+        """
+        with self._write_lock, timed('apply_changes'):
+            model = self.model
+            self.changes_since_build += len(upserts) + len(deleted_ids)
+            
+            upserts = [dict(rec) for rec in upserts]
+            for article_id in list(deleted_ids) + [rec['id'] for rec in upserts]:
+                self._engagement_overrides.pop(article_id, None)
+            search_counts = stack_counts([count_terms([search_text(rec) for rec in upserts])] if upserts else [], SEARCH_FEATURES)
+            texts = [self._pop_text(rec) for rec in upserts]
+            changed = article_frame(upserts)
+            
+            if len(model) == 0:
+                new_model = RecommenderModel(changed)
+                new_model.features = self._text_features(texts)
+                new_model.search = SearchIndex.build(new_model, search_counts)
+                self._publish(new_model)
+                return changed
+            
+            # Updated articles are retired and re-appended with their new data
+            removed = set(deleted_ids) | {rec['id'] for rec in upserts}
+            retired = np.array(sorted(model.row_by_id[a] for a in removed if a in model.row_by_id), dtype=np.int64)
+            if len(retired) == 0 and len(changed) == 0:
+                return changed  # Deletes of articles not in the corpus
+            
+            tfidf = model.tfidf_matrix
+            if model.vectorizer is not None and tfidf is not None and len(changed) > 0:
+                tfidf = sparse.vstack([tfidf, model.vectorizer.transform(texts)], format='csr')
+            new_model = RecommenderModel.patched(model, changed, retired, tfidf if model.vectorizer is not None else None)
+            if model.features is not None and new_model.tfidf_matrix is None:
+                new_model.features = self._stack_features(model.features, self._text_features(texts))
+            
+            if model.neighbors is not None and new_model.tfidf_matrix is not None:
+                if new_model.transposed is None:
+                    new_model.transposed = model.tfidf_matrix.T.tocsr()
+                
+                def similarities(rows):
+                    sims = similarity_block(tfidf[rows], tfidf, new_model.transposed)
+                    sims[:, new_model.retired] = -np.inf
+                    return sims
+                
+                new_model.neighbors = model.neighbors.patched(tfidf, retired, similarities)
+            if model.ann is not None and new_model.tfidf_matrix is not None:
+                new_model.ann = model.ann.patched(tfidf, model.n_rows, retired)
+            
+            if model.search is not None:
+                new_model.search = model.search.patched(new_model, retired, search_counts)
+            self._publish(new_model, retired=retired)
+            return changed
+    
+    @staticmethod
+    def _engagement_scores(model):
+        """Engagement score per row, computed from the columnar arrays"""
+        return engagement_scores(
+            np.asarray(model.columns['likeCount'], dtype=np.float64),
+            np.asarray(model.columns['viewCount'], dtype=np.float64),
+            np.asarray(model.columns['bookmarkCount'], dtype=np.float64),
         )
+    
+    def update_engagement(self, article_id, likes, views, bookmarks):
+        """Re-rank one article in the trending index after its counts changed"""
+        return self.update_engagement_many({article_id: (likes, views, bookmarks)})
+    
+    def update_engagement_many(self, counts):
+        """Apply {article_id: (likes, views, bookmarks)}; returns the ids whose counts changed"""
+        with self._write_lock:
+            counts = {article_id: tuple(value or 0 for value in values) for article_id, values in counts.items()}
+            changed = self.model.trending.update_many(counts)
+            for article_id in changed:
+                # Kept so the next published snapshot starts from these counts
+                self._engagement_overrides[article_id] = counts[article_id]
+            return changed
+    
+    def get_trending_articles(self, limit=10, window='all', fields=None):
+        """Get trending articles based on engagement and recency (internal only)
+        
+        `window` is one of '24h', '7d' or 'all' (all-time engagement, no
+        decay); the ranked list is kept up to date by `TrendingIndex`, so
+        only the returned rows are touched.
+        """
+        model = self.model
+        if len(model) == 0:
+            return []
         
-        # Sort by engagement and recency
-        trending = self.df.nlargest(limit, 'engagement_score')
+        index = model.trending
+        rows = index.top(window, limit)
+        trending_scores = index.trending_scores(rows, window)
         
-        return trending.to_dict('records')
+        trending = model.records(rows, fields=fields)
+        for rec, row, score in zip(trending, rows, trending_scores):
+            # The index may have newer counts than the published corpus
+            if 'likeCount' in rec:
+                rec['likeCount'] = int(index.likes[row])
+            if 'viewCount' in rec:
+                rec['viewCount'] = int(index.views[row])
+            if 'bookmarkCount' in rec:
+                rec['bookmarkCount'] = int(index.bookmarks[row])
+            rec['engagement_score'] = float(engagement_scores(index.likes[row], index.views[row], index.bookmarks[row]))
+            rec['trending_score'] = float(score)
+        return trending
     
-    def get_recent_articles(self, limit=10):
+    def get_recent_articles(self, limit=10, model=None, fields=None):
         """Get most recent articles (cold start fallback)"""
-        if self.df is None or len(self.df) == 0:
+        model = model or self.model
+        if len(model) == 0:
             return []
         
         # Sort by creation date
-        recent = self.df.nlargest(limit, 'createdAt') if 'createdAt' in self.df.columns else self.df.head(limit)
+        if model.created is not None:
+            created = model.created
+            if len(model.retired):
+                created = created.copy()
+                created[model.retired] = -np.inf
+            rows = top_k_indices(created, min(limit, len(model)))
+        else:
+            rows = model.live_rows()[:limit]
         
-        return recent.to_dict('records')
+        return model.records(rows, fields=fields)
     
-    def build_ml_model(self):
-        """Build ML model ONLY if enough articles exist"""
-        if self.df is None or len(self.df) < self.min_articles_for_ml:
-            print(f"⚠️ Not enough articles ({len(self.df) if self.df is not None else 0}) for ML. Need at least {self.min_articles_for_ml}")
-            return False
+    def search(self, query='', tags=(), category=None, author=None, offset=0, limit=20, fields=None, author_ids=()):
+        """Search articles (BM25 ranked, or newest first without a text query)
+        
+        `tags` must all be present, `category` matches exactly and `author`
+        matches a prefix of the author's name or username; articles by any
+        of `author_ids` match too. Matching authors are returned alongside
+        the first page.
+        """
+        model = self.model
+        authors = self.authors
+        results = {"articles": [], "authors": [], "total": 0}
+        if model.search is None:
+            return results
         
-        print("Building TF-IDF model from Artelipi articles...")
+        author_ids = list(author_ids)
+        if author and authors is not None:
+            author_ids.extend(authors.match_ids(author))
+        rows, scores, total = model.search.search(query, tags, category, author, author_ids, offset, limit)
         
-        # Build TF-IDF matrix
-        self.vectorizer = TfidfVectorizer(
+        articles = model.records(rows, fields=fields)
+        if query and query.strip():
+            for rec, score in zip(articles, scores):
+                rec['search_score'] = float(score)
+        results["articles"] = articles
+        results["total"] = total
+        if query and query.strip() and offset == 0 and authors is not None:
+            results["authors"] = authors.search(query)
+        return results
+
+    def _fetch_interactions(self, uid):
+        """A user's likes, bookmarks, reading list and follows from Firestore"""
+        if not self.db:
+            self.initialize_firebase()
+
+        interactions = {}
+        with timed('profile_fetch'):
+            for kind in ('likes', 'bookmarks'):
+                docs = self.db.collection(kind).where('userId', '==', uid).stream()
+                interactions[kind] = [doc.to_dict().get('postId') for doc in docs]
+                DOCUMENTS_READ.inc(len(interactions[kind]), collection=kind)
+            user = self.db.collection('users').document(uid).get()
+            DOCUMENTS_READ.inc(collection='users')
+        data = (user.to_dict() or {}) if user.exists else {}
+        interactions['reading_list'] = data.get('readingList') or []
+        return interactions, data.get('following') or []
+
+    def record_interaction(self, uid, kind, target_id, active=True):
+        """Apply a like/bookmark/reading-list/follow change to a cached profile"""
+        return self.profiles.update(uid, kind, target_id, active, self.model)
+
+    @staticmethod
+    def _author_rows(model, author_ids):
+        """Sorted rows of the articles written by any of `author_ids`"""
+        if not author_ids:
+            return np.empty(0, dtype=np.int64)
+        if model.search is not None:
+            groups = [model.search.rows_by_author_id[a] for a in author_ids if a in model.search.rows_by_author_id]
+            return np.unique(np.concatenate(groups)) if groups else np.empty(0, dtype=np.int64)
+        ids = np.asarray(model.columns.get('authorId') or [], dtype=object)
+        rows = np.flatnonzero(np.isin(ids, list(author_ids)))
+        return rows[~np.isin(rows, model.retired)]
+
+    def get_user_recommendations(self, uid, limit=10, fields=None):
+        """Personalized recommendations from a user's interactions and follows
+
+        Candidates are the neighbors of the articles the user liked,
+        bookmarked or saved plus the articles of followed authors; they are
+        scored against the cached profile vector with one sparse product.
+        Users without a history get their followed authors' newest articles,
+        then trending articles. Followed authors' articles rank FOLLOW_BOOST
+        higher; the boost is returned as `follow_boost`, beside the cosine
+        `similarity_score`.
+        """
+        model = self.model
+        results = {"recommendations": [], "strategy": "none", "profile": {}}
+        if len(model) == 0:
+            return results
+
+        profile = self.profiles.get(uid)
+        vector, seen = profile.vector_for(model)
+        followed = self._author_rows(model, profile.following)
+        excluded = np.union1d(seen, self._author_rows(model, [uid]))
+        results["profile"] = profile.counts()
+
+        scores = None
+        boosts = None
+        if vector is not None and vector.nnz:
+            if model.neighbors is not None:
+                neighbors = model.neighbors.indices[seen].ravel()
+                candidates = np.union1d(neighbors[neighbors >= 0], followed)
+            else:
+                candidates = model.live_rows()
+            candidates = np.setdiff1d(candidates, excluded, assume_unique=True)
+            # TF-IDF rows are L2-normalized, so this is cosine similarity to the profile
+            scores = (model.tfidf_matrix[candidates] @ vector.T).toarray().ravel()
+            scores = np.clip(scores / np.sqrt(vector.data @ vector.data), 0.0, 1.0)
+            boosts = np.where(np.isin(candidates, followed), FOLLOW_BOOST, 0.0)
+            strategy = "profile"
+        elif len(followed):
+            candidates = np.setdiff1d(followed, excluded, assume_unique=True)
+            strategy = "following"
+        else:
+            candidates = model.trending.top('all', limit + len(excluded))
+            candidates = candidates[~np.isin(candidates, excluded)]
+            strategy = "trending"
+
+        if scores is not None:
+            top = top_k_indices(scores + boosts, limit)
+            rows, scores, boosts = candidates[top], scores[top], boosts[top]
+        elif strategy == "following" and model.created is not None:
+            rows = candidates[top_k_indices(model.created[candidates], limit)]
+        else:
+            rows = candidates[:limit]
+
+        results["recommendations"] = model.records(rows, scores, fields)
+        for rec, boost in zip(results["recommendations"], boosts if boosts is not None else ()):
+            rec["follow_boost"] = float(boost)
+        results["strategy"] = strategy
+        return results
+
+    def build_ml_model(self):
+        """Build ML model ONLY if enough articles exist
+
+        Refits from the current snapshot, never from Firestore: retired rows
+        are dropped and the IDF weights are refit on the TF-IDF rows that
+        remain. The 'tfidf' vocabulary is only chosen by full loads
+        (`reload()`, run periodically by the scheduler). A corpus without a
+        TF-IDF matrix yet is fit on its kept features.
+        """
+        with self._write_lock:
+            current = self.model
+            if current.df is None or len(current) < self.min_articles_for_ml:
+                self._fit(current.df)  # Reports why no model was built
+                return False
+            
+            if current.tfidf_matrix is None and current.features is None:
+                # e.g. a saved generation from before ML was enabled
+                self.reload()
+                return self.ml_enabled
+            
+            live = current.live_rows()
+            df = current.df.iloc[live].reset_index(drop=True) if len(current.retired) else current.df
+            if current.tfidf_matrix is not None:
+                model = self._fit(df, fitted=reweight_tfidf(current.vectorizer, current.tfidf_matrix[live]))
+            elif isinstance(current.features, list):
+                model = self._fit(df, [current.features[row] for row in live])
+            else:
+                model = self._fit(df, current.features[live])
+            if model is None:
+                return False
+            if current.search is not None:
+                if len(current.retired):
+                    model.search = SearchIndex.build(model, current.search.merged_postings()[:, live].T)
+                else:
+                    # Same rows in the same order, so the search index still applies
+                    model.search = current.search
+            self._publish(model, rebuilt=True)
+            return True
+    
+    def _text_features(self, texts):
+        """What `_fit()` takes for these texts: hashed counts for 'hashing'"""
+        if self.vectorizer_kind == 'hashing':
+            return self._new_vectorizer().count(texts)
+        return texts
+    
+    @staticmethod
+    def _stack_features(features, more):
+        if isinstance(features, list):
+            return features + more
+        return sparse.vstack([features, more], format='csr')
+    
+    def _new_vectorizer(self):
+        if self.vectorizer_kind == 'hashing':
+            return HashingTfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        return TfidfVectorizer(
             max_features=1000,
             stop_words='english',
             ngram_range=(1, 2),
             min_df=1,
             max_df=0.9
         )
+    
+    def _fit(self, df, features=None, fitted=None):
+        """Fit a new RecommenderModel on `df` (None if too few articles)
+
+        `features` are the texts (or hashed counts) from `_fetch_articles()`;
+        without them the texts come from `df['full_content']`. `fitted` is
+        an already fitted (vectorizer, TF-IDF matrix) pair to build on.
+        """
+        if df is None or len(df) < self.min_articles_for_ml:
+            logger.warning("Not enough articles (%d) for ML. Need at least %d",
+                           len(df) if df is not None else 0, self.min_articles_for_ml)
+            return None
         
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.df['full_content'])
-        self.similarity_matrix = cosine_similarity(self.tfidf_matrix, self.tfidf_matrix)
+        logger.info("Building TF-IDF model from Artelipi articles...")
+        started = time.perf_counter()
         
-        print(f"✅ ML model built with {len(self.df)} Artelipi articles")
-        return True
+        workers = self.build_workers if len(df) >= PARALLEL_MIN_ARTICLES else 1
+        pool = build_pool(workers) if workers > 1 else None
+        try:
+            # Build TF-IDF matrix
+            vectorizer = self._new_vectorizer()
+            if features is None and fitted is None:
+                features = df['full_content'].tolist()
+            with timed('tfidf_fit'):
+                if fitted is not None:
+                    vectorizer, tfidf_matrix = fitted
+                elif not isinstance(features, list):
+                    tfidf_matrix = vectorizer.fit_counts(features)
+                elif pool is not None:
+                    tfidf_matrix = fit_tfidf(vectorizer, features, pool, workers)
+                else:
+                    tfidf_matrix = vectorizer.fit_transform(features)
+            # Bodies are not kept in memory once vectorized
+            df = df.drop(columns=['content', 'full_content'], errors='ignore')
+            
+            similarity_matrix = None
+            neighbors = None
+            with timed('similarity'):
+                if not self.top_k:
+                    from sklearn.metrics.pairwise import cosine_similarity
+                    similarity_matrix = cosine_similarity(tfidf_matrix, tfidf_matrix)
+                elif pool is not None:
+                    neighbors = build_neighbors(tfidf_matrix, self.top_k, pool, workers)
+                else:
+                    # Blocked sparse products; never materializes the N x N matrix
+                    neighbors = TopKNeighbors.build(tfidf_matrix, self.top_k)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        ann = None
+        if self.ann_kind and len(df) >= self.ann_min_articles:
+            with timed('ann_build'):
+                ann = ANN_INDEXES[self.ann_kind].build(tfidf_matrix, n_probe=self.ann_probe)
+        
+        with timed('model_columns'):
+            model = RecommenderModel(df, vectorizer, tfidf_matrix, similarity_matrix, neighbors, ann)
+        model.build_seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(model.build_seconds, stage='model_build')
+        logger.info("ML model built with %d Artelipi articles in %.1fs%s", len(df), model.build_seconds,
+                    f" ({workers} processes)" if workers > 1 else "")
+        return model
+    
+    def _rerank(self, model, limit, options, candidates, scores, vector=None, exclude_rows=()):
+        """Re-ranking stage for over-fetched candidates: (rows, scores)
+
+        Candidates failing the filters are dropped. When fewer than `limit`
+        remain, every eligible row is scored against `vector` exactly
+        instead. The survivors are then diversified and capped per author.
+        """
+        allowed = allowed_rows(model, options)
+        excluded = excluded_rows(model, options, exclude_rows)
+        candidates, scores = filter_candidates(candidates, scores, allowed, excluded)
+        if len(candidates) < limit and vector is not None and model.tfidf_matrix is not None:
+            rows = allowed if allowed is not None else model.live_rows()
+            rows = rows[~is_member(rows, excluded)]
+            # TF-IDF rows are L2-normalized, so this is cosine similarity
+            scores = (model.tfidf_matrix[rows] @ vector.T).toarray().ravel()
+            top = top_k_indices(scores, limit * OVERFETCH)
+            candidates, scores = rows[top], scores[top]
+        return diversify(model, candidates, scores, limit, options)
     
-    def get_recommendations(self, article_id, limit=5):
-        """Get recommendations for a specific article (Artelipi only)"""
-        if self.df is None or len(self.df) == 0:
+    def get_recommendations(self, article_id, limit=5, fields=None, options=None):
+        """Get recommendations for a specific article (Artelipi only)
+
+        `options` (RerankOptions) filters and diversifies the results.
+        """
+        model = self.model
+        if len(model) == 0:
             return []
         
         # Find article index
-        try:
-            article_idx = self.df[self.df['id'] == article_id].index[0]
-        except IndexError:
-            print(f"Article {article_id} not found")
-            return self.get_recent_articles(limit)
+        article_idx = model.row_by_id.get(article_id)
+        if article_idx is None:
+            logger.debug("Article %s not found", article_id)
+            return self.get_recent_articles(limit, model, fields)
         
         # If not enough articles for ML, return recent articles
-        if len(self.df) < self.min_articles_for_ml or self.similarity_matrix is None:
-            print("Using rule-based recommendations (not enough data for ML)")
+        if len(model) < self.min_articles_for_ml or not model.ml_enabled:
+            logger.debug("Using rule-based recommendations (not enough data for ML)")
             # Return other articles, sorted by engagement
-            other_articles = self.df[self.df['id'] != article_id]
-            return other_articles.nlargest(limit, 'engagement_score').to_dict('records')
-        
-        # Use ML-based similarity
-        similarity_scores = list(enumerate(self.similarity_matrix[article_idx]))
-        similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
+            engagement = self._engagement_scores(model)
+            engagement[article_idx] = -np.inf
+            engagement[model.retired] = -np.inf
+            return model.records(top_k_indices(engagement, min(limit, len(model) - 1)), fields=fields)
         
-        # Get top N (excluding the article itself)
-        top_indices = [i[0] for i in similarity_scores[1:limit+1]]
+        fetch = fetch_size(limit, options)
+        if model.neighbors is not None:
+            top_indices, top_scores = model.neighbors.neighbors(article_idx, fetch)
+        else:
+            # Use ML-based similarity (excluding the article itself)
+            similarities = model.similarity_rows([article_idx])[0]
+            similarities[article_idx] = -np.inf
+            top_indices = top_k_indices(similarities, min(fetch, len(model) - 1))
+            top_scores = similarities[top_indices]
         
-        recommendations = []
-        for idx in top_indices:
-            rec = self.df.iloc[idx].to_dict()
-            rec['similarity_score'] = similarity_scores[idx][1]
-            recommendations.append(rec)
-        
-        return recommendations
+        if options is not None and options.active:
+            vector = model.tfidf_matrix[article_idx] if model.tfidf_matrix is not None else None
+            top_indices, top_scores = self._rerank(model, limit, options, top_indices, top_scores, vector, [article_idx])
+        return model.records(top_indices, top_scores, fields)
     
-    def get_recommendations_by_content(self, content, limit=5):
+    def get_recommendations_by_content(self, content, limit=5, fields=None, options=None):
         """Get recommendations based on content (Artelipi only)"""
-        if self.df is None or len(self.df) == 0:
+        model = self.model
+        if len(model) == 0:
             return []
         
         # If not enough articles, return recent
-        if len(self.df) < self.min_articles_for_ml or self.vectorizer is None:
-            return self.get_recent_articles(limit)
+        if len(model) < self.min_articles_for_ml or model.vectorizer is None:
+            return self.get_recent_articles(limit, model, fields)
         
         # Transform content and find similar articles
-        content_vector = self.vectorizer.transform([content])
-        similarities = cosine_similarity(content_vector, self.tfidf_matrix)[0]
+        content_vector = model.vectorizer.transform([content])
+        fetch = fetch_size(limit, options)
+        if model.ann is not None:
+            top_indices, top_scores = model.ann.search(content_vector, model.tfidf_matrix, fetch)[0]
+        else:
+            # TF-IDF rows are L2-normalized, so the product is cosine similarity
+            similarities = (content_vector @ model.tfidf_matrix.T).toarray()[0]
+            similarities[model.retired] = -np.inf
+            top_indices = top_k_indices(similarities, min(fetch, len(model)))
+            top_scores = similarities[top_indices]
         
-        top_indices = similarities.argsort()[-limit:][::-1]
+        if options is not None and options.active:
+            top_indices, top_scores = self._rerank(model, limit, options, top_indices, top_scores, content_vector)
+        return model.records(top_indices, top_scores, fields)
+    
+    def get_recommendations_batch(self, article_ids, limit=5, fields=None, options=None):
+        """Recommendations for many articles at once, in input order"""
+        model = self.model
+        if len(model) == 0:
+            return [[] for _ in article_ids]
+        if options is not None and options.active:
+            # Re-ranking is per query; there is no shared product to batch
+            return [self.get_recommendations(article_id, limit, fields, options) for article_id in article_ids]
         
-        recommendations = []
-        for idx in top_indices:
-            rec = self.df.iloc[idx].to_dict()
-            rec['similarity_score'] = float(similarities[idx])
-            recommendations.append(rec)
+        rows = [model.row_by_id.get(article_id) for article_id in article_ids]
+        found = [i for i, row in enumerate(rows) if row is not None]
+        if len(model) < self.min_articles_for_ml or not model.ml_enabled or not found:
+            return [self.get_recommendations(article_id, limit, fields) for article_id in article_ids]
         
-        return recommendations
+        found_rows = np.array([rows[i] for i in found])
+        if model.neighbors is not None:
+            # The fallback below still returns `limit` recent articles
+            width = min(limit, model.neighbors.width)
+            top_indices = model.neighbors.indices[found_rows, :width]
+            top_scores = model.neighbors.scores[found_rows, :width]
+        else:
+            similarities = model.similarity_rows(found_rows)
+            similarities[np.arange(len(found_rows)), found_rows] = -np.inf
+            top_indices, top_scores = top_k_matrix(similarities, min(limit, len(model) - 1))
+        
+        results = [None] * len(article_ids)
+        for i, indices, scores in zip(found, top_indices, top_scores):
+            valid = indices >= 0  # Lists that lost retired neighbors end in -1 padding
+            results[i] = model.records(indices[valid], scores[valid], fields)
+        for i, row in enumerate(rows):
+            if row is None:
+                results[i] = self.get_recent_articles(limit, model, fields)
+        return results
     
-    def save_model(self, path='ml_models_artelipi'):
-        """Save the model"""
-        os.makedirs(path, exist_ok=True)
+    def get_recommendations_by_content_batch(self, contents, limit=5, fields=None, options=None):
+        """Recommendations for many content snippets with one sparse product"""
+        model = self.model
+        if len(model) == 0:
+            return [[] for _ in contents]
+        if options is not None and options.active:
+            return [self.get_recommendations_by_content(content, limit, fields, options) for content in contents]
         
-        if self.vectorizer:
-            with open(f'{path}/vectorizer.pkl', 'wb') as f:
-                pickle.dump(self.vectorizer, f)
+        if len(model) < self.min_articles_for_ml or model.vectorizer is None:
+            recent = self.get_recent_articles(limit, model, fields)
+            return [list(recent) for _ in contents]
         
-        if self.tfidf_matrix is not None:
-            with open(f'{path}/tfidf_matrix.pkl', 'wb') as f:
-                pickle.dump(self.tfidf_matrix, f)
+        # TF-IDF rows are L2-normalized, so the product is cosine similarity
+        content_vectors = model.vectorizer.transform(contents)
+        if model.ann is not None:
+            return [model.records(indices, scores, fields)
+                    for indices, scores in model.ann.search(content_vectors, model.tfidf_matrix, limit)]
+        similarities = (content_vectors @ model.tfidf_matrix.T).toarray()
+        similarities[:, model.retired] = -np.inf
+        top_indices, top_scores = top_k_matrix(similarities, min(limit, len(model)))
         
-        if self.similarity_matrix is not None:
-            with open(f'{path}/similarity_matrix.pkl', 'wb') as f:
-                pickle.dump(self.similarity_matrix, f)
-        
-        if self.df is not None:
-            self.df.to_csv(f'{path}/articles.csv', index=False)
+        return [model.records(indices, scores, fields) for indices, scores in zip(top_indices, top_scores)]
+    
+    def save_model(self, path='ml_models_artelipi'):
+        """Save the model as a new versioned, memory-mappable generation"""
+        with self._write_lock:
+            model = self.model
+            watermark = self.sync_watermark
         
-        print(f"✅ Model saved to {path}/")
+        with timed('model_save'):
+            generation = save_artifact(
+                path, model.df, model.vectorizer, model.tfidf_matrix,
+                similarity_matrix=model.similarity_matrix,
+                neighbors=model.neighbors,
+                ann=model.ann,
+                search=model.search,
+                retired=model.retired,
+                sync_watermark=watermark,
+                model_version=model.version,
+            )
+        self.generation = generation
+        self.saved_version = model.version
+        logger.info("Model saved to %s/%s", path, generation)
+        return generation
     
-    def load_model(self, path='ml_models_artelipi'):
-        """Load saved model"""
+    def load_model(self, path='ml_models_artelipi', mmap=True, verify=False):
+        """Load the current saved generation (arrays are memory-mapped)"""
+        started = time.perf_counter()
         try:
-            with open(f'{path}/vectorizer.pkl', 'rb') as f:
-                self.vectorizer = pickle.load(f)
-            
-            with open(f'{path}/tfidf_matrix.pkl', 'rb') as f:
-                self.tfidf_matrix = pickle.load(f)
-            
-            with open(f'{path}/similarity_matrix.pkl', 'rb') as f:
-                self.similarity_matrix = pickle.load(f)
-            
-            self.df = pd.read_csv(f'{path}/articles.csv')
-            
-            print(f"✅ Model loaded from {path}/")
-            return True
-        except FileNotFoundError:
-            print(f"⚠️ No saved model found at {path}/")
+            artifact = load_artifact(path, mmap=mmap, verify=verify)
+        except ArtifactError as e:
+            logger.warning("Could not load saved model from %s/: %s", path, e)
+            return False
+        
+        if artifact is None:
+            logger.warning("No saved model found at %s/", path)
             return False
+        
+        with self._write_lock:
+            model = RecommenderModel(
+                artifact["df"], artifact["vectorizer"], artifact["tfidf_matrix"],
+                artifact["similarity_matrix"], artifact["neighbors"], artifact["ann"], artifact["retired"]
+            )
+            if artifact["search_postings"] is not None:
+                model.search = SearchIndex(artifact["search_postings"], artifact["search_doc_lengths"], model)
+            self._publish(model, rebuilt=True)
+            self.sync_watermark = artifact["sync_watermark"]
+            self.generation = artifact["manifest"]["generation"]
+            self.saved_version = model.version
+        
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='model_load')
+        logger.info("Model loaded from %s/%s", path, artifact['manifest']['generation'])
+        return True
 
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     recommender = ArtelipiRecommender()
     
-    # Load articles from Firestore
-    recommender.load_artelipi_articles()
-    
-    # Build ML model if enough articles
-    recommender.build_ml_model()
+    # Load articles from Firestore and build ML model if enough articles
+    recommender.reload()
     
     # Save model
     recommender.save_model()
@@ -264,8 +1258,8 @@ if __name__ == "__main__":
         print("\n" + "="*80)
         print("Trending Articles (Artelipi Only)")
         print("="*80)
-        trending = recommender.get_trending_articles(5)
+        trending = recommender.get_trending_articles(5, window='7d')
         for i, article in enumerate(trending, 1):
             print(f"\n{i}. {article['title']}")
             print(f"   By: {article['author']}")
-            print(f"   Engagement: {article.get('engagement_score', 0)}")
+            print(f"   Engagement: {article.get('engagement_score', 0)} (trending {article.get('trending_score', 0):.2f})")
@@ -0,0 +1,170 @@
+# Candidate filtering and diversity re-ranking for Artelipi recommendations
+#
+# Queries over-fetch candidates (neighbor lists, a similarity row or a
+# content query), drop those the request filters out and re-rank the rest
+# with maximal marginal relevance (MMR) under a per-author cap. Filters use
+# the sorted row arrays of the model's SearchIndex, never DataFrame masks.
+
+import numpy as np
+
+from artelipi_neighbors import top_k_indices
+from artelipi_search import SearchIndex
+
+# Candidates fetched per requested result before filtering and re-ranking
+OVERFETCH = 4
+
+# Diversified results must be at least this similar to the query: MMR would
+# otherwise pick unrelated articles for being unlike the ones already picked
+MIN_DIVERSE_SCORE = 0.0
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class RerankOptions:
+    def __init__(self, diversity=0.0, max_per_author=None, tags=(), category=None, exclude=()):
+        """What a query asks of the re-ranking stage
+
+        `diversity` in [0, 1] trades similarity to the query for novelty
+        against results already picked (0 is plain top-k). At most
+        `max_per_author` results come from one author. Results must carry
+        every tag in `tags` and belong to `category`; article ids in
+        `exclude` (e.g. already read) are never returned.
+        """
+        self.diversity = float(diversity or 0.0)
+        self.max_per_author = max_per_author or None
+        self.tags = tuple(tag.lower() for tag in tags if tag)
+        self.category = category.lower() if category else None
+        self.exclude = tuple(dict.fromkeys(exclude))
+
+    @property
+    def active(self):
+        return bool(self.diversity or self.max_per_author or self.tags or self.category or self.exclude)
+
+    @property
+    def filtered(self):
+        """Whether only some rows of the corpus are eligible"""
+        return bool(self.tags or self.category)
+
+    def key(self):
+        """Hashable form for response cache keys"""
+        return (self.diversity, self.max_per_author, self.tags, self.category, self.exclude)
+
+
+def fetch_size(limit, options):
+    """Candidates to fetch for `limit` results (just `limit` without re-ranking)"""
+    if options is None or not options.active:
+        return limit
+    fetch = limit * OVERFETCH
+    if options.filtered:
+        # Most candidates of an unfiltered query won't match
+        fetch *= OVERFETCH
+    return fetch + len(options.exclude)
+
+
+def is_member(rows, sorted_rows):
+    """Mask of the `rows` present in the sorted array `sorted_rows`"""
+    if len(sorted_rows) == 0:
+        return np.zeros(len(rows), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_rows, rows), len(sorted_rows) - 1)
+    return sorted_rows[positions] == rows
+
+
+class FilterGroups:
+    def __init__(self, columns):
+        """The filter arrays of a SearchIndex, without the postings"""
+        self.rows_by_tag = SearchIndex._group(columns.get('tags'), many=True)
+        self.rows_by_category = SearchIndex._group(columns.get('category'))
+        self.author_codes = SearchIndex._codes(
+            SearchIndex._group(columns.get('authorId'), lower=False), len(columns.get('id') or []))
+
+
+def _index(model):
+    # Models published by the recommender always carry one; a bare model
+    # gets the same groups built on the spot
+    if model.search is not None:
+        return model.search
+    return FilterGroups(model.columns)
+
+
+def allowed_rows(model, options):
+    """Sorted rows passing the tag/category filters (None when unfiltered)"""
+    if not options.filtered:
+        return None
+    index = _index(model)
+    groups = [index.rows_by_tag.get(tag, _NO_ROWS) for tag in options.tags]
+    if options.category:
+        groups.append(index.rows_by_category.get(options.category, _NO_ROWS))
+    groups.sort(key=len)
+    rows = groups[0]
+    for group in groups[1:]:
+        rows = rows[is_member(rows, group)]
+    return rows
+
+
+def excluded_rows(model, options, rows=()):
+    """Sorted rows of `options.exclude` plus `rows` (e.g. the query article)
+
+    Retired rows (see RecommenderModel) are always excluded.
+    """
+    excluded = [model.row_by_id[article_id] for article_id in options.exclude if article_id in model.row_by_id]
+    return np.union1d(np.asarray(list(rows) + excluded, dtype=np.int64), model.retired)
+
+
+def filter_candidates(candidates, scores, allowed, excluded):
+    """Drop candidates outside `allowed` (None: everything) or in `excluded`"""
+    keep = np.ones(len(candidates), dtype=bool)
+    if allowed is not None:
+        keep &= is_member(candidates, allowed)
+    if len(excluded):
+        keep &= ~is_member(candidates, excluded)
+    return candidates[keep], scores[keep]
+
+
+def diversify(model, candidates, scores, limit, options):
+    """Pick `limit` candidates: (rows, similarity scores) in result order
+
+    Each step takes the candidate maximizing
+    (1 - diversity) * score - diversity * (max similarity to those picked),
+    skipping authors that reached `max_per_author`. With a `diversity`,
+    candidates scoring MIN_DIVERSE_SCORE or less are dropped first, so
+    fewer than `limit` may be returned.
+    """
+    diversity = options.diversity if model.tfidf_matrix is not None else 0.0
+    if not diversity and not options.max_per_author:
+        top = top_k_indices(scores, limit)
+        return candidates[top], scores[top]
+
+    if diversity:
+        relevant = scores > MIN_DIVERSE_SCORE
+        candidates, scores = candidates[relevant], scores[relevant]
+
+    # Best first, so ties keep the order plain top-k would give
+    order = np.argsort(-scores, kind='stable')
+    candidates, scores = candidates[order], scores[order]
+    available = np.ones(len(candidates), dtype=bool)
+    authors = _index(model).author_codes[candidates] if options.max_per_author else None
+    per_author = {}
+    if diversity:
+        vectors = model.tfidf_matrix[candidates]
+        pairwise = (vectors @ vectors.T).toarray()
+        redundancy = np.zeros(len(candidates))
+
+    picked = []
+    while len(picked) < limit and available.any():
+        if diversity:
+            gain = (1 - diversity) * scores - diversity * redundancy
+            gain[~available] = -np.inf
+            best = int(np.argmax(gain))
+        else:
+            best = int(np.argmax(available))
+        picked.append(best)
+        available[best] = False
+        if diversity:
+            redundancy = np.maximum(redundancy, pairwise[best])
+        if authors is not None and authors[best] >= 0:
+            author = authors[best]
+            per_author[author] = per_author.get(author, 0) + 1
+            if per_author[author] >= options.max_per_author:
+                available &= authors != author
+    picked = np.asarray(picked, dtype=np.int64)
+    return candidates[picked], scores[picked]
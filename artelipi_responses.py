@@ -0,0 +1,121 @@
+# Response models, field projection and JSON encoding for the Artelipi API
+
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict
+
+from artelipi_metrics import timed
+
+try:
+    import orjson
+except ImportError:  # Falls back to the (slower) standard library encoder
+    orjson = None
+    import json
+
+# Fields returned for each article unless `fields=` asks for others
+CARD_FIELDS = ('id', 'slug', 'title', 'author', 'tags', 'likeCount', 'viewCount', 'bookmarkCount', 'createdAt')
+
+# Per-result scores, returned whenever the query produced them
+SCORE_FIELDS = ('similarity_score', 'engagement_score', 'trending_score', 'search_score', 'follow_boost')
+
+
+class ArticleCard(BaseModel):
+    model_config = ConfigDict(extra='allow')  # fields=all returns every column
+
+    id: Optional[str] = None
+    slug: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    tags: Optional[List[str]] = None
+    likeCount: Optional[int] = None
+    viewCount: Optional[int] = None
+    bookmarkCount: Optional[int] = None
+    createdAt: Optional[str] = None
+    similarity_score: Optional[float] = None
+    engagement_score: Optional[float] = None
+    trending_score: Optional[float] = None
+    search_score: Optional[float] = None
+    follow_boost: Optional[float] = None  # Added to similarity_score when ranking
+
+
+class AuthorCard(BaseModel):
+    uid: str
+    name: Optional[str] = None
+    username: Optional[str] = None
+    photoURL: Optional[str] = None
+    article_count: int = 0
+
+
+class ArticleListResponse(BaseModel):
+    articles: List[ArticleCard]
+    count: int
+    window: Optional[str] = None
+    source: str
+
+
+class RecommendationsResponse(BaseModel):
+    recommendations: List[ArticleCard]
+    count: int
+    ml_enabled: bool
+    source: str
+
+
+class UserRecommendationsResponse(BaseModel):
+    uid: str
+    recommendations: List[ArticleCard]
+    count: int
+    strategy: str  # profile, following or trending
+    profile: Dict[str, int]
+    source: str
+
+
+class SearchResponse(BaseModel):
+    query: str
+    articles: List[ArticleCard]
+    authors: List[AuthorCard]
+    total: int
+    offset: int
+    limit: int
+    source: str
+
+
+class BatchRecommendationsResponse(BaseModel):
+    by_article: Dict[str, List[ArticleCard]]
+    by_content: List[List[ArticleCard]]
+    count: int
+    ml_enabled: bool
+    source: str
+
+
+def parse_fields(fields, columns):
+    """Columns to return for a `fields=` parameter (None means all of them)
+
+    Defaults to CARD_FIELDS; `fields=all` returns every stored column.
+    """
+    if fields is None or fields == '':
+        return tuple(name for name in CARD_FIELDS if name in columns)
+    if fields == 'all':
+        return None
+
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in requested if name not in columns and name not in SCORE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(name for name in requested if name not in SCORE_FIELDS)
+
+
+def encode_json(payload):
+    """Encode JSON-native payloads (see RecommenderModel.columns) to bytes"""
+    with timed('json_encode'):
+        if orjson is not None:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with encode_json()"""
+
+    def render(self, content):
+        return encode_json(content)
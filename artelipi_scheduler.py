@@ -0,0 +1,182 @@
+# Background model rebuilds for the Artelipi Recommendation API
+
+import threading
+import time
+
+from artelipi_artifacts import current_generation
+
+
+class ModelScheduler:
+    def __init__(self, recommender, interval=3600, min_changes=50, poll_interval=30, on_build=None,
+                 reload=False, reload_interval=0):
+        """Refit the recommender in a background thread
+
+        A rebuild runs every `interval` seconds, as soon as `min_changes`
+        articles have been upserted/deleted since the last build, or when the
+        corpus is large enough for ML but has no model yet. The new model is
+        published with an atomic swap, so requests never wait on a fit.
+        With `reload` every rebuild re-reads the whole corpus from Firestore
+        (full sync mode, where nothing else keeps the corpus current).
+        Otherwise rebuilds refit from the synced snapshot, which keeps the
+        'tfidf' vocabulary; a full reload every `reload_interval` seconds
+        (0 = never) picks up the terms of new articles.
+        """
+        self.recommender = recommender
+        self.interval = interval
+        self.min_changes = min_changes
+        self.poll_interval = poll_interval
+        self.on_build = on_build  # e.g. save the new model to disk
+        self.reload = reload
+        self.reload_interval = reload_interval
+        self.reloaded_at = time.time()
+        self.builds = 0
+        self.build_errors = 0
+        self.last_reason = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-rebuild", daemon=True)
+        self._thread.start()
+        print(f"✅ Model rebuild scheduler started (every {self.interval}s or {self.min_changes} changes)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def trigger(self):
+        """Check for a rebuild now instead of at the next poll"""
+        self._wake.set()
+
+    def due(self):
+        """Why a rebuild is due, or None"""
+        if self.reload:
+            # The corpus itself is only current as of the last reload
+            if self.interval and time.time() - self.reloaded_at >= self.interval:
+                return "interval"
+            return None
+        recommender = self.recommender
+        if len(recommender.model) < recommender.min_articles_for_ml:
+            return None
+        if not recommender.ml_enabled:
+            return "no_model"
+        if self.reload_interval and time.time() - self.reloaded_at >= self.reload_interval:
+            return "reload"
+        if self.min_changes and recommender.changes_since_build >= self.min_changes:
+            return "changes"
+        last_build = recommender.last_build
+        if self.interval and (last_build is None or time.time() - last_build["built_at"] >= self.interval):
+            return "interval"
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            reason = self.due()
+            if reason is None:
+                continue
+            try:
+                print(f"Rebuilding model in background ({reason})...")
+                if self._build(reason):
+                    self.builds += 1
+                    self.last_reason = reason
+                    self.last_error = None
+                    if self.on_build is not None:
+                        self.on_build()
+            except Exception as e:
+                print(f"⚠️ Background model rebuild failed: {e}")
+                self.build_errors += 1
+                self.last_error = e
+
+    def _build(self, reason):
+        if self.reload or reason == "reload":
+            self.recommender.reload()
+            self.reloaded_at = time.time()
+            return True
+        return self.recommender.build_ml_model()
+
+    def stats(self):
+        return {
+            "running": self._thread is not None,
+            "reload": self.reload,
+            "reload_interval_seconds": self.reload_interval,
+            "interval_seconds": self.interval,
+            "min_changes": self.min_changes,
+            "builds": self.builds,
+            "build_errors": self.build_errors,
+            "last_reason": self.last_reason,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+
+class GenerationWatcher:
+    def __init__(self, recommender, path, poll_interval=1.0):
+        """Follow the saved model's CURRENT file in a read-only worker
+
+        The serving parent writes each new model as a generation and swaps
+        CURRENT; every worker polling it maps the new generation within
+        `poll_interval` seconds, so all of them switch over together.
+        """
+        self.recommender = recommender
+        self.path = path
+        self.poll_interval = poll_interval
+        self.switches = 0
+        self.errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="generation-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def check(self):
+        """Load the current generation if it changed; True when switched"""
+        generation = current_generation(self.path)
+        if generation is None or generation == self.recommender.generation:
+            return False
+        if not self.recommender.load_model(self.path):
+            return False
+        self.switches += 1
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                # e.g. the generation was pruned before it could be mapped; retried next poll
+                print(f"⚠️ Could not switch model generation: {e}")
+                self.errors += 1
+                self.last_error = e
+
+    def stats(self):
+        return {
+            "running": self._thread is not None,
+            "path": self.path,
+            "generation": self.recommender.generation,
+            "switches": self.switches,
+            "errors": self.errors,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
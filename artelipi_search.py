@@ -0,0 +1,345 @@
+# Inverted-index search over the Artelipi corpus (BM25) and author lookup
+
+import bisect
+import copy
+
+import numpy as np
+from scipy import sparse
+
+# Hashed unigram space of the postings (collisions are rare at this size)
+SEARCH_FEATURES = 2 ** 20
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Created on first use, so importing this module doesn't import sklearn
+_hasher = None
+
+
+def search_text(record):
+    """Searchable text of a corpus row (call before its body is removed)
+
+    The title is repeated to weight it above the body.
+    """
+    title = record.get('title') or ''
+    return ' '.join([
+        title, title,
+        ' '.join(record.get('tags') or []),
+        ' '.join(record.get('keywords') or []),
+        record.get('category') or '',
+        record.get('author') or '',
+        record.get('content') or '',
+    ])
+
+
+def count_terms(texts):
+    """Hashed term counts for a chunk of search texts (docs x SEARCH_FEATURES)"""
+    global _hasher
+    if _hasher is None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        _hasher = HashingVectorizer(
+            n_features=SEARCH_FEATURES,
+            stop_words='english',
+            alternate_sign=False,
+            norm=None,
+        )
+    return _hasher.transform(texts)
+
+
+def _prefix_range(keys, prefix):
+    """[start, end) of the sorted `keys` that start with `prefix`"""
+    start = bisect.bisect_left(keys, prefix)
+    end = bisect.bisect_left(keys, prefix + '\uffff')
+    return start, end
+
+
+def _name_keys(name):
+    """Lowercased full name and each of its words, for prefix lookups"""
+    name = (name or '').strip().lower()
+    if not name:
+        return []
+    return [name] + name.split()[1:]
+
+
+class SearchIndex:
+    def __init__(self, postings, doc_lengths, model):
+        """BM25 over term postings plus tag/category/author filters
+
+        `postings` is a (SEARCH_FEATURES x N) CSR matrix: row t lists the
+        articles containing term t and its frequency in each. Filters are
+        derived from the columns of the RecommenderModel the index belongs to.
+        """
+        self.postings = postings
+        self.appended = None  # (docs x SEARCH_FEATURES) counts added by `patched()`
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.n_docs = postings.shape[1]
+
+        columns = model.columns
+        self.created = model.created
+        self.retired = model.retired
+        self.avg_length = self._avg_length()
+
+        self.rows_by_tag = self._group(columns.get('tags'), many=True)
+        self.rows_by_category = self._group(columns.get('category'))
+        self.rows_by_author_id = self._group(columns.get('authorId'), lower=False)
+        self.author_code_by_id = {author_id: code for code, author_id in enumerate(self.rows_by_author_id)}
+        # Row -> author number (-1 if unknown), for per-author result caps
+        self.author_codes = self._codes(self.rows_by_author_id, self.n_docs)
+        if len(self.retired):
+            for groups in (self.rows_by_tag, self.rows_by_category, self.rows_by_author_id):
+                for key, rows in groups.items():
+                    groups[key] = rows[~np.isin(rows, self.retired)]
+            self.author_codes[self.retired] = -1
+
+        author_keys = []
+        for row, name in enumerate(columns.get('author') or []):
+            author_keys.extend((key, row) for key in _name_keys(name))
+        author_keys.sort()
+        self.author_keys = [key for key, _ in author_keys]
+        self.author_rows = np.array([row for _, row in author_keys], dtype=np.int64)
+
+    @staticmethod
+    def _group(values, many=False, lower=True):
+        """value -> sorted row positions"""
+        groups = {}
+        for row, value in enumerate(values or []):
+            for item in (value or []) if many else [value]:
+                # Missing values may arrive as None or NaN
+                if not isinstance(item, str) or item == '':
+                    continue
+                groups.setdefault(item.lower() if lower else item, []).append(row)
+        return {key: np.array(rows, dtype=np.int64) for key, rows in groups.items()}
+
+    @staticmethod
+    def _codes(groups, n_docs):
+        """row -> number of its group (-1 if in none) for single-valued groups"""
+        codes = np.full(n_docs, -1, dtype=np.int32)
+        for code, rows in enumerate(groups.values()):
+            codes[rows] = code
+        return codes
+
+    @classmethod
+    def build(cls, model, counts):
+        """Index a RecommenderModel from its (N x SEARCH_FEATURES) term counts"""
+        counts = counts.tocsr()
+        return cls(counts.T.tocsr(), np.asarray(counts.sum(axis=1)).ravel(), model)
+
+    def patched(self, model, retired, counts):
+        """Index after an incremental change (same layout as TopKNeighbors.patched)
+
+        `counts` holds the term counts of the rows appended to `model` and
+        `retired` the rows it newly retired. The postings are shared with
+        this index and only the touched filter groups are copied.
+        """
+        index = copy.copy(self)
+        counts = counts.tocsr()
+        n_old = len(self.doc_lengths)
+        new_rows = np.arange(n_old, n_old + counts.shape[0])
+        index.appended = counts if self.appended is None else sparse.vstack([self.appended, counts], format='csr')
+        index.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(counts.sum(axis=1), dtype=np.float32).ravel()])
+        index.n_docs = len(index.doc_lengths)
+        index.created = model.created
+        index.retired = model.retired
+        index.avg_length = index._avg_length()
+
+        columns = model.columns
+        index.rows_by_tag = self._patch_groups(self.rows_by_tag, columns.get('tags'), retired, new_rows, many=True)
+        index.rows_by_category = self._patch_groups(self.rows_by_category, columns.get('category'), retired, new_rows)
+        index.rows_by_author_id = self._patch_groups(
+            self.rows_by_author_id, columns.get('authorId'), retired, new_rows, lower=False)
+
+        index.author_codes = np.concatenate([self.author_codes, np.full(len(new_rows), -1, dtype=np.int32)])
+        index.author_codes[retired] = -1
+        author_ids = columns.get('authorId') or []
+        for row in new_rows if author_ids else ():
+            author_id = author_ids[row]
+            if isinstance(author_id, str) and author_id != '':
+                if author_id not in index.author_code_by_id:
+                    if index.author_code_by_id is self.author_code_by_id:
+                        index.author_code_by_id = dict(self.author_code_by_id)
+                    index.author_code_by_id[author_id] = len(index.author_code_by_id)
+                index.author_codes[row] = index.author_code_by_id[author_id]
+
+        names = columns.get('author') or []
+        added = sorted((key, row) for row in new_rows if names for key in _name_keys(names[row]))
+        if added:
+            positions = [bisect.bisect_right(self.author_keys, key) for key, _ in added]
+            keys = []
+            previous = 0
+            for position, (key, _) in zip(positions, added):
+                keys.extend(self.author_keys[previous:position])
+                keys.append(key)
+                previous = position
+            keys.extend(self.author_keys[previous:])
+            index.author_keys = keys
+            index.author_rows = np.insert(self.author_rows, positions, [row for _, row in added])
+        return index
+
+    def _avg_length(self):
+        """Mean length of the documents that are not retired"""
+        n_live = self.n_docs - len(self.retired)
+        if n_live <= 0:
+            return 0.0
+        return float((self.doc_lengths.sum(dtype=np.float64) - self.doc_lengths[self.retired].sum()) / n_live)
+
+    @classmethod
+    def _patch_groups(cls, groups, values, retired, new_rows, many=False, lower=True):
+        """Copy of `groups` without the `retired` rows and with `new_rows` added
+
+        Only the groups of the rows involved are rebuilt; appended rows come
+        after every existing one, so the row arrays stay sorted.
+        """
+        if not values:
+            return groups
+        removed = cls._group([values[row] for row in retired], many, lower)
+        added = cls._group([values[row] for row in new_rows], many, lower)
+        if not removed and not added:
+            return groups
+        groups = dict(groups)
+        for key in removed.keys() | added.keys():
+            rows = groups.get(key, np.empty(0, dtype=np.int64))
+            if key in removed:
+                rows = rows[~np.isin(rows, retired[removed[key]])]
+            if key in added:
+                rows = np.concatenate([rows, new_rows[added[key]]])
+            if len(rows):
+                groups[key] = rows
+            else:
+                groups.pop(key, None)
+        return groups
+
+    def merged_postings(self):
+        """The (SEARCH_FEATURES x N) postings including appended documents"""
+        if self.appended is None:
+            return self.postings
+        return sparse.hstack([self.postings, self.appended.T], format='csr')
+
+    @property
+    def nbytes(self):
+        appended = 0
+        if self.appended is not None:
+            appended = self.appended.data.nbytes + self.appended.indices.nbytes + self.appended.indptr.nbytes
+        return (self.postings.data.nbytes + self.postings.indices.nbytes + self.postings.indptr.nbytes
+                + appended + self.doc_lengths.nbytes + self.author_codes.nbytes)
+
+    def bm25(self, query):
+        """BM25 score of every article for `query` (0 where no term matches)"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        terms = np.unique(count_terms([query]).indices)
+        n_base = self.postings.shape[1]
+        # Term frequencies in the documents appended since the last build
+        appended = self.appended[:, terms].toarray() if self.appended is not None else None
+        n_live = self.n_docs - len(self.retired)
+        indptr = self.postings.indptr
+        for i, term in enumerate(terms):
+            start, end = indptr[term], indptr[term + 1]
+            docs = self.postings.indices[start:end]
+            tf = self.postings.data[start:end].astype(np.float32)
+            if appended is not None and appended[:, i].any():
+                new_docs = np.flatnonzero(appended[:, i])
+                docs = np.concatenate([docs, n_base + new_docs])
+                tf = np.concatenate([tf, appended[new_docs, i].astype(np.float32)])
+            if len(docs) == 0:
+                continue
+            # Retired rows are never returned and don't count as documents
+            doc_freq = len(docs) - (np.isin(docs, self.retired).sum() if len(self.retired) else 0)
+            idf = np.log1p((n_live - doc_freq + 0.5) / (doc_freq + 0.5))
+            norm = K1 * (1 - B + B * self.doc_lengths[docs] / (self.avg_length or 1.0))
+            scores[docs] += idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def author_prefix_rows(self, prefix):
+        start, end = _prefix_range(self.author_keys, prefix.strip().lower())
+        rows = np.unique(self.author_rows[start:end])
+        return rows[~np.isin(rows, self.retired)] if len(self.retired) else rows
+
+    def search(self, query='', tags=(), category=None, author=None, author_ids=(), offset=0, limit=20):
+        """(row positions, scores, total matches) for one page of results
+
+        Text queries rank by BM25; filter-only queries rank by recency.
+        `author` matches a prefix of the author's name (or any word in it)
+        and `author_ids` adds articles by those authors (e.g. username
+        matches from AuthorIndex).
+        """
+        if query and query.strip():
+            scores = self.bm25(query)
+            matched = scores > 0
+        else:
+            scores = self.created if self.created is not None else np.zeros(self.n_docs)
+            matched = np.ones(self.n_docs, dtype=bool)
+        # Rows replaced or removed since the last build
+        matched[self.retired] = False
+
+        for tag in tags:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[self.rows_by_tag.get(tag.lower(), [])] = True
+            matched &= allowed
+        if category:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[self.rows_by_category.get(category.lower(), [])] = True
+            matched &= allowed
+        if author or author_ids:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            if author:
+                allowed[self.author_prefix_rows(author)] = True
+            for author_id in author_ids:
+                allowed[self.rows_by_author_id.get(author_id, [])] = True
+            matched &= allowed
+
+        rows = np.flatnonzero(matched)
+        k = min(offset + limit, len(rows))
+        if k == 0:
+            return rows[:0], scores[:0], len(rows)
+
+        # Ties are broken by row so pages never overlap or skip results
+        row_scores = scores[rows]
+        kth = np.partition(row_scores, len(rows) - k)[len(rows) - k]
+        candidates = np.flatnonzero(row_scores >= kth)
+        order = np.lexsort((rows[candidates], -row_scores[candidates]))
+        top = rows[candidates[order][offset:offset + limit]]
+        return top, scores[top], len(rows)
+
+
+class AuthorIndex:
+    def __init__(self, authors, article_counts=None):
+        """Prefix lookup of authors by name, any word of the name, or username
+
+        `authors` are dicts with uid, name, username and photoURL; matches
+        are ordered by their number of published articles.
+        """
+        self.authors = authors
+        article_counts = article_counts or {}
+        self.article_counts = [article_counts.get(author['uid'], 0) for author in authors]
+
+        keys = []
+        for i, author in enumerate(authors):
+            for key in _name_keys(author.get('name')) + _name_keys(author.get('username')):
+                keys.append((key, i))
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.entries = [i for _, i in keys]
+
+    @staticmethod
+    def author_record(doc_id, data):
+        """Map a Firestore user document to a searchable author"""
+        return {
+            'uid': doc_id,
+            'name': data.get('name', ''),
+            'username': data.get('username'),
+            'photoURL': data.get('photoURL'),
+        }
+
+    def __len__(self):
+        return len(self.authors)
+
+    def match_ids(self, prefix):
+        """uids of every author with a name/username word starting with `prefix`"""
+        start, end = _prefix_range(self.keys, prefix.strip().lower())
+        return {self.authors[i]['uid'] for i in self.entries[start:end]}
+
+    def search(self, prefix, limit=5):
+        start, end = _prefix_range(self.keys, prefix.strip().lower())
+        matches = list(dict.fromkeys(self.entries[start:end]))
+        matches.sort(key=lambda i: -self.article_counts[i])
+        return [dict(self.authors[i], article_count=self.article_counts[i]) for i in matches[:limit]]
@@ -0,0 +1,93 @@
+# Multi-process serving for the Artelipi Recommendation API
+#
+# The parent process loads (or builds) the model once and saves it as a
+# memory-mappable generation; N uvicorn workers serve that generation
+# read-only, so its arrays live once in the page cache however many workers
+# run. The parent keeps the corpus fresh and writes each changed model as a
+# new generation, and every worker switches to it when CURRENT changes.
+#
+#   python artelipi_serve.py --workers 4 --port 8000
+#   ARTELIPI_WORKERS=4 python artelipi_serve.py
+
+import argparse
+import os
+import threading
+import time
+
+import uvicorn
+
+
+def publish_models(server, save_interval=30, poll_interval=1.0, stop=None):
+    """Parent loop: refresh the corpus and save changed models as generations
+
+    The corpus is refreshed when the cache TTL expires or a worker asks via
+    /refresh; incremental changes are written at most every `save_interval`
+    seconds (rebuilds are saved by the scheduler as soon as they finish).
+    """
+    stop = stop or threading.Event()
+    last_save = time.time()
+    while not stop.wait(poll_interval):
+        try:
+            if server.take_refresh_request():
+                server.refresh_and_save()
+            elif server.corpus_cache.is_stale():
+                server.corpus_cache.refresh()
+            if time.time() - last_save >= save_interval:
+                server.save_if_changed()
+                last_save = time.time()
+        except Exception as e:
+            print(f"⚠️ Model publishing failed: {e}")
+
+
+def load_and_publish(server, save_interval=30, stop=None):
+    """Parent: load (or build) the first model, then keep publishing generations
+
+    Runs beside the workers, which answer /health right away and /ready
+    once the first generation is saved.
+    """
+    server.run_startup_load()
+    print(f"✅ Serving generation {server.recommender.generation}")
+    publish_models(server, save_interval, stop=stop)
+
+
+def serve(workers, host="0.0.0.0", port=8000):
+    if workers <= 1:
+        # Nothing to share: a single standalone process
+        uvicorn.run("artelipi_api_server:app", host=host, port=port)
+        return
+
+    os.environ["ARTELIPI_ROLE"] = "parent"
+    import artelipi_api_server as server
+
+    stop = threading.Event()
+    publisher = threading.Thread(
+        target=load_and_publish,
+        args=(server, float(os.environ.get("ARTELIPI_GENERATION_SAVE_SECONDS", "30"))),
+        kwargs={"stop": stop},
+        name="model-publisher",
+        daemon=True,
+    )
+    publisher.start()
+    print(f"✅ Starting {workers} workers")
+
+    # Workers are spawned fresh and import the app in the read-only role
+    os.environ["ARTELIPI_ROLE"] = "worker"
+    try:
+        uvicorn.run("artelipi_api_server:app", host=host, port=port, workers=workers)
+    finally:
+        stop.set()
+        server.scheduler.stop()
+        server.recommender.stop_listener()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Artelipi API from several worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ARTELIPI_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
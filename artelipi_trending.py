@@ -0,0 +1,252 @@
+# Precomputed, time-decayed trending index for the Artelipi recommender
+
+import bisect
+import math
+import threading
+import time
+
+import numpy as np
+
+# Trending windows: name -> span in seconds (None = all time)
+WINDOWS = {
+    '24h': 24 * 3600,
+    '7d': 7 * 24 * 3600,
+    'all': None,
+}
+
+
+# An update_many() changing more than this share of the rows re-sorts the
+# ranked lists once instead of moving each row
+RESORT_FRACTION = 1 / 64
+
+
+def engagement_scores(likes, views, bookmarks):
+    return likes * 3 + views * 1 + bookmarks * 5
+
+
+class TrendingIndex:
+    def __init__(self, half_life_hours=48):
+        """Ranked article lists per window, maintained between model builds
+
+        An article's trending score is (engagement + 1) * 0.5 ** (age /
+        half_life), so posts without engagement still rank by recency. Its
+        log, ln(engagement + 1) + createdAt * ln2 / half_life, orders articles
+        the same way at any point in time, so the rankings only change when
+        engagement does. `half_life_hours=None` disables the decay. The 'all'
+        window ranks by engagement alone: with no cutoff, a decay would turn
+        it into a list of the newest posts.
+        """
+        self.half_life_hours = half_life_hours
+        self.model_version = None
+        self.row_by_id = {}
+        self.likes = np.empty(0)
+        self.views = np.empty(0)
+        self.bookmarks = np.empty(0)
+        self.created = np.empty(0)  # epoch seconds, 0 when unknown
+        self.keys = np.empty(0)            # Decayed ranking key of the bounded windows
+        self.all_time_keys = np.empty(0)   # ln(engagement + 1), the 'all' window's key
+        self.ranked = {window: np.empty(0, dtype=np.int64) for window in WINDOWS}
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, model, half_life_hours=48, overrides=None, now=None):
+        """Index a RecommenderModel; `overrides` maps id -> (likes, views, bookmarks)"""
+        index = cls(half_life_hours)
+        index.model_version = model.version
+        if len(model) == 0:
+            return index
+
+        columns = model.columns
+        index.row_by_id = model.row_by_id
+        index.likes = np.asarray(columns['likeCount'], dtype=np.float64)
+        index.views = np.asarray(columns['viewCount'], dtype=np.float64)
+        index.bookmarks = np.asarray(columns['bookmarkCount'], dtype=np.float64)
+        for article_id, counts in (overrides or {}).items():
+            row = index.row_by_id.get(article_id)
+            if row is not None:
+                index.likes[row], index.views[row], index.bookmarks[row] = counts
+
+        index.created = model.created if model.created is not None else np.zeros(model.n_rows)
+
+        index.keys = index._key(index.likes, index.views, index.bookmarks, index.created)
+        index.all_time_keys = index._all_time_key(index.likes, index.views, index.bookmarks)
+        now = time.time() if now is None else now
+        for window, span in WINDOWS.items():
+            order = np.lexsort((-index.created, -index._window_keys(window)))
+            if len(model.retired):
+                order = order[~np.isin(order, model.retired)]
+            index.ranked[window] = order if span is None else order[index.created[order] >= now - span]
+        return index
+
+    def patched(self, model, retired, now=None):
+        """Index for a model patched from this index's one
+
+        Rows past this index's arrays were appended to `model` and take
+        their counts from its columns; the newly `retired` rows leave the
+        ranked lists. Counts applied with `update_counts()` carry over.
+        """
+        index = TrendingIndex(self.half_life_hours)
+        index.model_version = model.version
+        index.row_by_id = model.row_by_id
+        index.updates = self.updates
+        n_old = len(self.keys)
+        columns = model.columns
+        new_likes = np.asarray(columns['likeCount'][n_old:], dtype=np.float64)
+        new_views = np.asarray(columns['viewCount'][n_old:], dtype=np.float64)
+        new_bookmarks = np.asarray(columns['bookmarkCount'][n_old:], dtype=np.float64)
+        new_created = model.created[n_old:] if model.created is not None else np.zeros(len(new_likes))
+        new_keys = index._key(new_likes, new_views, new_bookmarks, new_created)
+        new_all_time_keys = index._all_time_key(new_likes, new_views, new_bookmarks)
+
+        with self._lock:
+            index.likes = np.concatenate([self.likes, new_likes])
+            index.views = np.concatenate([self.views, new_views])
+            index.bookmarks = np.concatenate([self.bookmarks, new_bookmarks])
+            index.created = np.concatenate([self.created, new_created])
+            index.keys = np.concatenate([self.keys, new_keys])
+            index.all_time_keys = np.concatenate([self.all_time_keys, new_all_time_keys])
+            # update_many() moves rows within these arrays in place
+            ranked_lists = {window: ranked.copy() for window, ranked in self.ranked.items()}
+
+        now = time.time() if now is None else now
+        for window, ranked in ranked_lists.items():
+            if len(retired):
+                ranked = ranked[~np.isin(ranked, retired)]
+            keys = index._window_keys(window)
+            new_rows = n_old + np.lexsort((-new_created, -keys[n_old:]))
+            span = WINDOWS[window]
+            rows = new_rows if span is None else new_rows[index.created[new_rows] >= now - span]
+            # Ranked lists are sorted by descending key: search on -key
+            positions = np.searchsorted(-keys[ranked], -keys[rows], side='left')
+            index.ranked[window] = np.insert(ranked, positions, rows)
+        return index
+
+    def _key(self, likes, views, bookmarks, created):
+        key = np.log1p(engagement_scores(likes, views, bookmarks))
+        if self.half_life_hours:
+            key = key + created * (math.log(2) / (self.half_life_hours * 3600))
+        return key
+
+    @staticmethod
+    def _all_time_key(likes, views, bookmarks):
+        return np.log1p(engagement_scores(likes, views, bookmarks))
+
+    def _window_keys(self, window):
+        """Ranking keys of a window's list"""
+        return self.all_time_keys if WINDOWS[window] is None else self.keys
+
+    def trending_scores(self, rows, window='all', now=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        engagement = engagement_scores(self.likes[rows], self.views[rows], self.bookmarks[rows])
+        if not self.half_life_hours or WINDOWS[window] is None:
+            return engagement
+        now = time.time() if now is None else now
+        age_hours = np.maximum(now - self.created[rows], 0) / 3600
+        return (engagement + 1) * 0.5 ** (age_hours / self.half_life_hours)
+
+    def top(self, window='all', limit=10, now=None):
+        """Row positions of the top `limit` articles in `window`, best first
+
+        Articles that aged out of the window since the last rebuild are
+        skipped here and pruned once they make up a quarter of the list.
+        """
+        span = WINDOWS[window]
+        with self._lock:
+            ranked = self.ranked[window]
+            if span is None:
+                return ranked[:limit].copy()
+
+            cutoff = (time.time() if now is None else now) - span
+            rows = []
+            skipped = 0
+            for row in ranked:
+                if self.created[row] < cutoff:
+                    skipped += 1
+                    continue
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+
+            if skipped and skipped * 4 >= len(ranked):
+                self.ranked[window] = ranked[self.created[ranked] >= cutoff]
+            return np.array(rows, dtype=np.int64)
+
+    def update_counts(self, article_id, likes, views, bookmarks):
+        """Apply new engagement counts for one article and re-rank it in place"""
+        self.update_many({article_id: (likes, views, bookmarks)})
+        return article_id in self.row_by_id
+
+    def update_many(self, counts):
+        """Apply {article_id: (likes, views, bookmarks)}; returns the ids whose counts changed
+
+        Unknown ids and unchanged counts (e.g. a listener replaying
+        documents) are skipped. Each changed row is found by binary search
+        and moved in place, shifting only the entries between its old and
+        new positions; when more than RESORT_FRACTION of the rows change,
+        the lists are re-sorted once instead.
+        """
+        with self._lock:
+            changed = {}
+            for article_id, (likes, views, bookmarks) in counts.items():
+                row = self.row_by_id.get(article_id)
+                if row is not None and (self.likes[row], self.views[row], self.bookmarks[row]) != (likes, views, bookmarks):
+                    changed[article_id] = (row, likes, views, bookmarks)
+            if len(changed) > len(self.keys) * RESORT_FRACTION:
+                self._resort(list(changed.values()))
+            else:
+                for row, likes, views, bookmarks in changed.values():
+                    self._move(row, likes, views, bookmarks)
+            self.updates += len(changed)
+            return list(changed)
+
+    def _set_counts(self, rows, likes, views, bookmarks):
+        self.likes[rows], self.views[rows], self.bookmarks[rows] = likes, views, bookmarks
+        self.keys[rows] = self._key(self.likes[rows], self.views[rows], self.bookmarks[rows], self.created[rows])
+        self.all_time_keys[rows] = self._all_time_key(self.likes[rows], self.views[rows], self.bookmarks[rows])
+
+    def _resort(self, changes):
+        rows, likes, views, bookmarks = (np.array(column) for column in zip(*changes))
+        self._set_counts(rows, likes, views, bookmarks)
+        for window, ranked in self.ranked.items():
+            keys = self._window_keys(window)
+            self.ranked[window] = ranked[np.lexsort((-self.created[ranked], -keys[ranked]))]
+
+    def _move(self, row, likes, views, bookmarks):
+        positions = {window: self._position(ranked, self._window_keys(window), row)
+                     for window, ranked in self.ranked.items()}
+        self._set_counts(row, likes, views, bookmarks)
+
+        for window, position in positions.items():
+            if position is None:
+                continue  # Not in this window
+            ranked = self.ranked[window]
+            keys = self._window_keys(window)
+            # Ranked lists are sorted by descending key: search on -key
+            target = -keys[row]
+            if position > 0 and target < -keys[ranked[position - 1]]:
+                to = bisect.bisect_left(ranked, target, 0, position, key=lambda r: -keys[r])
+                ranked[to + 1:position + 1] = ranked[to:position]
+            elif position + 1 < len(ranked) and target > -keys[ranked[position + 1]]:
+                to = bisect.bisect_left(ranked, target, position + 1, len(ranked), key=lambda r: -keys[r]) - 1
+                ranked[position:to] = ranked[position + 1:to + 1]
+            else:
+                continue  # Still between its neighbors
+            ranked[to] = row
+
+    @staticmethod
+    def _position(ranked, keys, row):
+        """Position of `row` in a list sorted by descending `keys`, or None"""
+        key = -keys[row]
+        left = bisect.bisect_left(ranked, key, key=lambda r: -keys[r])
+        right = bisect.bisect_right(ranked, key, left, key=lambda r: -keys[r])
+        found = np.flatnonzero(ranked[left:right] == row)
+        return left + found[0] if len(found) else None
+
+    def stats(self):
+        return {
+            "half_life_hours": self.half_life_hours,
+            "model_version": self.model_version,
+            "incremental_updates": self.updates,
+            "window_sizes": {window: int(len(ranked)) for window, ranked in self.ranked.items()},
+        }
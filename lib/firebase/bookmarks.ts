@@ -14,6 +14,7 @@ import {
     orderBy
 } from 'firebase/firestore';
 import { Bookmark, Post } from '@/types';
+import { recordInteraction } from '@/lib/ml-api';
 
 /**
  * Toggle bookmark on a post
@@ -33,6 +34,8 @@ export const toggleBookmark = async (postId: string, userId: string): Promise<bo
             await updateDoc(postRef, {
                 bookmarkCount: increment(-1)
             });
+            // Keeps the user's cached recommendation profile current (best effort)
+            void recordInteraction(userId, 'bookmark', postId, false);
             return false;
         } else {
             // Add bookmark and increment count
@@ -46,6 +49,7 @@ export const toggleBookmark = async (postId: string, userId: string): Promise<bo
             await updateDoc(postRef, {
                 bookmarkCount: increment(1)
             });
+            void recordInteraction(userId, 'bookmark', postId, true);
             return true;
         }
     } catch (error) {
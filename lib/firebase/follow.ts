@@ -3,6 +3,7 @@
 import { doc, updateDoc, arrayUnion, arrayRemove, getDoc } from 'firebase/firestore';
 import { db } from './config';
 import { createNotification } from './notifications';
+import { recordInteraction } from '@/lib/ml-api';
 
 /**
  * Follow a user
@@ -48,6 +49,9 @@ export async function followUser(
             followerCount: newFollowerCount,
         });
 
+        // Keeps the follower's cached recommendation profile current (best effort)
+        void recordInteraction(currentUserId, 'follow', targetUserId, true);
+
         // Create notification for target user
         await createNotification({
             userId: targetUserId,
@@ -95,6 +99,8 @@ export async function unfollowUser(
             followerCount: newFollowerCount,
         });
 
+        void recordInteraction(currentUserId, 'follow', targetUserId, false);
+
     } catch (error: any) {
         throw new Error(`Failed to unfollow user: ${error.message}`);
     }
@@ -13,6 +13,7 @@ import {
     serverTimestamp
 } from 'firebase/firestore';
 import { Like } from '@/types';
+import { recordInteraction } from '@/lib/ml-api';
 
 /**
  * Toggle like on a post
@@ -32,6 +33,8 @@ export const toggleLike = async (postId: string, userId: string): Promise<boolea
             await updateDoc(postRef, {
                 likeCount: increment(-1)
             });
+            // Keeps the user's cached recommendation profile current (best effort)
+            void recordInteraction(userId, 'like', postId, false);
             return false;
         } else {
             // Like: Add like and increment count
@@ -45,6 +48,7 @@ export const toggleLike = async (postId: string, userId: string): Promise<boolea
             await updateDoc(postRef, {
                 likeCount: increment(1)
             });
+            void recordInteraction(userId, 'like', postId, true);
             return true;
         }
     } catch (error) {
@@ -2,6 +2,7 @@
 
 import { doc, updateDoc, arrayUnion, arrayRemove, getDoc } from 'firebase/firestore';
 import { db } from './config';
+import { recordInteraction } from '@/lib/ml-api';
 
 /**
  * Add article to reading list
@@ -14,6 +15,8 @@ export async function addToReadingList(
         await updateDoc(doc(db, 'users', userId), {
             readingList: arrayUnion(postId),
         });
+        // Keeps the user's cached recommendation profile current (best effort)
+        void recordInteraction(userId, 'reading_list', postId, true);
     } catch (error: any) {
         throw new Error(`Failed to add to reading list: ${error.message}`);
     }
@@ -30,6 +33,7 @@ export async function removeFromReadingList(
         await updateDoc(doc(db, 'users', userId), {
             readingList: arrayRemove(postId),
         });
+        void recordInteraction(userId, 'reading_list', postId, false);
     } catch (error: any) {
         throw new Error(`Failed to remove from reading list: ${error.message}`);
     }
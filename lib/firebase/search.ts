@@ -1,7 +1,14 @@
 // Enhanced search utilities for articles and authors
-
-import { collection, query, getDocs, where } from 'firebase/firestore';
+//
+// Free-text results are ranked by the ML API's /search index; only the
+// returned page is read from Firestore. Whole-collection scans remain as the
+// fallback when the API is unavailable. Category and author listings stay
+// direct Firestore queries: /search only knows published posts, as of its
+// last corpus sync, and matches categories case-insensitively.
+
+import { collection, query, getDocs, where, documentId } from 'firebase/firestore';
 import { db } from './config';
+import { searchCorpus } from '@/lib/ml-api';
 import { Post, User } from '@/types';
 
 export interface SearchResults {
@@ -9,12 +16,61 @@ export interface SearchResults {
     articles: Post[];
 }
 
+// Most ids a Firestore `in` query accepts
+const MAX_IN_IDS = 30;
+
+/**
+ * Fetch documents by id, in the order of `ids` (missing ones are skipped)
+ */
+async function getDocsById<T>(
+    collectionName: string,
+    ids: string[],
+    toItem: (id: string, data: any) => T
+): Promise<T[]> {
+    const byId = new Map<string, T>();
+    for (let i = 0; i < ids.length; i += MAX_IN_IDS) {
+        const snapshot = await getDocs(query(
+            collection(db, collectionName),
+            where(documentId(), 'in', ids.slice(i, i + MAX_IN_IDS))
+        ));
+        snapshot.forEach((doc) => byId.set(doc.id, toItem(doc.id, doc.data())));
+    }
+    return ids.filter((id) => byId.has(id)).map((id) => byId.get(id) as T);
+}
+
+const toPost = (id: string, data: any) => ({ id, ...data } as Post);
+const toUser = (uid: string, data: any) => ({ uid, ...data } as User);
+
 /**
  * Search for both authors and articles
  */
 export async function searchAll(
     searchQuery: string,
     limit: number = 20
+): Promise<SearchResults> {
+    if (!searchQuery.trim()) {
+        return { authors: [], articles: [] };
+    }
+
+    try {
+        const results = await searchCorpus(searchQuery.trim(), { limit, fields: ['id'] });
+        const [authors, articles] = await Promise.all([
+            getDocsById('users', results.authors.slice(0, 5).map((author) => author.uid), toUser),
+            getDocsById('posts', results.articles.map((article) => article.id), toPost),
+        ]);
+        return { authors, articles };
+    } catch (error) {
+        console.error('Search API unavailable, searching Firestore:', error);
+        return searchAllFirestore(searchQuery, limit);
+    }
+}
+
+/**
+ * `searchAll` by scanning the users and posts collections
+ */
+async function searchAllFirestore(
+    searchQuery: string,
+    limit: number
 ): Promise<SearchResults> {
     try {
         const searchLower = searchQuery.toLowerCase().trim();
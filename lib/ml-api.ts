@@ -1,5 +1,7 @@
 // ML Recommendation API Client for Next.js
 
+import { auth } from './firebase/config';
+
 const ML_API_URL = process.env.NEXT_PUBLIC_ML_API_URL || 'http://localhost:8000';
 
 // Check if ML API is enabled
@@ -124,3 +126,237 @@ export async function checkMLHealth(): Promise<boolean> {
         return false;
     }
 }
+
+/**
+ * Check if the ML API has loaded its model (recommendations return 503 until then)
+ */
+export async function checkMLReady(): Promise<boolean> {
+    try {
+        const response = await fetch(`${ML_API_URL}/ready`);
+        return response.ok;
+    } catch (error) {
+        return false;
+    }
+}
+
+export interface RecommendationOptions {
+    limit?: number;
+    diversity?: number;       // 0-1: higher spreads results over less similar articles
+    maxPerAuthor?: number;    // At most this many results per author
+    tags?: string[];          // Results must carry every tag
+    category?: string;
+    exclude?: string[];       // Article ids to leave out (e.g. already read)
+}
+
+/**
+ * Get recommendations for an article, optionally filtered and diversified
+ */
+export async function getArticleRecommendations(
+    articleId: string,
+    options: RecommendationOptions = {}
+): Promise<RecommendationResponse> {
+    const params = new URLSearchParams({ limit: String(options.limit ?? 5) });
+    if (options.diversity) params.set('diversity', String(options.diversity));
+    if (options.maxPerAuthor) params.set('max_per_author', String(options.maxPerAuthor));
+    if (options.tags?.length) params.set('tags', options.tags.join(','));
+    if (options.category) params.set('category', options.category);
+    if (options.exclude?.length) params.set('exclude', options.exclude.join(','));
+
+    try {
+        const response = await fetch(
+            `${ML_API_URL}/recommendations/${encodeURIComponent(articleId)}?${params.toString()}`
+        );
+
+        if (!response.ok) {
+            throw new Error(`API error: ${response.statusText}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching recommendations:', error);
+        throw error;
+    }
+}
+
+/**
+ * Article card returned by the corpus endpoints (the API's default fields)
+ */
+export interface ArticleCard {
+    id: string;
+    slug: string;
+    title: string;
+    author: string;
+    tags: string[];
+    likeCount?: number;
+    viewCount?: number;
+    bookmarkCount?: number;
+    createdAt?: string;
+    similarity_score?: number;
+}
+
+export interface BatchRecommendationResponse {
+    by_article: Record<string, ArticleCard[]>;
+    by_content: ArticleCard[][];
+    count: number;
+    ml_enabled: boolean;
+    source: string;
+}
+
+/**
+ * Get recommendations for many articles and/or content snippets in one request
+ */
+export async function getBatchRecommendations(
+    articleIds: string[],
+    contents: string[] = [],
+    limit: number = 5
+): Promise<BatchRecommendationResponse> {
+    try {
+        const response = await fetch(`${ML_API_URL}/recommendations/batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                article_ids: articleIds,
+                contents,
+                limit,
+            }),
+        });
+
+        if (!response.ok) {
+            throw new Error(`API error: ${response.statusText}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching batch recommendations:', error);
+        throw error;
+    }
+}
+
+export interface SearchArticle extends ArticleCard {
+    search_score?: number;
+    follow_boost?: number;      // Added to similarity_score when ranking personalized results
+}
+
+export interface SearchAuthor {
+    uid: string;
+    name: string;
+    username?: string;
+    photoURL?: string | null;
+    article_count: number;
+}
+
+export interface SearchResponse {
+    query: string;
+    articles: SearchArticle[];
+    authors: SearchAuthor[];
+    total: number;
+    offset: number;
+    limit: number;
+}
+
+/**
+ * Search articles (ranked server-side) and authors by name/username prefix
+ */
+export async function searchCorpus(
+    query: string,
+    options: {
+        tags?: string[];
+        category?: string;
+        author?: string;
+        authorIds?: string[];
+        offset?: number;
+        limit?: number;
+        fields?: string[];
+    } = {}
+): Promise<SearchResponse> {
+    const params = new URLSearchParams({ q: query });
+    if (options.tags?.length) params.set('tags', options.tags.join(','));
+    if (options.category) params.set('category', options.category);
+    if (options.author) params.set('author', options.author);
+    if (options.authorIds?.length) params.set('author_ids', options.authorIds.join(','));
+    if (options.fields?.length) params.set('fields', options.fields.join(','));
+    params.set('offset', String(options.offset ?? 0));
+    params.set('limit', String(options.limit ?? 20));
+
+    try {
+        const response = await fetch(`${ML_API_URL}/search?${params.toString()}`);
+
+        if (!response.ok) {
+            throw new Error(`API error: ${response.statusText}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error searching:', error);
+        throw error;
+    }
+}
+
+/**
+ * Authorization header carrying the signed-in user's Firebase ID token
+ * (required by the per-user endpoints)
+ */
+async function authHeaders(): Promise<Record<string, string>> {
+    const token = await auth.currentUser?.getIdToken();
+    return token ? { Authorization: `Bearer ${token}` } : {};
+}
+
+export interface UserRecommendationResponse {
+    uid: string;
+    recommendations: SearchArticle[];
+    count: number;
+    strategy: 'profile' | 'following' | 'trending' | 'none';
+    profile: Record<string, number>;
+    source: string;
+}
+
+/**
+ * Get personalized recommendations from a user's likes, bookmarks, reading list and follows
+ * (`uid` must be the signed-in user)
+ */
+export async function getUserRecommendations(
+    uid: string,
+    limit: number = 10
+): Promise<UserRecommendationResponse> {
+    try {
+        const response = await fetch(
+            `${ML_API_URL}/recommendations/user/${encodeURIComponent(uid)}?limit=${limit}`,
+            { headers: await authHeaders() }
+        );
+
+        if (!response.ok) {
+            throw new Error(`API error: ${response.statusText}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching user recommendations:', error);
+        throw error;
+    }
+}
+
+/**
+ * Tell the ML API about a like/bookmark/reading-list/follow change so the
+ * user's cached profile stays current (best effort)
+ */
+export async function recordInteraction(
+    uid: string,
+    kind: 'like' | 'bookmark' | 'reading_list' | 'follow',
+    targetId: string,
+    active: boolean = true
+): Promise<void> {
+    try {
+        await fetch(`${ML_API_URL}/users/${encodeURIComponent(uid)}/interactions`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...(await authHeaders()),
+            },
+            body: JSON.stringify({ kind, target_id: targetId, active }),
+        });
+    } catch (error) {
+        console.error('Error recording interaction:', error);
+    }
+}
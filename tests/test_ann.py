@@ -0,0 +1,38 @@
+import numpy as np
+from scipy import sparse
+
+from artelipi_ann import IVFIndex
+from artelipi_benchmark import synthetic_articles
+from artelipi_neighbors import top_k_indices
+from artelipi_recommender import ArtelipiRecommender
+
+
+def recall(found, exact_scores, k):
+    """Share of results reaching the exact k-th best score (ties are not misses)"""
+    kth_best = [scores[top_k_indices(scores, k)[-1]] for scores in exact_scores]
+    return np.mean([np.sum(scores >= kth - 1e-6) for (_, scores), kth in zip(found, kth_best)]) / k
+
+
+def test_ivf_recall_against_exact_search():
+    vectorizer = ArtelipiRecommender()._new_vectorizer()
+    tfidf = vectorizer.fit_transform(synthetic_articles(1000)['full_content'])
+    queries = vectorizer.transform(synthetic_articles(50, seed=1)['full_content'])
+    exact = (queries @ tfidf.T).toarray()
+    index = IVFIndex.build(tfidf)
+
+    recalls = [recall(index.search(queries, tfidf, 10, n_probe), exact, 10) for n_probe in (1, 4, 16)]
+    assert recalls == sorted(recalls) and recalls[-1] >= 0.95
+    assert recall(index.search(queries, tfidf, 10, index.n_lists), exact, 10) == 1.0
+    for i, (rows, scores) in enumerate(index.search(queries, tfidf, 10)):
+        np.testing.assert_allclose(scores, exact[i, rows], atol=1e-6)  # Candidates are scored exactly
+
+    # Appended rows join their nearest cluster; retired rows leave
+    more = vectorizer.transform(synthetic_articles(200, seed=2)['full_content'])
+    tfidf = sparse.vstack([tfidf, more], format='csr')
+    retired = np.arange(0, 1000, 10)
+    patched = index.patched(tfidf, 1000, retired)
+    exact = (queries @ tfidf.T).toarray()
+    exact[:, retired] = -np.inf
+    found = patched.search(queries, tfidf, 10)
+    assert not np.isin(np.concatenate([rows for rows, _ in found]), retired).any()
+    assert recall(found, exact, 10) >= 0.95
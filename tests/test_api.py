@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import artelipi_api_server as api
+from artelipi_cache import CorpusCache, ResponseCache
+from artelipi_scheduler import ModelScheduler
+from test_sync import T0, post, recommender
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """The app over a fresh FakeFirestore recommender, before its startup load"""
+    db, r = recommender()
+    monkeypatch.setattr(api, 'recommender', r)
+    monkeypatch.setattr(api, 'MODEL_PATH', str(tmp_path))
+    monkeypatch.setattr(api, 'scheduler', ModelScheduler(r, on_build=api.save_if_changed))
+    monkeypatch.setattr(api, 'corpus_cache', CorpusCache(api.load_corpus))
+    monkeypatch.setattr(api, 'response_cache', ResponseCache())
+    api.READY.clear()
+    yield db, TestClient(api.app)
+    api.scheduler.stop()
+    api.READY.clear()
+
+
+def test_refresh_applies_engagement_counts(server):
+    db, client = server
+    api.run_startup_load()
+    assert client.get('/trending', params={'limit': 1, 'fields': 'id'}).json()['articles'][0]['id'] == 'p19'
+
+    # The app increments counts without touching `updatedAt`
+    db.collection('posts').document('p0').update({'likeCount': 10000})
+    assert client.post('/refresh').status_code == 200
+
+    trending = client.get('/trending', params={'limit': 1, 'fields': 'id,likeCount'}).json()['articles']
+    assert trending[0]['id'] == 'p0' and trending[0]['likeCount'] == 10000
+
+
+def test_recommendations_revalidate_with_etags(server):
+    db, client = server
+    api.run_startup_load()
+    response = client.get('/recommendations/p1', params={'fields': 'id'})
+    etag = response.headers['etag']
+    assert response.status_code == 200 and etag.startswith('"')
+
+    for if_none_match in (etag, 'W/' + etag, f'"other", {etag}', '*'):
+        response = client.get('/recommendations/p1', params={'fields': 'id'}, headers={'If-None-Match': if_none_match})
+        assert response.status_code == 304 and response.headers['etag'] == etag and not response.content
+    response = client.get('/recommendations/p1', params={'fields': 'id'}, headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+
+    # A new model changes the recommendations, so the old ETag no longer matches
+    version = api.recommender.model.version
+    db.collection('posts').document('p20').set(post(1, updatedAt=T0 + timedelta(days=1)))
+    api.recommender.sync_articles()
+    assert api.recommender.model.version > version
+    response = client.get('/recommendations/p1', params={'fields': 'id'}, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['etag'] != etag
+    assert 'p20' in [rec['id'] for rec in response.json()['recommendations']]
+
+
+def test_queries_wait_for_the_startup_load(server):
+    _, client = server
+    response = client.get('/ready')
+    assert response.status_code == 503 and response.json()['status'] == 'loading'
+    assert response.headers['retry-after'] == '5'
+    for path in ('/', '/health', '/stats', '/metrics'):
+        assert client.get(path).status_code == 200, path
+    for path in ('/trending', '/recent', '/recommendations/p1', '/search?q=garden'):
+        assert client.get(path).status_code == 503, path
+
+    api.run_startup_load()
+    response = client.get('/ready')
+    assert response.status_code == 200 and response.json()['status'] == 'ready'
+    assert response.json()['article_count'] == 20
+    assert client.get('/recommendations/p1').status_code == 200
+
+
+def test_profiler_is_admin_only(server, monkeypatch):
+    _, client = server
+    assert client.post('/debug/profiler/start').status_code == 404  # ARTELIPI_PROFILER is off
+    monkeypatch.setattr(api, 'PROFILER_ENABLED', True)
+
+    # Without a token only localhost may use it; the test client is remote
+    monkeypatch.setattr(api, 'ADMIN_TOKEN', None)
+    assert client.post('/debug/profiler/start').status_code == 403
+    assert TestClient(api.app, client=('127.0.0.1', 50000)).get('/debug/profiler').status_code == 200
+
+    monkeypatch.setattr(api, 'ADMIN_TOKEN', 'secret')
+    for headers in ({}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'secret'}):
+        assert client.post('/debug/profiler/start', headers=headers).status_code == 401
+    assert not api.profiler.running
+    admin = {'Authorization': 'Bearer secret'}
+    try:
+        assert client.post('/debug/profiler/start', headers=admin).json()['status'] == 'started'
+    finally:
+        assert client.post('/debug/profiler/stop', headers=admin).json()['status'] == 'stopped'
@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from artelipi_cache import CorpusCache, ResponseCache
+
+
+def test_response_cache_drops_entries_of_older_versions():
+    cache = ResponseCache()
+    cache.put('a', 1, b'one')
+    assert cache.get('a', 1) == b'one'
+
+    assert cache.get('a', 2) is None  # A newer model was published
+    assert cache.invalidations == 1
+    cache.put('b', 1, b'stale')  # Computed from the replaced model
+    assert cache.get('b', 2) is None and cache.stats()['size'] == 0
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=2)
+    cache.put('a', 1, b'a')
+    cache.put('b', 1, b'b')
+    cache.get('a', 1)
+    cache.put('c', 1, b'c')
+
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == b'a' and cache.get('c', 1) == b'c'
+    assert cache.evictions == 1
+
+
+class Loader:
+    """Corpus loader that blocks until released and counts its calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        return f'snapshot {self.calls}'
+
+
+def test_corpus_cache_loads_once_for_concurrent_callers():
+    loader = Loader()
+    cache = CorpusCache(loader)
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cache.get) for _ in range(8)]
+        time.sleep(0.05)
+        loader.release.set()
+        assert [future.result() for future in futures] == ['snapshot 1'] * 8
+    assert loader.calls == 1 and cache.misses == 8
+
+
+def test_corpus_cache_serves_stale_snapshots_while_refreshing():
+    loader = Loader()
+    cache = CorpusCache(loader, ttl=60)
+    cache.prime('primed')
+    assert cache.get() == 'primed' and loader.calls == 0  # Within the TTL
+
+    cache.prime('primed', loaded_at=0)
+    assert [cache.get() for _ in range(3)] == ['primed'] * 3  # Stale, but never blocks
+    loader.release.set()
+    deadline = time.time() + 5
+    while cache.refreshes == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert loader.calls == 1 and cache.get() == 'snapshot 1' and not cache.is_stale()
+
+
+def test_corpus_cache_keeps_the_last_snapshot_when_a_refresh_fails():
+    def fail():
+        raise RuntimeError('Firestore unavailable')
+
+    cache = CorpusCache(fail)
+    with pytest.raises(RuntimeError):
+        cache.get()  # Nothing to fall back to
+    cache.prime('primed', loaded_at=0)
+    with pytest.raises(RuntimeError):
+        cache.refresh()
+    assert cache.snapshot == 'primed' and cache.refresh_errors == 2
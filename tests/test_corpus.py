@@ -0,0 +1,47 @@
+from artelipi_fakestore import FakeFirestore
+from artelipi_recommender import ArtelipiRecommender
+
+
+def post(title, content, **fields):
+    return dict({'title': title, 'content': content, 'status': 'published', 'authorId': 'u1',
+                 'category': 'Tech', 'tags': ['python']}, **fields)
+
+
+def recommender(posts):
+    db = FakeFirestore()
+    db.load('posts', posts)
+    recommender = ArtelipiRecommender(db=db, top_k=5)
+    recommender.min_articles_for_ml = 1
+    return recommender
+
+
+def test_null_category_and_author_load(tmp_path):
+    # createPost writes `category: postData.category || null`
+    r = recommender({
+        'p1': post('Gardening', 'tomatoes in the garden', category=None),
+        'p2': post('More gardening', 'tomatoes and peppers in the garden', authorId=None, tags=None),
+    })
+    r.reload()
+
+    assert r.model.columns['category'] == [None, 'Tech']
+    assert r.model.columns['authorId'] == ['u1', None]
+    assert list(r.model.search.rows_by_category) == ['tech']
+    assert [rec['id'] for rec in r.get_recommendations('p1', fields=['id', 'category'])] == ['p2']
+    assert r.search(category='tech', fields=['id'])['total'] == 1
+
+    r.save_model(str(tmp_path))
+    loaded = ArtelipiRecommender(top_k=5)
+    assert loaded.load_model(str(tmp_path))
+    assert loaded.model.columns['category'] == [None, 'Tech']
+    assert loaded.df['category'].tolist() == [None, 'Tech']
+
+
+def test_batch_fallback_uses_the_requested_limit():
+    words = ['tomatoes', 'peppers', 'soil', 'compost']
+    r = recommender({f'p{i}': post(f'Gardening {i}', f'{words[i % 4]} in the garden, {words[i // 2 % 4]}') for i in range(8)})
+    r.top_k = 2
+    r.reload()
+
+    by_article = r.get_recommendations_batch(['p1', 'missing'], limit=5, fields=['id'])
+    assert len(by_article[0]) == 2  # Only top_k neighbors are kept
+    assert len(by_article[1]) == 5
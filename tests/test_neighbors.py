@@ -0,0 +1,59 @@
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from artelipi_neighbors import TopKNeighbors, top_k_indices, top_k_matrix
+
+
+def tfidf_like(n, n_features=30, seed=0):
+    """Random L2-normalized sparse rows, every third one a copy of its predecessor (ties)"""
+    rng = np.random.default_rng(seed)
+    matrix = sparse.random(n, n_features, density=0.2, random_state=rng, format='csr')
+    rows = [matrix[i - 1] if i % 3 == 2 else matrix[i] for i in range(n)]
+    return normalize(sparse.vstack(rows, format='csr'))
+
+
+def test_top_k_indices_match_a_full_sort():
+    rng = np.random.default_rng(1)
+    scores = rng.integers(0, 5, 40).astype(np.float64)  # Many ties
+    for k in (1, 7, 40, 100):
+        top = top_k_indices(scores, k)
+        assert len(top) == min(k, 40) == len(set(top.tolist()))
+        np.testing.assert_array_equal(scores[top], np.sort(scores)[::-1][:k])
+    assert len(top_k_indices(scores, 0)) == 0 and len(top_k_indices(scores, -3)) == 0
+
+    distinct = rng.permutation(40).astype(np.float64)
+    np.testing.assert_array_equal(top_k_indices(distinct, 5), np.argsort(-distinct)[:5])
+
+
+def test_top_k_matrix_is_row_wise_top_k():
+    scores = np.random.default_rng(2).integers(0, 4, (6, 9)).astype(np.float64)
+    indices, top = top_k_matrix(scores, 4)
+    np.testing.assert_array_equal(top, -np.sort(-scores, axis=1)[:, :4])
+    np.testing.assert_array_equal(np.take_along_axis(scores, indices, axis=1), top)
+    assert top_k_matrix(scores, 20)[0].shape == (6, 9)
+
+
+def test_neighbors_match_dense_cosine():
+    matrix = tfidf_like(50)
+    exact = (matrix @ matrix.T).toarray()
+    np.fill_diagonal(exact, -np.inf)
+    for block_size in (None, 7):
+        neighbors = TopKNeighbors.build(matrix, 5, block_size)
+        assert neighbors.width == 5
+        for row in range(50):
+            indices, scores = neighbors.neighbors(row, 10)
+            assert row not in indices and len(set(indices.tolist())) == 5
+            np.testing.assert_allclose(scores, np.sort(exact[row])[::-1][:5], rtol=1e-6, atol=1e-6)
+            np.testing.assert_allclose(exact[row, indices], scores, rtol=1e-6, atol=1e-6)
+
+
+def test_small_corpus_lists_every_other_article():
+    matrix = tfidf_like(4)
+    neighbors = TopKNeighbors.build(matrix, 10)
+    assert neighbors.width == 3 and neighbors.k == 10
+    for row in range(4):
+        indices, scores = neighbors.neighbors(row, 10)
+        assert sorted(indices.tolist()) == [other for other in range(4) if other != row]
+        assert np.all(np.diff(scores) <= 0)
+    assert TopKNeighbors.build(tfidf_like(1), 10).width == 0
@@ -0,0 +1,42 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from artelipi_neighbors import TopKNeighbors
+from artelipi_parallel import build_neighbors, build_pool, fit_tfidf
+
+WORDS = ('python data science garden tomatoes soil travel mountains hiking music guitar chords '
+         'river coffee winter market paint engine orbit').split()
+
+
+def texts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [' '.join(rng.choice(WORDS, size=rng.integers(3, 30))) for _ in range(n)]
+
+
+def vectorizer(**kwargs):
+    # The recommender's settings (artelipi_recommender._new_vectorizer)
+    params = dict(max_features=1000, stop_words='english', ngram_range=(1, 2), min_df=1, max_df=0.9)
+    params.update(kwargs)
+    return TfidfVectorizer(**params)
+
+
+def test_parallel_build_matches_serial():
+    corpus = texts(300)
+    pool = build_pool(3)
+    try:
+        # max_features=40 forces the frequency cut, including its tie-breaking
+        for make in (vectorizer, lambda: vectorizer(max_features=40)):
+            serial, parallel = make(), make()
+            expected = serial.fit_transform(corpus)
+            matrix = fit_tfidf(parallel, corpus, pool, 3)
+
+            assert parallel.vocabulary_ == serial.vocabulary_
+            np.testing.assert_array_equal(parallel.idf_, serial.idf_)
+            assert (matrix != expected).nnz == 0
+
+        neighbors = build_neighbors(expected, 5, pool, 3)
+        serial_neighbors = TopKNeighbors.build(expected, 5)
+        np.testing.assert_array_equal(neighbors.indices, serial_neighbors.indices)
+        np.testing.assert_array_equal(neighbors.scores, serial_neighbors.scores)
+    finally:
+        pool.shutdown()
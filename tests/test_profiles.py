@@ -0,0 +1,24 @@
+from artelipi_fakestore import FakeFirestore
+from artelipi_profiles import FOLLOW_BOOST
+from artelipi_recommender import ArtelipiRecommender
+
+from test_sync import post
+
+
+def test_follow_boost_ranks_without_changing_the_score():
+    db = FakeFirestore()
+    db.load('posts', {f'p{i}': post(i) for i in range(20)})
+    db.load('likes', {'l1': {'userId': 'reader', 'postId': 'p0'}})
+    db.load('users', {'reader': {'following': ['u1']}})
+    r = ArtelipiRecommender(db=db, top_k=5)
+    r.min_articles_for_ml = 1
+    r.reload()
+
+    results = r.get_user_recommendations('reader', 10, fields=['id', 'authorId'])
+    recs = results['recommendations']
+    assert results['strategy'] == 'profile' and recs
+    assert all(0 <= rec['similarity_score'] <= 1 for rec in recs)
+    for rec in recs:
+        assert rec['follow_boost'] == (FOLLOW_BOOST if rec['authorId'] == 'u1' else 0)
+    ranking = [rec['similarity_score'] + rec['follow_boost'] for rec in recs]
+    assert ranking == sorted(ranking, reverse=True)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from artelipi_fakestore import FakeFirestore
+from artelipi_recommender import ArtelipiRecommender
+from artelipi_rerank import RerankOptions
+from test_corpus import post
+
+POSTS = {
+    'a': post('Pandas', 'python pandas numpy dataframes'),
+    'b': post('Pandas frames', 'python pandas numpy dataframes analysis'),
+    'c': post('Pandas frames', 'python pandas numpy dataframes analysis', authorId='u2'),  # Same text as b
+    'd': post('Numpy audio', 'python numpy audio synthesis', authorId='u3', category='Music', tags=['audio']),
+    'e': post('Guitar chords', 'guitar chords strumming', authorId='u4', category='Music', tags=['audio']),
+    'f': post('Garden', 'tomatoes soil compost', authorId='u5', category='Garden', tags=['garden']),
+}
+
+
+def recommender(top_k=5, **changes):
+    db = FakeFirestore()
+    db.load('posts', {article_id: dict(data, **changes.get(article_id, {})) for article_id, data in POSTS.items()})
+    recommender = ArtelipiRecommender(db=db, top_k=top_k)
+    recommender.min_articles_for_ml = 1
+    recommender.reload()
+    return recommender
+
+
+def recommend(r, limit=3, **options):
+    recs = r.get_recommendations('a', limit, fields=['id'], options=RerankOptions(**options))
+    return [rec['id'] for rec in recs], [rec['similarity_score'] for rec in recs]
+
+
+def test_diversity_skips_near_duplicates_and_unrelated_articles():
+    r = recommender()
+    ids, _ = recommend(r)
+    assert sorted(ids[:2]) == ['b', 'c'] and ids[2] == 'd'
+
+    # c repeats b: once one of them is picked, d gains more than the other
+    ids, scores = recommend(r, 5, diversity=0.5)
+    assert ids[1] == 'd' and sorted([ids[0], ids[2]]) == ['b', 'c']
+    assert len(ids) == 3 and min(scores) > 0  # e and f share no terms with a
+
+
+def test_max_per_author():
+    r = recommender(b={'authorId': 'u2'})
+    ids, _ = recommend(r, 3, max_per_author=1)
+    assert len(ids) == 3 and ids[1:] == ['d', 'e'] and ids[0] in ('b', 'c')
+
+
+def test_filters():
+    r = recommender()
+    assert recommend(r, category='Music')[0] == ['d', 'e']
+    assert recommend(r, tags=['audio', 'python'])[0] == []
+    assert recommend(r, tags=['AUDIO'], category='music')[0] == ['d', 'e']
+    assert recommend(r, 5, exclude=['b', 'e'])[0] == ['c', 'd', 'f']
+
+
+def test_filtered_out_neighbors_fall_back_to_exact_scores():
+    r = recommender(top_k=1)
+    assert len(r.model.neighbors.neighbors(r.model.row_by_id['a'], 5)[0]) == 1  # Only b or c is kept
+
+    ids, scores = recommend(r, category='Music')
+    assert ids == ['d', 'e']
+    tfidf = r.model.tfidf_matrix
+    exact = (tfidf[r.model.row_by_id['a']] @ tfidf.T).toarray().ravel()
+    np.testing.assert_allclose(scores, exact[[r.model.row_by_id[article_id] for article_id in ids]])
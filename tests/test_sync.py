@@ -0,0 +1,224 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from artelipi_fakestore import FakeFirestore
+from artelipi_recommender import ArtelipiRecommender
+from artelipi_scheduler import ModelScheduler
+from artelipi_trending import TrendingIndex
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+TOPICS = ['python data science', 'garden tomatoes soil', 'travel mountains hiking', 'music guitar chords']
+
+
+def post(i, **fields):
+    topic = TOPICS[i % len(TOPICS)]
+    return dict({
+        'title': f'{topic.split()[0].title()} notes {i}',
+        'content': f'{topic} {topic.split()[i % 3]} part {i}',
+        'status': 'published',
+        'authorId': f'u{i % 3}',
+        'authorName': f'Author {i % 3}',
+        'tags': [topic.split()[0]],
+        'likeCount': i,
+        'viewCount': 0,
+        'bookmarkCount': 0,
+        'createdAt': T0 + timedelta(hours=i),
+        'updatedAt': T0,
+    }, **fields)
+
+
+def recommender(n=20, **kwargs):
+    db = FakeFirestore()
+    db.load('posts', {f'p{i}': post(i) for i in range(n)})
+    recommender = ArtelipiRecommender(db=db, top_k=5, **kwargs)
+    recommender.min_articles_for_ml = 1
+    return db, recommender
+
+
+def test_sync_applies_upserts_and_drops_drafts():
+    db, r = recommender()
+    r.reload()
+    posts = db.collection('posts')
+    posts.document('p1').update({'title': 'Quantum gardening', 'updatedAt': T0 + timedelta(days=1)})
+    posts.document('p2').update({'status': 'draft', 'updatedAt': T0 + timedelta(days=1)})
+    posts.document('p20').set(post(20, updatedAt=T0 + timedelta(days=2)))
+
+    r.sync_articles()
+
+    assert r.sync_watermark == T0 + timedelta(days=2)
+    assert r.changes_since_build == 3
+    assert len(r.model) == 20
+    assert 'p2' not in r.model.row_by_id and 'p20' in r.model.row_by_id
+    assert r.model.columns['title'][r.model.row_by_id['p1']] == 'Quantum gardening'
+    assert [rec['id'] for rec in r.search('quantum', fields=['id'])['articles']] == ['p1']
+    assert r.search('notes 20', fields=['id'])['articles'][0]['id'] == 'p20'
+    for article_id in r.model.row_by_id:
+        ids = [rec['id'] for rec in r.get_recommendations(article_id, 5, fields=['id'])]
+        assert ids and article_id not in ids and 'p2' not in ids
+
+    # Nothing changed since: no new snapshot
+    version = r.model.version
+    r.sync_articles()
+    assert r.model.version == version
+
+
+def test_incremental_neighbors_match_a_rebuild():
+    db, r = recommender(40)
+    r.reload()
+    posts = db.collection('posts')
+    for i in (3, 17):
+        posts.document(f'p{i}').update({'content': 'python data science python', 'updatedAt': T0 + timedelta(days=1)})
+    posts.document('p8').delete()
+    posts.document('p40').set(post(40, updatedAt=T0 + timedelta(days=1)))
+    r.sync_articles()
+    r.apply_changes([], ['p8'])  # Hard deletes are only seen by the listener
+
+    # Same vocabulary, corpus rebuilt from the live rows
+    model = r.model
+    live = model.live_rows()
+    tfidf = model.tfidf_matrix[live]
+    exact = (tfidf @ tfidf.T).toarray()
+    np.fill_diagonal(exact, -np.inf)
+    for position, row in enumerate(live):
+        _, scores = model.neighbors.neighbors(row, 5)
+        assert len(scores) >= 3
+        np.testing.assert_allclose(scores, np.sort(exact[position])[::-1][:len(scores)], atol=1e-6)
+
+
+def test_listener_applies_adds_modifies_and_deletes():
+    db, r = recommender(listener_batch_seconds=0)
+    r.reload()
+    version = r.model.version
+    r.start_listener()
+    try:
+        r.flush_listener()
+        assert r.model.version == version  # The initial replay is already loaded
+
+        posts = db.collection('posts')
+        posts.document('p20').set(post(20, updatedAt=T0 + timedelta(days=1)))
+        posts.document('p1').update({'title': 'Quantum gardening', 'updatedAt': T0 + timedelta(days=1)})
+        posts.document('p2').delete()
+        posts.document('p3').update({'likeCount': 1000})  # Engagement only
+        r.flush_listener()
+    finally:
+        r.stop_listener()
+
+    assert 'p20' in r.model.row_by_id and 'p2' not in r.model.row_by_id
+    assert r.model.columns['title'][r.model.row_by_id['p1']] == 'Quantum gardening'
+    assert r.get_trending_articles(1, fields=['id'])[0]['id'] == 'p3'
+    assert r.sync_watermark == T0 + timedelta(days=1)
+    assert len(r.model) == 20
+
+
+def test_empty_corpus():
+    db = FakeFirestore()
+    r = ArtelipiRecommender(db=db, top_k=5, listener_batch_seconds=0)
+    r.reload()
+
+    assert len(r.model) == 0 and not r.ml_enabled
+    assert r.get_recommendations('p1') == []
+    assert r.get_recommendations_by_content('python') == []
+    assert r.get_trending_articles() == []
+    assert r.search('python')['total'] == 0
+
+    r.start_listener()
+    try:
+        db.collection('posts').document('p1').set(post(1))
+        r.flush_listener()
+    finally:
+        r.stop_listener()
+    assert list(r.model.row_by_id) == ['p1']
+    assert r.search('garden', fields=['id'])['articles'][0]['id'] == 'p1'
+
+
+def test_rebuild_refits_from_the_snapshot():
+    db, r = recommender(30, vectorizer_kind='hashing')
+    r.reload()
+    posts = db.collection('posts')
+    posts.document('p1').update({'content': 'music guitar chords music', 'updatedAt': T0 + timedelta(days=1)})
+    posts.document('p2').update({'status': 'draft', 'updatedAt': T0 + timedelta(days=1)})
+    posts.document('p30').set(post(30, updatedAt=T0 + timedelta(days=1)))
+    r.sync_articles()
+
+    fresh = ArtelipiRecommender(db=db, top_k=5, vectorizer_kind='hashing')
+    fresh.min_articles_for_ml = 1
+    fresh.reload()
+    r.db = FakeFirestore()  # A rebuild must not read the corpus again
+    assert r.build_ml_model()
+
+    model = r.model
+    assert len(model.retired) == 0 and model.n_rows == len(model) == 30
+    assert r.changes_since_build == 0
+    order = [fresh.model.row_by_id[article_id] for article_id in model.columns['id']]
+    np.testing.assert_allclose(model.tfidf_matrix.toarray(), fresh.model.tfidf_matrix[order].toarray(), atol=1e-12)
+    for query in ('music guitar', 'garden soil'):
+        assert r.search(query, fields=['id']) == fresh.search(query, fields=['id'])
+    assert r.get_recommendations('p1', 5, fields=['id']) == fresh.get_recommendations('p1', 5, fields=['id'])
+
+
+def test_all_time_trending_ignores_the_decay():
+    db, r = recommender()
+    posts = db.collection('posts')
+    posts.document('p0').update({'likeCount': 100, 'createdAt': T0 - timedelta(days=30)})
+    r.reload()
+    now = (T0 + timedelta(days=1)).timestamp()
+    trending = r.model.trending
+
+    assert r.get_trending_articles(1, window='all', fields=['id'])[0]['id'] == 'p0'
+    assert trending.trending_scores([r.model.row_by_id['p0']], 'all')[0] == 300
+    assert trending.trending_scores([r.model.row_by_id['p0']], '7d', now=now)[0] < 1
+
+    # p19 overtakes it with more engagement, however recent p0 is
+    trending.update_counts('p19', 200, 0, 0)
+    assert [rec['id'] for rec in r.get_trending_articles(2, window='all', fields=['id'])] == ['p19', 'p0']
+
+    posts.document('p20').set(post(20, likeCount=150, createdAt=T0 - timedelta(days=60), updatedAt=T0 + timedelta(days=1)))
+    r.sync_articles()
+    assert [rec['id'] for rec in r.get_trending_articles(3, window='all', fields=['id'])] == ['p19', 'p20', 'p0']
+
+
+def test_trending_updates_match_a_rebuild():
+    _, r = recommender(200)
+    r.reload()
+    now = (T0 + timedelta(days=8)).timestamp()
+    trending = TrendingIndex.build(r.model, now=now)
+    rng = np.random.default_rng(0)
+    ids = list(r.model.row_by_id)
+    overrides = {}
+    for size in (1, 1, 2, 3, 50):  # 50 changes re-sort the lists
+        counts = {ids[i]: tuple(rng.integers(0, 30, 3).tolist()) for i in rng.choice(len(ids), size, replace=False)}
+        trending.update_many(counts)
+        overrides.update(counts)
+
+        fresh = TrendingIndex.build(r.model, overrides=overrides, now=now)
+        for window, ranked in trending.ranked.items():
+            keys = trending._window_keys(window)
+            assert len(ranked) and sorted(ranked) == sorted(fresh.ranked[window])
+            # Equal keys may sit in any order
+            np.testing.assert_array_equal(keys[ranked], fresh._window_keys(window)[fresh.ranked[window]])
+
+
+def test_scheduled_reload_refits_the_vocabulary():
+    db, r = recommender(40)
+    r.reload()
+    db.collection('posts').document('p40').set(
+        post(40, title='Zebra quokka', content='zebra quokka savanna', updatedAt=T0 + timedelta(days=1)))
+    r.sync_articles()
+    assert r.build_ml_model()
+    assert 'zebra' not in r.vectorizer.vocabulary_  # Snapshot refits keep the vocabulary
+
+    scheduler = ModelScheduler(r, poll_interval=0.01, reload_interval=1e-6)
+    scheduler.start()
+    try:
+        deadline = time.time() + 10
+        while scheduler.builds == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+
+    assert scheduler.last_reason == 'reload'
+    recs = r.get_recommendations_by_content('zebra quokka', 3, fields=['id'])
+    assert recs[0]['id'] == 'p40' and recs[0]['similarity_score'] > 0